@@ -0,0 +1,577 @@
+"""
+Linha de comando não interativa, para uso em scripts, cron e CI.
+
+Uso:
+    python main.py encrypt CAMINHO [CAMINHO ...] [opções]
+    python main.py decrypt CAMINHO [CAMINHO ...] [opções]
+    python main.py encrypt - [opções] < ENTRADA > SAÍDA.enc
+    python main.py decrypt - [opções] < ENTRADA.enc > SAÍDA
+    python main.py verify CAMINHO [CAMINHO ...] [--max-rate MB/S] [opções]
+    python main.py resume PASTA [PASTA ...] [opções]
+    python main.py watch PASTA [opções]
+    python main.py rekey CAMINHO [CAMINHO ...] [--new-password-file ARQUIVO]
+    python main.py pack PASTA [-o COFRE]
+    python main.py list COFRE|PASTA [--search PADRÃO]
+    python main.py extract COFRE [NOME ...] [-d DESTINO]
+    python main.py calibrate [--algorithm ALGORITMO] [--target SEGUNDOS] [--save]
+    python main.py calibrate --ciphers
+
+CAMINHO pode ser um arquivo ou uma pasta. Com '-' no lugar dos caminhos,
+encrypt e decrypt leem da entrada padrão e gravam na saída padrão (para uso
+em pipes, ex.: tar c pasta | python main.py encrypt - > backup.enc); as
+mensagens vão para a saída de erros. A senha é lida, nesta ordem, de
+--password-fd, --password-file ou da variável de ambiente indicada por
+--password-env (padrão: PYVAULT_PASSWORD). No rekey, a nova senha é lida de
+--new-password-fd, --new-password-file ou --new-password-env (padrão:
+PYVAULT_NEW_PASSWORD).
+
+Códigos de saída: 0 sucesso, 1 algum arquivo falhou, 2 erro de uso ou de senha,
+130 interrompido pelo usuário.
+"""
+import argparse
+import os
+import sys
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+PASSWORD_ENV = 'PYVAULT_PASSWORD'
+NEW_PASSWORD_ENV = 'PYVAULT_NEW_PASSWORD'
+
+ARCHIVE_COMMANDS = ('pack', 'list', 'extract')
+STREAM_COMMANDS = ('encrypt', 'decrypt')
+
+# Caminho que indica a entrada/saída padrão
+STREAM_PATH = '-'
+
+# Repetidos de compression.py, key_derivation.py e cipher_backend.py para não carregar os módulos só para
+# montar a ajuda
+COMPRESSION_CHOICES = ('zlib', 'lzma', 'zstd')
+KDF_CHOICES = ('pbkdf2', 'scrypt', 'argon2id')
+CIPHER_CHOICES = ('aes-256-ctr', 'aes-256-gcm', 'chacha20-poly1305', 'auto')
+BACKEND_CHOICES = ('pycryptodome', 'cryptography', 'auto')
+
+
+def build_parser():
+    """Monta o parser de argumentos da linha de comando."""
+    password_options = argparse.ArgumentParser(add_help=False)
+    password_options.add_argument('--password-env', default=PASSWORD_ENV, metavar='VAR',
+                                  help=f"variável de ambiente com a senha (padrão: {PASSWORD_ENV})")
+    password_options.add_argument('--password-fd', type=int, metavar='FD',
+                                  help="descritor de arquivo de onde ler a senha (primeira linha)")
+    password_options.add_argument('--password-file', metavar='ARQUIVO',
+                                  help="arquivo de onde ler a senha (primeira linha)")
+
+    kdf_options = argparse.ArgumentParser(add_help=False)
+    kdf_options.add_argument('--kdf', choices=KDF_CHOICES, metavar='ALGORITMO',
+                             help="derivação da chave: pbkdf2, scrypt ou argon2id (padrão: o calibrado com "
+                                  "'calibrate --save' ou pbkdf2)")
+
+    cipher_options = argparse.ArgumentParser(add_help=False)
+    cipher_options.add_argument('--cipher', choices=CIPHER_CHOICES, metavar='CIFRA',
+                                help="cifra dos dados: aes-256-ctr (padrão), aes-256-gcm, chacha20-poly1305 ou auto "
+                                     "(a mais rápida nesta máquina, por um teste rápido de desempenho)")
+
+    common = argparse.ArgumentParser(add_help=False, parents=[password_options])
+    common.add_argument('paths', nargs='+', metavar='CAMINHO', help="arquivos ou pastas a processar")
+    common.add_argument('-w', '--workers', type=int, default=None,
+                        help="número de arquivos processados em paralelo (padrão: núcleos da CPU)")
+    common.add_argument('--memory-budget', type=int, metavar='MB',
+                        help="memória máxima somada entre os arquivos em andamento (padrão: 512); os "
+                             "arquivos maiores começam primeiro")
+    common.add_argument('--no-progress', action='store_true',
+                        help="não mostra o progresso (bytes, vazão e tempo restante) durante o lote")
+    common.add_argument('--cipher-backend', choices=BACKEND_CHOICES, metavar='BIBLIOTECA',
+                        help="biblioteca que executa as cifras: pycryptodome (padrão), cryptography ou auto "
+                             "(a mais rápida de cada cifra, por um teste rápido de desempenho)")
+    common.add_argument('--metrics', metavar='ARQUIVO',
+                        help="grava métricas por arquivo e por lote em ARQUIVO (JSON lines)")
+
+    parser = argparse.ArgumentParser(prog='main.py', description="PyVault em modo não interativo.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    encrypt = commands.add_parser('encrypt', parents=[common, kdf_options, cipher_options],
+                                  help="criptografa arquivos e pastas")
+    encrypt.add_argument('--incremental', action='store_true',
+                         help="nas pastas, criptografa apenas arquivos novos ou modificados")
+    encrypt.add_argument('--hash', action='store_true',
+                         help="no modo incremental, compara também o SHA-256 dos arquivos (guardado no catálogo criptografado)")
+    encrypt.add_argument('--delete-originals', action='store_true',
+                         help="remove os originais criptografados com sucesso")
+    encrypt.add_argument('--dedup', action='store_true',
+                         help="nas pastas, guarda uma única vez os arquivos de conteúdo idêntico e grava os "
+                              ".enc como referências")
+    encrypt.add_argument('--compress', choices=COMPRESSION_CHOICES, metavar='MÉTODO',
+                         help="comprime antes de criptografar: zlib, lzma ou zstd (arquivos que não "
+                              "comprimem, como JPEG e ZIP, são detectados e gravados sem compressão)")
+    encrypt.add_argument('--metadata-window', type=int, metavar='BYTES',
+                         help="procura o separador de metadados só nos primeiros BYTES de cada arquivo "
+                              "(padrão: 65536, máximo: 1048576; 0 desativa os metadados)")
+
+    decrypt = commands.add_parser('decrypt', parents=[common], help="descriptografa arquivos .enc")
+    decrypt.add_argument('--stop-on-wrong-password', action='store_true',
+                         help="interrompe no primeiro arquivo com senha incorreta")
+    decrypt.add_argument('--delete-encrypted', action='store_true',
+                         help="remove os .enc descriptografados com sucesso")
+
+    verify = commands.add_parser('verify', parents=[common],
+                                 help="verifica a integridade de arquivos .enc sem gravar texto claro")
+    verify.add_argument('--stop-on-wrong-password', action='store_true',
+                        help="interrompe no primeiro arquivo com senha incorreta")
+    verify.add_argument('--max-rate', type=float, metavar='MB/S',
+                        help="limita a leitura total, somada entre os workers, a MB/S megabytes por segundo")
+
+    resume = commands.add_parser('resume', parents=[common],
+                                 help="retoma um trabalho de pasta interrompido (encrypt ou decrypt)")
+    resume.set_defaults(stop_on_wrong_password=False)
+
+    watch = commands.add_parser('watch', parents=[common, kdf_options, cipher_options],
+                                help="vigia uma pasta e criptografa os arquivos novos ou modificados")
+    watch.add_argument('--delete-originals', action='store_true',
+                       help="remove os originais criptografados com sucesso")
+    watch.add_argument('--compress', choices=COMPRESSION_CHOICES, metavar='MÉTODO',
+                       help="comprime antes de criptografar: zlib, lzma ou zstd")
+    watch.add_argument('--poll', action='store_true',
+                       help="detecta alterações por varreduras periódicas em vez do inotify")
+
+    rekey = commands.add_parser('rekey', parents=[password_options],
+                                help="troca a senha de arquivos .enc, cofres e pastas sem recriptografar os dados")
+    rekey.add_argument('paths', nargs='+', metavar='CAMINHO', help="arquivos, cofres ou pastas")
+    rekey.add_argument('--new-password-env', default=NEW_PASSWORD_ENV, metavar='VAR',
+                       help=f"variável de ambiente com a nova senha (padrão: {NEW_PASSWORD_ENV})")
+    rekey.add_argument('--new-password-fd', type=int, metavar='FD',
+                       help="descritor de arquivo de onde ler a nova senha (primeira linha)")
+    rekey.add_argument('--new-password-file', metavar='ARQUIVO',
+                       help="arquivo de onde ler a nova senha (primeira linha)")
+
+    pack = commands.add_parser('pack', parents=[password_options, kdf_options],
+                               help="reúne os arquivos de uma pasta em um único cofre")
+    pack.add_argument('paths', nargs=1, metavar='PASTA', help="pasta a empacotar")
+    pack.add_argument('-o', '--output', metavar='COFRE', help="caminho do cofre (padrão: PASTA.vault)")
+
+    listing = commands.add_parser('list', parents=[password_options],
+                                  help="lista o conteúdo de um cofre ou o catálogo de uma pasta criptografada")
+    listing.add_argument('paths', nargs=1, metavar='COFRE|PASTA', help="cofre ou pasta a listar")
+    listing.add_argument('--search', metavar='PADRÃO',
+                         help="mostra apenas os nomes que contêm PADRÃO (ou que casam com ele, se tiver * ou ?)")
+
+    extract = commands.add_parser('extract', parents=[password_options], help="extrai arquivos de um cofre")
+    extract.add_argument('paths', nargs=1, metavar='COFRE', help="cofre de onde extrair")
+    extract.add_argument('names', nargs='*', metavar='NOME', help="entradas a extrair (padrão: todas)")
+    extract.add_argument('-d', '--destination', default='.', metavar='DESTINO',
+                         help="pasta de destino (padrão: pasta atual)")
+
+    calibrate = commands.add_parser('calibrate',
+                                    help="escolhe os parâmetros do KDF para um tempo alvo de desbloqueio")
+    calibrate.add_argument('--algorithm', choices=KDF_CHOICES, default='pbkdf2', metavar='ALGORITMO',
+                           help="pbkdf2, scrypt ou argon2id (padrão: pbkdf2)")
+    calibrate.add_argument('--target', type=float, default=1.0, metavar='SEGUNDOS',
+                           help="tempo alvo de uma derivação nesta máquina (padrão: 1.0)")
+    calibrate.add_argument('--save', action='store_true',
+                           help="usa os parâmetros calibrados como padrão das próximas criptografias")
+    calibrate.add_argument('--ciphers', action='store_true',
+                           help="em vez do KDF, mede a vazão de cada cifra em cada biblioteca disponível")
+
+    return parser
+
+
+def read_password(args, prefix='password'):
+    """
+    Lê a senha da fonte indicada nos argumentos.
+    prefix: 'password' ou 'new_password' (opções --new-password-* do rekey).
+    Retorna None se nenhuma fonte tiver a senha.
+    """
+    password_fd = getattr(args, f'{prefix}_fd')
+    password_file = getattr(args, f'{prefix}_file')
+    if password_fd is not None:
+        with os.fdopen(password_fd, 'r', closefd=False) as f:
+            return f.readline().rstrip('\r\n')
+    if password_file:
+        with open(password_file, 'r', encoding='utf-8') as f:
+            return f.readline().rstrip('\r\n')
+    return os.environ.get(getattr(args, f'{prefix}_env'))
+
+
+def run(argv):
+    """
+    Executa um comando da linha de comando e retorna o código de saída.
+    """
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'calibrate':
+        return run_calibrate(args)
+
+    kdf = None
+    if getattr(args, 'kdf', None):
+        import key_derivation
+        if args.kdf not in key_derivation.available_kdfs():
+            print(f"❌ {args.kdf} indisponível neste ambiente (Argon2id requer o pacote 'argon2-cffi').",
+                  file=sys.stderr)
+            return EXIT_USAGE
+        kdf = key_derivation.kdf_for_algorithm(args.kdf)
+
+    if getattr(args, 'cipher_backend', None) not in (None, 'auto'):
+        import cipher_backend
+        if args.cipher_backend not in cipher_backend.available_backends():
+            print(f"❌ {args.cipher_backend} indisponível neste ambiente (requer o pacote 'cryptography').",
+                  file=sys.stderr)
+            return EXIT_USAGE
+
+    try:
+        password = read_password(args)
+    except (OSError, ValueError) as e:
+        print(f"❌ Erro ao ler a senha: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not password:
+        print(f"❌ Senha não informada. Use --password-fd, --password-file ou a variável {args.password_env}.",
+              file=sys.stderr)
+        return EXIT_USAGE
+
+    if STREAM_PATH in args.paths:
+        if args.command not in STREAM_COMMANDS or args.paths != [STREAM_PATH]:
+            print(f"❌ '{STREAM_PATH}' só pode ser usado sozinho, com encrypt ou decrypt.", file=sys.stderr)
+            return EXIT_USAGE
+        return run_stream_command(args, password, kdf)
+
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        for path in missing:
+            print(f"❌ Caminho não encontrado: '{path}'", file=sys.stderr)
+        return EXIT_USAGE
+
+    if getattr(args, 'memory_budget', None) is not None and args.memory_budget <= 0:
+        print("❌ --memory-budget deve ser maior que zero.", file=sys.stderr)
+        return EXIT_USAGE
+
+    if getattr(args, 'max_rate', None) is not None and args.max_rate <= 0:
+        print("❌ --max-rate deve ser maior que zero.", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.command == 'watch' and (len(args.paths) != 1 or not os.path.isdir(args.paths[0])):
+        print("❌ O comando watch recebe uma única pasta.", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.command in ARCHIVE_COMMANDS:
+        return run_archive_command(args, password, kdf)
+
+    if args.command == 'rekey':
+        return run_rekey(args, password)
+
+    # Importado só depois de validar os argumentos, para que erros de uso respondam rápido
+    import crypto_operations
+
+    workers = args.workers or crypto_operations.DEFAULT_WORKERS
+    if args.no_progress:
+        crypto_operations.progress.enable_progress(False)
+    if args.memory_budget:
+        import batch_engine
+        batch_engine.set_memory_budget(args.memory_budget * 1024 * 1024)
+
+    cipher = select_cipher(args)
+
+    if args.metrics:
+        crypto_operations.metrics.enable_metrics(args.metrics)
+    try:
+        failed = run_file_command(crypto_operations, args, password, workers, kdf, cipher)
+    finally:
+        crypto_operations.metrics.disable_metrics()
+
+    return EXIT_FAILURES if failed else EXIT_OK
+
+
+def select_cipher(args):
+    """
+    Aplica --cipher-backend e resolve --cipher auto, rodando o teste de
+    desempenho das cifras se algum dos dois for 'auto'.
+    Retorna a cifra das novas criptografias (None: a padrão).
+    """
+    import cipher_backend
+
+    cipher = getattr(args, 'cipher', None)
+    if cipher_backend.CIPHER_AUTO in (cipher, args.cipher_backend):
+        print("⏱️ Medindo a vazão das cifras...")
+    if args.cipher_backend:
+        cipher_backend.set_backend(args.cipher_backend)
+    if cipher == cipher_backend.CIPHER_AUTO:
+        cipher = cipher_backend.resolve_cipher(cipher)
+        print(f"✅ Cifra mais rápida nesta máquina: {cipher} ({cipher_backend.backend_for(cipher)})")
+    return cipher
+
+
+def run_file_command(crypto_operations, args, password, workers, kdf=None, cipher=None):
+    """
+    Executa os comandos encrypt, decrypt, verify, resume e watch. Retorna a lista de falhas.
+    """
+    if args.command == 'encrypt':
+        successful, failed = encrypt_paths(crypto_operations, args, password, workers, kdf, cipher)
+        crypto_operations.show_operation_summary("Criptografia", successful, failed)
+        if args.delete_originals:
+            crypto_operations.delete_files(successful, "original")
+    elif args.command == 'watch':
+        path = args.paths[0]
+        encrypt_options = {'compression': args.compress, 'kdf': kdf, 'cipher': cipher}
+        session_salt = crypto_operations.get_random_bytes(16)
+        if not crypto_operations.watch_folder_files(path, password, session_salt, workers, encrypt_options,
+                                                    args.delete_originals, args.poll):
+            return [path]
+        return []
+    elif args.command == 'resume':
+        successful, failed = resume_paths(crypto_operations, args, password, workers)
+        crypto_operations.show_operation_summary("Retomada", successful, failed)
+    else:
+        operation = "Descriptografando" if args.command == 'decrypt' else "Verificando"
+        successful = []
+        failed = []
+        files = []
+        for path in args.paths:
+            if os.path.isdir(path) and args.command == 'decrypt':
+                # Pastas são trabalhos com diário, que podem ser retomados com 'resume'
+                result = crypto_operations.decrypt_folder_files(path, password, workers,
+                                                                args.stop_on_wrong_password)
+                if result is not None:
+                    successful.extend(result[0])
+                    failed.extend(result[1])
+            elif os.path.isdir(path):
+                files.extend(crypto_operations.get_files_for_decryption(path))
+            else:
+                files.append(path)
+        options = None
+        if args.command == 'verify' and args.max_rate:
+            from batch_engine import RateLimiter
+            options = {'rate_limiter': RateLimiter(args.max_rate * 1024 * 1024)}
+        if files:
+            result = crypto_operations.process_files(
+                files, operation, password, workers=workers,
+                stop_on_wrong_password=args.stop_on_wrong_password, encrypt_options=options)
+            successful.extend(result[0])
+            failed.extend(result[1])
+        summary = "Descriptografia" if args.command == 'decrypt' else "Verificação"
+        crypto_operations.show_operation_summary(summary, successful, failed)
+        if args.command == 'decrypt' and args.delete_encrypted:
+            crypto_operations.delete_files(successful, "criptografado")
+
+    return failed
+
+
+def run_stream_command(args, password, kdf=None):
+    """
+    Criptografa ou descriptografa da entrada padrão para a saída padrão.
+    As mensagens são desviadas para a saída de erros, para não se misturarem aos dados.
+    """
+    import contextlib
+
+    if args.command == 'encrypt' and sys.stdout.isatty():
+        print("❌ A saída criptografada não deve ir para o terminal; redirecione-a para um arquivo ou pipe.",
+              file=sys.stderr)
+        return EXIT_USAGE
+
+    src = sys.stdin.buffer
+    dst = sys.stdout.buffer
+    with contextlib.redirect_stdout(sys.stderr):
+        import crypto_operations
+
+        cipher = select_cipher(args)
+        if args.metrics:
+            crypto_operations.metrics.enable_metrics(args.metrics)
+        try:
+            if args.command == 'encrypt':
+                ok = crypto_operations.encrypt_stream(src, dst, password, compression=args.compress, kdf=kdf,
+                                                      cipher=cipher)
+            else:
+                ok = crypto_operations.decrypt_stream(src, dst, password)
+        finally:
+            crypto_operations.metrics.disable_metrics()
+
+    return EXIT_OK if ok else EXIT_FAILURES
+
+
+def run_rekey(args, password):
+    """
+    Troca a senha dos caminhos indicados e retorna o código de saída.
+    """
+    try:
+        new_password = read_password(args, 'new_password')
+    except (OSError, ValueError) as e:
+        print(f"❌ Erro ao ler a nova senha: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not new_password:
+        print(f"❌ Nova senha não informada. Use --new-password-fd, --new-password-file ou a variável "
+              f"{args.new_password_env}.", file=sys.stderr)
+        return EXIT_USAGE
+
+    import vault_rekey
+
+    result = vault_rekey.rekey_paths(args.paths, password, new_password)
+    if result is None:
+        return EXIT_USAGE
+    successful, failed = result
+    print(f"\n🔑 Senha trocada em {len(successful)} arquivo(s).")
+    if failed:
+        print(f"❌ {len(failed)} arquivo(s) falharam.")
+    return EXIT_FAILURES if failed else EXIT_OK
+
+
+def run_archive_command(args, password, kdf=None):
+    """
+    Executa os comandos de cofre (pack, list, extract) e retorna o código de saída.
+    """
+    import vault_archive
+
+    path = args.paths[0]
+    if args.command == 'pack':
+        if not os.path.isdir(path):
+            print(f"❌ '{path}' não é uma pasta.", file=sys.stderr)
+            return EXIT_USAGE
+        archive_path = args.output or os.path.normpath(path) + vault_archive.ARCHIVE_EXTENSION
+        files = vault_archive.get_files_for_encryption(path)
+        successful, failed = vault_archive.create_archive(archive_path, files, path, password, kdf=kdf)
+        print(f"\n📦 {len(successful)} arquivo(s) gravado(s) em '{archive_path}'.")
+        return EXIT_FAILURES if failed else EXIT_OK
+
+    if args.command == 'list':
+        import vault_catalog
+        if os.path.isdir(path):
+            # Pastas: a listagem vem do catálogo, sem percorrer a pasta
+            if not vault_catalog.has_catalog(path):
+                print(f"❌ A pasta '{path}' não tem catálogo (ele é criado na criptografia da pasta).",
+                      file=sys.stderr)
+                return EXIT_FAILURES
+            catalog = vault_catalog.load_catalog(path, password)
+            if catalog is None:
+                return EXIT_FAILURES
+            entries = vault_catalog.catalog_entries(catalog)
+            if args.search:
+                entries = vault_catalog.search_entries(entries, args.search)
+            vault_catalog.show_catalog_listing(entries)
+            return EXIT_OK
+
+        index = vault_archive.list_archive(path, password)
+        if index is None:
+            return EXIT_FAILURES
+        if args.search:
+            index = vault_catalog.search_entries(index, args.search)
+        vault_archive.show_archive_listing(index)
+        return EXIT_OK
+
+    result = vault_archive.extract_archive(path, password, args.destination, args.names or None)
+    if result is None:
+        return EXIT_FAILURES
+    successful, failed = result
+    print(f"\n📦 {len(successful)} arquivo(s) extraído(s) para '{args.destination}'.")
+    return EXIT_FAILURES if failed else EXIT_OK
+
+
+def resume_paths(crypto_operations, args, password, workers):
+    """
+    Retoma os trabalhos interrompidos das pastas indicadas.
+    Pastas sem trabalho a retomar, ou cuja senha não confere, contam como falha.
+    Retorna (sucessos, falhas).
+    """
+    successful = []
+    failed = []
+    for path in args.paths:
+        if not os.path.isdir(path):
+            print(f"❌ '{path}' não é uma pasta.", file=sys.stderr)
+            failed.append(path)
+            continue
+        result = crypto_operations.resume_folder_job(path, password, workers)
+        if result is None:
+            failed.append(path)
+            continue
+        successful.extend(result[1])
+        failed.extend(result[2])
+    return successful, failed
+
+
+def encrypt_paths(crypto_operations, args, password, workers, kdf=None, cipher=None):
+    """
+    Criptografa as pastas e arquivos indicados com um único salt de sessão.
+    Retorna (sucessos, falhas).
+    """
+    session_salt = crypto_operations.get_random_bytes(16)
+    encrypt_options = {'compression': args.compress, 'kdf': kdf, 'cipher': cipher}
+    if args.metadata_window is not None:
+        encrypt_options['metadata_window'] = max(args.metadata_window, 0)
+    successful = []
+    failed = []
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            result = crypto_operations.encrypt_folder_files(
+                path, password, session_salt, workers, args.incremental, args.hash, encrypt_options, args.dedup)
+            if result is not None:
+                successful.extend(result[0])
+                failed.extend(result[1])
+        else:
+            files.append(path)
+
+    if files:
+        result = crypto_operations.process_files(files, "Criptografando", password, session_salt, workers,
+                                                 encrypt_options=encrypt_options)
+        successful.extend(result[0])
+        failed.extend(result[1])
+
+    return successful, failed
+
+
+def run_calibrate(args):
+    """
+    Executa o comando calibrate e retorna o código de saída.
+    """
+    if args.ciphers:
+        return run_cipher_benchmark()
+
+    import key_derivation
+
+    if args.algorithm not in key_derivation.available_kdfs():
+        print(f"❌ {args.algorithm} indisponível neste ambiente (Argon2id requer o pacote 'argon2-cffi').",
+              file=sys.stderr)
+        return EXIT_USAGE
+    if args.target <= 0:
+        print("❌ O tempo alvo deve ser maior que zero.", file=sys.stderr)
+        return EXIT_USAGE
+
+    print(f"⏱️ Calibrando {args.algorithm} para cerca de {args.target:.2f} s por derivação...")
+    params, seconds = key_derivation.calibrate_kdf(args.algorithm, args.target)
+    print(f"✅ {key_derivation.describe_kdf(params)}: {seconds:.2f} s por derivação")
+
+    if args.save:
+        try:
+            key_derivation.save_kdf_config(params)
+        except OSError as e:
+            print(f"❌ Erro ao salvar a configuração: {e}", file=sys.stderr)
+            return EXIT_FAILURES
+        print(f"📝 Parâmetros salvos em '{key_derivation.KDF_CONFIG_PATH}' como padrão das próximas criptografias.")
+    return EXIT_OK
+
+
+def run_cipher_benchmark():
+    """
+    Mede a vazão de cada cifra em cada biblioteca disponível (calibrate --ciphers).
+    """
+    import cipher_backend
+
+    print(f"⏱️ Medindo a vazão das cifras ({cipher_backend.BENCHMARK_SIZE // (1024 * 1024)} MB cada)...")
+    results = cipher_backend.benchmark_ciphers()
+    for cipher, backend, mb_per_s in results:
+        print(f"  {cipher:<18} {backend:<13} {mb_per_s:8.1f} MB/s")
+    cipher, backend, _ = results[0]
+    print(f"✅ Mais rápida nesta máquina: {cipher} ({backend}); use '--cipher auto' para escolhê-la "
+          f"ao criptografar.")
+    if cipher_backend.BACKEND_CRYPTOGRAPHY not in cipher_backend.available_backends():
+        print("⚠️ Instale o pacote 'cryptography' para comparar também a biblioteca do OpenSSL.")
+    return EXIT_OK
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando."""
+    if argv is None:
+        argv = sys.argv[1:]
+    try:
+        return run(argv)
+    except KeyboardInterrupt:
+        print("\n⛔ Interrompido pelo usuário.", file=sys.stderr)
+        return EXIT_INTERRUPTED
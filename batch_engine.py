@@ -0,0 +1,183 @@
+"""
+Módulo para execução paralela de lotes de arquivos.
+
+Usa um pool de threads: a cifra AES e o PBKDF2 do PyCryptodome rodam em C
+e liberam o GIL, assim como a leitura e escrita de arquivos, então os
+arquivos são processados em paralelo de fato. As threads também compartilham
+o cache de chaves derivadas do lote.
+
+A ordem dos arquivos é escolhida por run_parallel: os maiores primeiro, com
+a memória estimada das tarefas em andamento limitada a um orçamento.
+"""
+import io
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# Número padrão de workers para operações em pasta
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Memória padrão para as tarefas em andamento de um lote (512 MiB)
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+_memory_budget = None
+
+
+class _ThreadOutput:
+    """
+    Substituto de sys.stdout que acumula a saída de cada tarefa em um buffer
+    próprio da thread, para que as mensagens de arquivos diferentes não se
+    misturem. Fora de uma tarefa, escreve direto no stream original.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            return self.stream.write(text)
+        return buffer.write(text)
+
+    def flush(self):
+        if getattr(self._local, 'buffer', None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def capture(self, task, item, *args):
+        """Executa a tarefa acumulando sua saída. Retorna (resultado, texto)."""
+        self._local.buffer = io.StringIO()
+        try:
+            try:
+                result = task(item, *args)
+            except Exception as e:
+                print(f"  ❌ Erro inesperado ao processar '{item}': {e}")
+                result = False
+            return result, self._local.buffer.getvalue()
+        finally:
+            self._local.buffer = None
+
+
+def run_parallel(task, items, workers, *args, sizes=None, costs=None, cancel=None):
+    """
+    Executa task(item, *args) para cada item em um pool de threads.
+    Gera pares (item, resultado) na mesma ordem de items, qualquer que seja a
+    ordem de execução. A saída impressa por cada tarefa é exibida de uma só
+    vez, também nessa ordem.
+
+    sizes: {item: tamanho}. Os itens maiores começam primeiro, para que um
+    arquivo enorme no fim da lista não fique rodando sozinho enquanto os
+    outros workers esperam; os pequenos preenchem os workers livres no final.
+    costs: {item: memória estimada}. A soma das tarefas em andamento não
+    passa de memory_budget(): quando o próximo item não cabe, ele espera a
+    memória ser liberada (itens menores não passam na frente, ou os grandes
+    acabariam ficando para o fim), e um item maior que o orçamento inteiro
+    roda sem nenhum outro em andamento.
+    Se o evento cancel for sinalizado, nenhum item novo é iniciado; os que
+    já estavam em andamento terminam e ainda são gerados.
+    """
+    # Importado sob demanda: carrega o logging e só é necessário em lotes paralelos
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    items = list(items)
+    order = range(len(items))
+    if sizes is not None:
+        order = sorted(order, key=lambda index: sizes.get(items[index], 0), reverse=True)
+    # deque: popleft() a cada envio, sem o custo quadrático de list.pop(0)
+    queue = deque(order)
+    costs = costs or {}
+    budget = memory_budget()
+
+    output = _ThreadOutput(sys.stdout)
+    sys.stdout = output
+    # Tarefa em andamento -> (índice do item, memória reservada)
+    running = {}
+    in_flight = 0
+    # Resultados concluídos que esperam os anteriores: índice -> (resultado, texto)
+    finished = {}
+    skipped = set()
+    next_index = 0
+
+    def emit(index):
+        result, text = finished.pop(index)
+        output.stream.write(text)
+        output.stream.flush()
+        return items[index], result
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while queue or running:
+                if cancel is not None and cancel.is_set():
+                    skipped.update(queue)
+                    queue.clear()
+                while queue and len(running) < workers:
+                    cost = costs.get(items[queue[0]], 0)
+                    if running and in_flight + cost > budget:
+                        break
+                    index = queue.popleft()
+                    in_flight += cost
+                    running[executor.submit(output.capture, task, items[index], *args)] = (index, cost)
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, cost = running.pop(future)
+                    in_flight -= cost
+                    finished[index] = future.result()
+                while next_index < len(items) and (next_index in finished or next_index in skipped):
+                    if next_index in finished:
+                        yield emit(next_index)
+                    next_index += 1
+            # Depois de um cancelamento, restam os concluídos após os itens não iniciados
+            for index in sorted(finished):
+                yield emit(index)
+    finally:
+        sys.stdout = output.stream
+
+
+def set_memory_budget(size):
+    """Define o orçamento de memória dos lotes (bytes); None volta ao padrão."""
+    global _memory_budget
+    _memory_budget = size
+
+
+def memory_budget():
+    """Memória máxima (bytes) somada entre as tarefas em andamento de um lote."""
+    return _memory_budget or DEFAULT_MEMORY_BUDGET
+
+
+class RateLimiter:
+    """
+    Limita a vazão total, em bytes por segundo, somada entre as threads do
+    lote. Cada bloco reserva o próximo intervalo livre e a thread espera até
+    ele começar, então a vazão média não passa de bytes_per_second.
+    """
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def consume(self, size):
+        """Espera o tempo necessário para que size bytes caibam no limite."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next_slot, now)
+            self._next_slot = start + size / self.bytes_per_second
+        if start > now:
+            time.sleep(start - now)
+
+    def wrap(self, readinto):
+        """Envolve readinto para limitar os bytes lidos."""
+        def wrapper(buffer):
+            size_read = readinto(buffer)
+            if size_read:
+                self.consume(size_read)
+            return size_read
+        return wrapper
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de desempenho do PyVault.
+
+Gera pastas sintéticas com distribuições de tamanho configuráveis e mede,
+separadamente, o tempo de derivação de chave (KDF), a vazão da cifra, o
+tempo de E/S e o desempenho de encrypt_file, decrypt_file, process_files e
+da criptografia/descriptografia de pasta inteira, incluindo o pico de
+memória (RSS) de cada etapa. Os resultados são gravados em JSON para que
+execuções diferentes possam ser comparadas.
+
+Uso:
+    python benchmark.py --profile mixed --output resultados.json
+    python benchmark.py --profile tiny --scale 0.1 --kdf-iterations 1000
+    python benchmark.py --profile tiny --kdf scrypt
+    python benchmark.py --profile huge --cipher aes-256-gcm --cipher-backend cryptography
+    python benchmark.py --profile huge --baseline resultados_antigos.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import Crypto
+
+import cipher_backend
+import key_derivation
+import crypto_operations
+from batch_engine import DEFAULT_WORKERS
+from vault_format import CHUNK_SIZE
+
+MB = 1024 * 1024
+
+# Cada perfil é uma lista de faixas (quantidade, tamanho mínimo, tamanho máximo)
+PROFILES = {
+    'tiny': [(2000, 512, 4 * 1024)],
+    'huge': [(3, 64 * MB, 128 * MB)],
+    'mixed': [(1000, 512, 16 * 1024), (50, 256 * 1024, 2 * MB), (2, 32 * MB, 64 * MB)],
+}
+
+CIPHER_BUFFER_SIZE = 64 * MB
+# Tamanho dos registros cifrados na medição da cifra (o padrão dos arquivos)
+CIPHER_CHUNK_SIZE = CHUNK_SIZE
+
+
+class RssSampler:
+    """
+    Mede o pico de memória residente durante uma etapa, amostrando
+    /proc/self/statm em uma thread. Fora do Linux, usa o pico do processo.
+    """
+
+    INTERVAL = 0.01
+
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def _current_rss(self):
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * self._page_size
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self._current_rss()
+            if rss is not None:
+                self.peak = max(self.peak, rss)
+            self._stop.wait(self.INTERVAL)
+
+    def __enter__(self):
+        if self._current_rss() is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        else:
+            # ru_maxrss está em KB no Linux e em bytes no macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak = maxrss if sys.platform == 'darwin' else maxrss * 1024
+        return False
+
+
+def generate_dataset(folder, profile, scale, content, seed):
+    """
+    Cria os arquivos sintéticos do perfil na pasta.
+    Retorna (lista de arquivos, total de bytes).
+    """
+    rng = random.Random(seed)
+    files = []
+    total = 0
+    os.makedirs(folder, exist_ok=True)
+
+    for bucket, (count, min_size, max_size) in enumerate(PROFILES[profile]):
+        count = max(1, int(count * scale))
+        subfolder = os.path.join(folder, f"faixa{bucket}")
+        os.makedirs(subfolder, exist_ok=True)
+        for i in range(count):
+            size = rng.randint(min_size, max_size)
+            path = os.path.join(subfolder, f"arquivo{i:06d}.dat")
+            with open(path, 'wb') as f:
+                remaining = size
+                while remaining > 0:
+                    block = min(remaining, MB)
+                    if content == 'text':
+                        line = b''.join(b'%d;registro;%d\n' % (rng.randint(0, 10**6), j) for j in range(64))
+                        f.write((line * (block // len(line) + 1))[:block])
+                    else:
+                        f.write(rng.randbytes(block))
+                    remaining -= block
+            files.append(path)
+            total += size
+
+    return files, total
+
+
+def remove_encrypted(folder):
+    """Remove os .enc e o manifesto deixados por uma etapa anterior."""
+    for root, _, names in os.walk(folder):
+        for name in names:
+            if name.endswith('.enc') or name.startswith('.pyvault_manifest'):
+                os.remove(os.path.join(root, name))
+
+
+def record(results, profile, stage, seconds, files=0, total_bytes=0, peak_rss=None):
+    """Acrescenta o resultado de uma etapa e o mostra na tela."""
+    result = {
+        'profile': profile,
+        'stage': stage,
+        'seconds': round(seconds, 6),
+        'files': files,
+        'bytes': total_bytes,
+        'mb_per_s': round(total_bytes / MB / seconds, 3) if seconds and total_bytes else None,
+        'files_per_s': round(files / seconds, 3) if seconds and files else None,
+        'peak_rss_mb': round(peak_rss / MB, 2) if peak_rss else None,
+    }
+    results.append(result)
+
+    throughput = f"{result['mb_per_s']:.1f} MB/s" if result['mb_per_s'] else "-"
+    rss = f"{result['peak_rss_mb']:.1f} MB" if result['peak_rss_mb'] else "-"
+    print(f"  {profile:6s} {stage:18s} {seconds:9.3f} s  {throughput:>14s}  RSS {rss}")
+
+
+def timed(stage_function):
+    """Executa a etapa sem a saída por arquivo e retorna (segundos, pico de RSS)."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            stage_function()
+            seconds = time.perf_counter() - start
+    return seconds, sampler.peak
+
+
+def bench_kdf(results, password, salt, kdf):
+    """Mede uma derivação de chave completa, sem cache."""
+    key_derivation.clear_key_cache()
+    seconds, peak = timed(lambda: key_derivation.derive_key(password, salt, kdf=kdf))
+    key_derivation.clear_key_cache()
+    record(results, '-', 'kdf', seconds, peak_rss=peak)
+
+
+def bench_cipher(results, cipher, backend):
+    """
+    Mede a vazão da cifra e da biblioteca escolhidas em memória, sem E/S:
+    cifra e autenticação dos registros, como na gravação dos arquivos.
+    """
+    # Uma rodada curta antes, para que a inicialização não conte na medição
+    cipher_backend._time_cipher(cipher, backend, CIPHER_CHUNK_SIZE, CIPHER_CHUNK_SIZE)
+    seconds, peak = timed(lambda: cipher_backend._time_cipher(cipher, backend, CIPHER_BUFFER_SIZE,
+                                                              CIPHER_CHUNK_SIZE))
+    record(results, '-', 'cipher', seconds, total_bytes=CIPHER_BUFFER_SIZE, peak_rss=peak)
+
+
+def bench_profile(results, args, profile, work_folder, password, salt, kdf):
+    """Executa todas as etapas de um perfil."""
+    folder = os.path.join(work_folder, profile)
+    files, total = generate_dataset(folder, profile, args.scale, args.content, args.seed)
+    encrypted = [f"{path}.enc" for path in files]
+    encrypt_options = {'compression': args.compress, 'kdf': kdf, 'cipher': args.cipher}
+
+    def copy_all():
+        for path in files:
+            with open(path, 'rb') as src, open(path + '.copy', 'wb') as dst:
+                shutil.copyfileobj(src, dst, MB)
+            os.remove(path + '.copy')
+
+    seconds, peak = timed(copy_all)
+    record(results, profile, 'io', seconds, len(files), total, peak)
+
+    # encrypt_file/decrypt_file isolados: a chave já está no cache, então
+    # o tempo medido é de cifra + E/S
+    key_derivation.derive_key(password, salt, kdf=kdf)
+
+    def encrypt_each():
+        for path in files:
+            crypto_operations.encrypt_file(path, password, salt, **encrypt_options)
+
+    seconds, peak = timed(encrypt_each)
+    record(results, profile, 'encrypt_file', seconds, len(files), total, peak)
+
+    def decrypt_each():
+        for path in encrypted:
+            crypto_operations.decrypt_file(path, password)
+
+    seconds, peak = timed(decrypt_each)
+    record(results, profile, 'decrypt_file', seconds, len(files), total, peak)
+    key_derivation.clear_key_cache()
+    remove_encrypted(folder)
+
+    # process_files e operações de pasta incluem uma derivação de chave por lote
+    seconds, peak = timed(lambda: crypto_operations.process_files(
+        files, "Criptografando", password, salt, args.workers, encrypt_options=encrypt_options))
+    record(results, profile, 'process_files', seconds, len(files), total, peak)
+    remove_encrypted(folder)
+
+    seconds, peak = timed(lambda: crypto_operations.encrypt_folder_files(
+        folder, password, salt, args.workers, encrypt_options=encrypt_options))
+    record(results, profile, 'encrypt_folder', seconds, len(files), total, peak)
+
+    # Descriptografa os .enc da pasta criptografada acima, com diário e varredura, como no uso real
+    seconds, peak = timed(lambda: crypto_operations.decrypt_folder_files(folder, password, args.workers))
+    record(results, profile, 'decrypt_folder', seconds, len(files), total, peak)
+
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+def compare_with_baseline(results, baseline_path):
+    """Mostra a variação de tempo de cada etapa em relação a uma execução anterior."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['profile'], r['stage']): r for r in baseline.get('results', [])}
+
+    print(f"\nComparação com '{baseline_path}' (tempo atual / anterior):")
+    for result in results:
+        old = previous.get((result['profile'], result['stage']))
+        if old and old['seconds']:
+            ratio = result['seconds'] / old['seconds']
+            marker = "⚠️" if ratio > 1.1 else "  "
+            print(f"  {marker} {result['profile']:6s} {result['stage']:18s} {ratio:6.2f}x")
+
+
+def build_parser():
+    """Monta o parser de argumentos dos benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmarks de desempenho do PyVault.")
+    parser.add_argument('--profile', action='append', choices=sorted(PROFILES),
+                        help="perfil de pasta sintética (pode repetir; padrão: todos)")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="multiplica a quantidade de arquivos de cada perfil")
+    parser.add_argument('--content', choices=('random', 'text'), default='random',
+                        help="conteúdo dos arquivos: aleatório (incompressível) ou texto")
+    parser.add_argument('--compress', choices=('zlib', 'lzma', 'zstd'),
+                        help="mede com compressão antes da criptografia")
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help="workers de process_files e das operações de pasta")
+    parser.add_argument('--cipher', choices=cipher_backend.CIPHERS,
+                        help="cifra dos dados (padrão: aes-256-ctr)")
+    parser.add_argument('--cipher-backend', choices=(cipher_backend.BACKEND_PYCRYPTODOME,
+                                                     cipher_backend.BACKEND_CRYPTOGRAPHY),
+                        help="biblioteca que executa as cifras (padrão: pycryptodome)")
+    parser.add_argument('--kdf', choices=key_derivation.KDF_ALGORITHMS,
+                        help="algoritmo de derivação da chave (padrão: o configurado para novas criptografias)")
+    parser.add_argument('--kdf-iterations', type=int,
+                        help="iterações do PBKDF2 (padrão: o valor de produção)")
+    parser.add_argument('--seed', type=int, default=1234, help="semente dos dados sintéticos")
+    parser.add_argument('--dir', help="pasta de trabalho (padrão: pasta temporária)")
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help="arquivo JSON de saída")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparar")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    profiles = args.profile or sorted(PROFILES)
+
+    if args.kdf_iterations:
+        key_derivation.PBKDF2_ITERATIONS = args.kdf_iterations
+    if args.kdf_iterations and args.kdf in (None, key_derivation.KDF_PBKDF2):
+        kdf = key_derivation.kdf_params(key_derivation.KDF_PBKDF2, iterations=args.kdf_iterations)
+    elif args.kdf:
+        kdf = key_derivation.kdf_for_algorithm(args.kdf)
+    else:
+        kdf = key_derivation.default_kdf()
+
+    if args.cipher_backend:
+        cipher_backend.set_backend(args.cipher_backend)
+
+    cipher = cipher_backend.resolve_cipher(args.cipher)
+    backend = cipher_backend.backend_for(cipher)
+    password = 'senha-de-benchmark'
+    salt = os.urandom(16)
+    results = []
+    work_folder = tempfile.mkdtemp(prefix='pyvault-bench-', dir=args.dir)
+
+    print(f"🏁 Benchmarks do PyVault em '{work_folder}'")
+    try:
+        bench_kdf(results, password, salt, kdf)
+        bench_cipher(results, cipher, backend)
+        for profile in profiles:
+            bench_profile(results, args, profile, work_folder, password, salt, kdf)
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pycryptodome': Crypto.__version__,
+        },
+        'parameters': {
+            'profiles': profiles,
+            'scale': args.scale,
+            'content': args.content,
+            'compress': args.compress,
+            'cipher': cipher,
+            'cipher_backend': backend,
+            'workers': args.workers,
+            'kdf': kdf,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📝 Resultados gravados em '{args.output}'")
+
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Módulo para o manifesto de alterações usado na criptografia incremental.
+
+O manifesto fica na pasta de trabalho e registra, para cada arquivo já
+criptografado, o tamanho e o mtime (em nanossegundos). Em uma nova
+execução, apenas arquivos novos ou modificados precisam ser criptografados
+novamente.
+
+O manifesto não é criptografado, então não guarda o SHA-256 do conteúdo
+(que permitiria confirmar se um arquivo conhecido está na pasta): a
+comparação por conteúdo usa o SHA-256 guardado no catálogo criptografado
+(ver vault_catalog.py). Manifestos antigos com o SHA-256 perdem esse campo
+na próxima gravação.
+"""
+import hashlib
+import json
+import os
+
+from vault_format import CHUNK_SIZE
+
+# Começa com ponto para não ser listado como arquivo a criptografar
+MANIFEST_NAME = '.pyvault_manifest.json'
+MANIFEST_VERSION = 1
+
+
+def manifest_path(path_folder):
+    """Retorna o caminho do manifesto da pasta."""
+    return os.path.join(path_folder, MANIFEST_NAME)
+
+
+def load_manifest(path_folder):
+    """
+    Carrega o manifesto da pasta.
+    Retorna um dicionário {caminho relativo: entrada}, vazio se não existir ou for inválido.
+    """
+    try:
+        with open(manifest_path(path_folder), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"⚠️ Manifesto inválido em '{path_folder}': {e}. Todos os arquivos serão processados.")
+        return {}
+
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('files', {})
+
+
+def save_manifest(path_folder, manifest):
+    """
+    Grava o manifesto de forma atômica (arquivo temporário + renomeação).
+    """
+    target = manifest_path(path_folder)
+    temp_path = target + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': manifest}, f)
+    os.replace(temp_path, target)
+
+
+def file_hash(file_path):
+    """Calcula o SHA-256 do conteúdo lendo o arquivo em blocos."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def filter_changed_files(path_folder, file_list, manifest, digests=None, scan=None):
+    """
+    Separa os arquivos que precisam ser criptografados dos que não mudaram
+    desde a última execução (mesmo tamanho e mtime, e o .enc ainda existe).
+    Com digests ({arquivo: SHA-256 registrado no catálogo}), arquivos cujo
+    tamanho ou mtime mudou mas o conteúdo é o mesmo também são considerados inalterados.
+    Com scan (resultado de file_selector.scan_folder), reaproveita o stat e a
+    lista de .enc da varredura em vez de consultar cada arquivo de novo.
+    Retorna (arquivos alterados, arquivos inalterados, {arquivo: stat}).
+    """
+    changed = []
+    unchanged = []
+    stats = {}
+
+    if scan is not None:
+        scanned_stats = {entry.path: entry.stat for entry in scan.plaintext}
+        encrypted_paths = {entry.path for entry in scan.encrypted}
+        enc_exists = encrypted_paths.__contains__
+    else:
+        scanned_stats = {}
+        enc_exists = os.path.exists
+
+    for file_path in file_list:
+        st = scanned_stats.get(file_path)
+        if st is None:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                changed.append(file_path)
+                continue
+        stats[file_path] = st
+
+        entry = manifest.get(os.path.relpath(file_path, path_folder))
+        if entry is None or not enc_exists(f"{file_path}.enc"):
+            changed.append(file_path)
+        elif entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            unchanged.append(file_path)
+        elif digests and digests.get(file_path) and digests[file_path] == file_hash(file_path):
+            # Conteúdo igual: apenas atualiza o tamanho/mtime registrados
+            entry['size'] = st.st_size
+            entry['mtime_ns'] = st.st_mtime_ns
+            unchanged.append(file_path)
+        else:
+            changed.append(file_path)
+
+    return changed, unchanged, stats
+
+
+def update_manifest(path_folder, manifest, processed_files, stats, keep_files=None):
+    """
+    Registra no manifesto os arquivos criptografados com sucesso, usando o stat
+    obtido antes da criptografia. Com keep_files, remove do manifesto as
+    entradas de arquivos que não estão mais na pasta.
+    """
+    for file_path in processed_files:
+        st = stats.get(file_path)
+        if st is None:
+            continue
+        manifest[os.path.relpath(file_path, path_folder)] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+    # Remove o SHA-256 em texto claro gravado por versões anteriores
+    for entry in manifest.values():
+        entry.pop('sha256', None)
+
+    if keep_files is not None:
+        keep = {os.path.relpath(file_path, path_folder) for file_path in keep_files}
+        for relative_path in list(manifest):
+            if relative_path not in keep:
+                del manifest[relative_path]
+
+    return manifest
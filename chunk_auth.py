@@ -0,0 +1,175 @@
+"""
+Módulo para a autenticação dos dados criptografados, bloco a bloco.
+
+O AES-CTR sozinho não detecta alterações: um bit trocado no arquivo vira um
+bit trocado no texto claro, e um arquivo truncado descriptografa "com
+sucesso". Com FIELD_AUTH no cabeçalho V3, os dados criptografados são
+gravados em registros de FIELD_CHUNK_SIZE bytes, cada um seguido de uma tag
+HMAC-SHA256 (truncada em TAG_SIZE bytes) sobre:
+
+    nonce + cabeçalho + índice do registro (8 bytes) + indicador de último registro (1 byte) + dados
+
+em que cabeçalho é o SHA-256 de vault_format.authenticated_header (vazio nos
+arquivos gravados com AUTH_HMAC_SHA256, antes de o cabeçalho ser autenticado).
+
+O último registro é sempre menor que o tamanho do bloco (pode ser vazio) e é
+o único marcado como último; assim, blocos trocados de lugar, copiados de
+outro arquivo, removidos do fim ou acrescentados depois dele são detectados.
+A chave das tags é derivada da chave de dados do arquivo, então a troca de
+senha (que só reembrulha a chave de dados) não invalida as tags.
+
+A verificação confere as tags sem descriptografar nada: basta a chave de
+dados, e o custo é uma leitura do arquivo mais um HMAC.
+
+O agrupamento em registros (AuthenticatedWriter/AuthenticatedReader) é o
+mesmo nas cifras autenticadas (AES-GCM, ChaCha20-Poly1305): nelas, a função
+que sela cada registro cifra e calcula a tag de uma vez (ver cipher_backend.py).
+"""
+import hashlib
+import hmac
+
+# Algoritmo das tags, gravado em FIELD_AUTH
+AUTH_HMAC_SHA256_HEADER = 'hmac-sha256+header'
+# Tags da própria cifra autenticada (FIELD_CIPHER)
+AUTH_AEAD_HEADER = 'aead+header'
+# Os mesmos, sem o cabeçalho nas tags: arquivos gravados antes, apenas lidos
+AUTH_HMAC_SHA256 = 'hmac-sha256'
+AUTH_AEAD = 'aead'
+
+# Tamanho de cada tag gravada após um registro
+TAG_SIZE = 16
+
+MAC_KEY_LABEL = b'PyVault chunk MAC'
+
+
+def mac_key(data_key):
+    """Chave das tags, derivada da chave de dados do arquivo."""
+    return hmac.new(data_key, MAC_KEY_LABEL, hashlib.sha256).digest()
+
+
+class _ChunkMac:
+    """Calcula as tags dos registros de um arquivo, em ordem."""
+
+    def __init__(self, key, nonce, header=b''):
+        self._base = hmac.new(key, nonce + header, hashlib.sha256)
+        self.index = 0
+
+    def tag(self, data, final):
+        mac = self._base.copy()
+        mac.update(self.index.to_bytes(8, byteorder='big') + (b'\x01' if final else b'\x00'))
+        mac.update(data)
+        self.index += 1
+        return mac.digest()[:TAG_SIZE]
+
+
+class HmacRecords:
+    """
+    Sela e abre os registros de dados já criptografados com AES-CTR,
+    acrescentando ou conferindo a tag HMAC de cada um.
+    header: SHA-256 do cabeçalho autenticado, ou vazio nos arquivos anteriores.
+    """
+
+    def __init__(self, key, nonce, header=b''):
+        self._mac = _ChunkMac(key, nonce, header)
+
+    def seal(self, data, final):
+        """Retorna as partes a gravar: os dados e a tag."""
+        return data, self._mac.tag(data, final)
+
+    def open(self, record, final):
+        """
+        Confere a tag no fim do registro e retorna os dados.
+        Lança ValueError se ela não conferir.
+        """
+        data = record[:len(record) - TAG_SIZE]
+        if not hmac.compare_digest(self._mac.tag(data, final), record[len(data):]):
+            raise ValueError("tag não confere")
+        return data
+
+
+class AuthenticatedWriter:
+    """
+    Agrupa os dados em registros de chunk_size bytes e grava cada um selado
+    por seal(dados, último) (ex.: HmacRecords.seal), que retorna as partes a
+    gravar: o registro com TAG_SIZE bytes a mais. finish() grava o último registro.
+    """
+
+    def __init__(self, write, seal, chunk_size):
+        self._write = write
+        self._seal = seal
+        self._chunk_size = chunk_size
+        self._pending = bytearray()
+
+    def _record(self, data, final=False):
+        for part in self._seal(data, final):
+            self._write(part)
+
+    def write(self, data):
+        # data pode apontar para um buffer reutilizado: o que fica pendente é copiado
+        view = memoryview(data).cast('B')
+        if self._pending:
+            missing = self._chunk_size - len(self._pending)
+            self._pending += view[:missing]
+            view = view[missing:]
+            if len(self._pending) < self._chunk_size:
+                return
+            self._record(self._pending)
+            self._pending = bytearray()
+        while len(view) >= self._chunk_size:
+            self._record(view[:self._chunk_size])
+            view = view[self._chunk_size:]
+        self._pending += view
+
+    def finish(self):
+        self._record(self._pending, final=True)
+        self._pending = bytearray()
+
+
+class AuthenticatedReader:
+    """
+    Lê os registros gravados por AuthenticatedWriter e entrega apenas os
+    dados abertos por open_record(registro, último) (ex.: HmacRecords.open),
+    que lança ValueError se a tag não conferir. Lança ValueError no primeiro
+    registro corrompido, se o arquivo estiver truncado ou se houver dados
+    depois do último registro.
+    """
+
+    def __init__(self, readinto, open_record, chunk_size):
+        self._readinto = readinto
+        self._open = open_record
+        self._chunk_size = chunk_size
+        self._record = bytearray(chunk_size + TAG_SIZE)
+        self._index = 0
+        self._finished = False
+
+    def _fill(self, view):
+        total = 0
+        while total < len(view):
+            size_read = self._readinto(view[total:])
+            if not size_read:
+                break
+            total += size_read
+        return total
+
+    def readinto(self, buffer):
+        if self._finished:
+            return 0
+        record = memoryview(self._record)
+        size = self._fill(record)
+        if size < TAG_SIZE:
+            raise ValueError(f"arquivo truncado (registro {self._index} ausente)")
+
+        data_size = size - TAG_SIZE
+        final = data_size < self._chunk_size
+        try:
+            data = self._open(record[:size], final)
+        except ValueError:
+            raise ValueError(f"registro {self._index} corrompido ou arquivo truncado") from None
+        self._index += 1
+        if final:
+            self._finished = True
+            if self._fill(record[:1]):
+                raise ValueError("dados extras após o último registro")
+
+        buffer[:data_size] = data
+        return data_size
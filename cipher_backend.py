@@ -0,0 +1,265 @@
+"""
+Módulo das cifras dos dados dos arquivos V3 e das bibliotecas que as executam.
+
+Cifras (gravadas em FIELD_CIPHER no cabeçalho):
+    aes-256-ctr        AES-CTR com uma tag HMAC-SHA256 por registro (ver chunk_auth.py)
+    aes-256-gcm        AES-GCM, cifra autenticada
+    chacha20-poly1305  ChaCha20-Poly1305, cifra autenticada; rápida sem AES-NI
+
+Nas cifras autenticadas, cada registro de FIELD_CHUNK_SIZE bytes é cifrado
+com um nonce próprio (o nonce do cabeçalho combinado com o índice do
+registro) e tem o indicador de último registro, seguido do SHA-256 do
+cabeçalho autenticado, como dado associado; então os registros trocados de
+lugar, removidos ou acrescentados e o cabeçalho alterado são detectados
+como no AES-CTR com HMAC. A tag de 16 bytes fica no mesmo lugar da tag HMAC.
+
+Bibliotecas: PyCryptodome, sempre disponível, e `cryptography` (OpenSSL),
+se o pacote estiver instalado. As duas gravam exatamente os mesmos dados,
+então a biblioteca não fica registrada no arquivo e pode ser escolhida em
+cada máquina. O desempenho varia bastante conforme o processador (AES-NI,
+CLMUL) e a versão do OpenSSL; benchmark_ciphers() mede rapidamente cada
+combinação e passa a usar a biblioteca mais rápida de cada cifra.
+"""
+import threading
+import time
+
+from Crypto.Cipher import AES, ChaCha20_Poly1305
+from Crypto.Random import get_random_bytes
+
+from chunk_auth import TAG_SIZE, HmacRecords, mac_key
+
+CIPHER_AES_CTR = 'aes-256-ctr'
+CIPHER_AES_GCM = 'aes-256-gcm'
+CIPHER_CHACHA20_POLY1305 = 'chacha20-poly1305'
+# Escolhe a cifra mais rápida pelo benchmark
+CIPHER_AUTO = 'auto'
+
+CIPHERS = (CIPHER_AES_CTR, CIPHER_AES_GCM, CIPHER_CHACHA20_POLY1305)
+AEAD_CIPHERS = (CIPHER_AES_GCM, CIPHER_CHACHA20_POLY1305)
+
+# Cifra dos arquivos gravados sem FIELD_CIPHER e das novas criptografias, salvo escolha
+DEFAULT_CIPHER = CIPHER_AES_CTR
+
+BACKEND_PYCRYPTODOME = 'pycryptodome'
+BACKEND_CRYPTOGRAPHY = 'cryptography'
+# Escolhe a biblioteca mais rápida de cada cifra pelo benchmark
+BACKEND_AUTO = 'auto'
+
+# Tamanho do nonce gravado no cabeçalho
+CTR_NONCE_SIZE = 8
+AEAD_NONCE_SIZE = 12
+
+# Dados cifrados por combinação no benchmark (8 MiB)
+BENCHMARK_SIZE = 8 * 1024 * 1024
+
+# Biblioteca escolhida para cada cifra (por set_backend ou pelo benchmark)
+_backends = {}
+# Resultado do benchmark, medido uma única vez por processo
+_benchmark = None
+_benchmark_lock = threading.Lock()
+
+
+def _cryptography():
+    """Importa as primitivas do pacote cryptography, se disponível."""
+    try:
+        from cryptography.exceptions import InvalidTag
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+    except ImportError:
+        return None
+    return Cipher, algorithms, modes, AESGCM, ChaCha20Poly1305, InvalidTag
+
+
+def available_backends():
+    """Retorna as bibliotecas de cifra disponíveis neste ambiente."""
+    backends = [BACKEND_PYCRYPTODOME]
+    if _cryptography() is not None:
+        backends.append(BACKEND_CRYPTOGRAPHY)
+    return backends
+
+
+def set_backend(backend):
+    """
+    Usa a biblioteca indicada em todas as cifras; BACKEND_AUTO escolhe a mais
+    rápida de cada uma pelo benchmark. Lança ValueError se ela estiver indisponível.
+    """
+    if backend == BACKEND_AUTO:
+        benchmark_ciphers()
+        return
+    if backend not in available_backends():
+        raise ValueError(f"biblioteca de cifra indisponível: '{backend}'")
+    for cipher in CIPHERS:
+        _backends[cipher] = backend
+
+
+def backend_for(cipher):
+    """Biblioteca usada para a cifra: a escolhida ou, sem escolha, o PyCryptodome."""
+    return _backends.get(cipher, BACKEND_PYCRYPTODOME)
+
+
+def check_cipher(name):
+    """Retorna o nome da cifra se for suportada; lança ValueError caso contrário."""
+    if name not in CIPHERS:
+        raise ValueError(f"cifra não suportada: '{name}'")
+    return name
+
+
+class _CtrStream:
+    """AES-CTR contínuo sobre os dados, com a interface process(dados)."""
+
+    def __init__(self, backend, key, nonce):
+        if backend == BACKEND_CRYPTOGRAPHY:
+            Cipher, algorithms, modes = _cryptography()[:3]
+            # O contador do PyCryptodome começa em zero logo após o nonce
+            counter_block = nonce + bytes(16 - len(nonce))
+            self._update = Cipher(algorithms.AES(key), modes.CTR(counter_block)).encryptor().update
+            self._cipher = None
+        else:
+            self._cipher = AES.new(key, AES.MODE_CTR, nonce=nonce)
+
+    def process(self, data):
+        """
+        Cifra (ou decifra: no CTR é a mesma operação) e retorna o resultado,
+        no próprio buffer quando data é um memoryview gravável.
+        """
+        if self._cipher is None:
+            return self._update(data)
+        if isinstance(data, memoryview) and not data.readonly:
+            self._cipher.encrypt(data, output=data)
+            return data
+        return self._cipher.encrypt(data)
+
+
+class _AeadRecords:
+    """
+    Sela e abre registros com uma cifra autenticada, com a mesma interface de
+    chunk_auth.HmacRecords. O nonce de cada registro é o nonce base com os
+    últimos 8 bytes combinados (XOR) com o índice.
+    """
+
+    def __init__(self, backend, cipher, key, nonce, header=b''):
+        self._prefix = nonce[:4]
+        self._header = header
+        self._counter = int.from_bytes(nonce[4:], byteorder='big')
+        self.index = 0
+        if backend == BACKEND_CRYPTOGRAPHY:
+            _, _, _, AESGCM, ChaCha20Poly1305, self._invalid_tag = _cryptography()
+            self._aead = (AESGCM if cipher == CIPHER_AES_GCM else ChaCha20Poly1305)(key)
+        else:
+            self._aead = None
+            self._key = key
+            self._cipher = cipher
+
+    def _next_nonce(self):
+        nonce = self._prefix + (self._counter ^ self.index).to_bytes(8, byteorder='big')
+        self.index += 1
+        return nonce
+
+    def _associated(self, final):
+        return (b'\x01' if final else b'\x00') + self._header
+
+    def _new(self, nonce, final):
+        if self._cipher == CIPHER_AES_GCM:
+            cipher = AES.new(self._key, AES.MODE_GCM, nonce=nonce, mac_len=TAG_SIZE)
+        else:
+            cipher = ChaCha20_Poly1305.new(key=self._key, nonce=nonce)
+        cipher.update(self._associated(final))
+        return cipher
+
+    def seal(self, data, final):
+        """Cifra o registro e retorna as partes a gravar: dados cifrados e tag."""
+        nonce = self._next_nonce()
+        if self._aead is not None:
+            return (self._aead.encrypt(nonce, data, self._associated(final)),)
+        return self._new(nonce, final).encrypt_and_digest(data)
+
+    def open(self, record, final):
+        """
+        Confere a tag no fim do registro e retorna os dados decifrados.
+        Lança ValueError se ela não conferir.
+        """
+        nonce = self._next_nonce()
+        if self._aead is not None:
+            try:
+                return self._aead.decrypt(nonce, record, self._associated(final))
+            except self._invalid_tag:
+                raise ValueError("tag não confere") from None
+        data_size = len(record) - TAG_SIZE
+        return self._new(nonce, final).decrypt_and_verify(record[:data_size], record[data_size:])
+
+
+class PayloadCipher:
+    """
+    Cifra dos dados de um arquivo V3.
+    stream: cifra contínua aplicada aos dados antes de agrupá-los em
+    registros (AES-CTR), ou None nas cifras autenticadas.
+    records: objeto com seal/open dos registros autenticados, ou None nos
+    arquivos AES-CTR gravados antes da autenticação.
+    header: SHA-256 do cabeçalho coberto pelas tags (ver
+    vault_format.authenticated_header), ou vazio nos arquivos anteriores.
+    """
+
+    def __init__(self, cipher, key, nonce=None, authenticated=True, backend=None, header=b''):
+        self.cipher = check_cipher(cipher)
+        self.backend = backend or backend_for(cipher)
+        self.nonce = nonce if nonce is not None else new_nonce(cipher)
+        if cipher == CIPHER_AES_CTR:
+            self.stream = _CtrStream(self.backend, key, self.nonce)
+            self.records = HmacRecords(mac_key(key), self.nonce, header) if authenticated else None
+        else:
+            if len(self.nonce) != AEAD_NONCE_SIZE:
+                raise ValueError(f"nonce inválido para {cipher}")
+            self.stream = None
+            self.records = _AeadRecords(self.backend, cipher, key, self.nonce, header)
+
+
+def new_nonce(cipher):
+    """Nonce aleatório para o cabeçalho de um arquivo novo com a cifra indicada."""
+    return get_random_bytes(CTR_NONCE_SIZE if check_cipher(cipher) == CIPHER_AES_CTR else AEAD_NONCE_SIZE)
+
+
+def _time_cipher(cipher, backend, size, chunk_size):
+    """Segundos para selar size bytes em registros de chunk_size com a combinação indicada."""
+    payload = PayloadCipher(cipher, get_random_bytes(32), backend=backend)
+    view = memoryview(bytearray(chunk_size))
+    start = time.perf_counter()
+    for _ in range(max(size // chunk_size, 1)):
+        data = payload.stream.process(view) if payload.stream is not None else view
+        payload.records.seal(data, False)
+    return time.perf_counter() - start
+
+
+def benchmark_ciphers(size=BENCHMARK_SIZE, chunk_size=1024 * 1024):
+    """
+    Mede a vazão de cada cifra em cada biblioteca disponível (cifra e
+    autenticação, como na gravação dos arquivos) e passa a usar a biblioteca
+    mais rápida de cada cifra. Medido uma única vez por processo.
+    Retorna [(cifra, biblioteca, MB/s)], da combinação mais rápida à mais lenta.
+    """
+    global _benchmark
+    with _benchmark_lock:
+        if _benchmark is None:
+            results = []
+            for cipher in CIPHERS:
+                for backend in available_backends():
+                    # Uma rodada curta antes, para que a inicialização não conte na medição
+                    _time_cipher(cipher, backend, chunk_size, chunk_size)
+                    seconds = _time_cipher(cipher, backend, size, chunk_size)
+                    results.append((cipher, backend, size / (1024 * 1024) / max(seconds, 1e-9)))
+            results.sort(key=lambda result: result[2], reverse=True)
+            for cipher in CIPHERS:
+                _backends[cipher] = next(backend for name, backend, _ in results if name == cipher)
+            _benchmark = results
+        return list(_benchmark)
+
+
+def resolve_cipher(name):
+    """
+    Cifra das novas criptografias: a indicada, DEFAULT_CIPHER se None, ou a
+    combinação mais rápida do benchmark com CIPHER_AUTO.
+    """
+    if name is None:
+        return DEFAULT_CIPHER
+    if name == CIPHER_AUTO:
+        return benchmark_ciphers()[0][0]
+    return check_cipher(name)
@@ -0,0 +1,182 @@
+"""
+Módulo para a compressão opcional aplicada antes da criptografia.
+
+Algoritmos: zlib e lzma (biblioteca padrão) e zstd, se o pacote
+`zstandard` estiver instalado. O algoritmo usado fica registrado no
+cabeçalho do arquivo criptografado; a descompressão é feita em blocos.
+
+A descompressão entrega a saída em partes de no máximo MAX_OUTPUT_SIZE
+bytes: um bloco pequeno de dados comprimidos pode se expandir para
+gigabytes (ex.: zeros comprimidos), e a memória usada precisa continuar
+limitada, mesmo com um arquivo montado para isso.
+"""
+import lzma
+import zlib
+
+COMPRESSION_NONE = 'none'
+COMPRESSION_ZLIB = 'zlib'
+COMPRESSION_LZMA = 'lzma'
+COMPRESSION_ZSTD = 'zstd'
+
+COMPRESSION_METHODS = (COMPRESSION_ZLIB, COMPRESSION_LZMA, COMPRESSION_ZSTD)
+
+# Amostra usada para decidir se vale a pena comprimir
+SAMPLE_SIZE = 64 * 1024
+# Abaixo desta razão (comprimido / original) a compressão compensa
+MIN_SAVING_RATIO = 0.9
+# Tamanho máximo de cada parte entregue pela descompressão (1 MiB)
+MAX_OUTPUT_SIZE = 1024 * 1024
+
+# Assinaturas de formatos que já são comprimidos
+COMPRESSED_SIGNATURES = (
+    b'\xff\xd8\xff',                 # JPEG
+    b'\x89PNG\r\n\x1a\n',            # PNG
+    b'GIF8',                         # GIF
+    b'PK\x03\x04',                   # ZIP, DOCX, XLSX, JAR...
+    b'\x1f\x8b',                     # gzip
+    b'BZh',                          # bzip2
+    b'\xfd7zXZ\x00',                 # xz
+    b'7z\xbc\xaf\x27\x1c',           # 7-Zip
+    b'\x28\xb5\x2f\xfd',             # zstd
+    b'Rar!\x1a\x07',                 # RAR
+    b'OggS',                         # Ogg
+    b'fLaC',                         # FLAC
+    b'ID3',                          # MP3
+    b'RIFF',                         # WebP, AVI, WAV
+)
+
+
+def _zstandard():
+    """Importa o pacote zstandard, se disponível."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def available_methods():
+    """Retorna os algoritmos de compressão disponíveis neste ambiente."""
+    methods = [COMPRESSION_ZLIB, COMPRESSION_LZMA]
+    if _zstandard() is not None:
+        methods.append(COMPRESSION_ZSTD)
+    return methods
+
+
+def looks_compressible(sample):
+    """
+    Decide pela amostra do início do arquivo se a compressão compensa.
+    Descarta formatos já comprimidos pela assinatura e, nos demais, comprime
+    a amostra com zlib no nível mais rápido e compara os tamanhos.
+    """
+    if not sample:
+        return False
+    # MP4/MOV/HEIC: a assinatura 'ftyp' fica a partir do byte 4
+    if sample.startswith(COMPRESSED_SIGNATURES) or sample[4:8] == b'ftyp':
+        return False
+    return len(zlib.compress(sample, 1)) < len(sample) * MIN_SAVING_RATIO
+
+
+def new_compressor(method):
+    """
+    Cria um compressor em fluxo com os métodos compress(dados) e flush().
+    """
+    if method == COMPRESSION_ZLIB:
+        return zlib.compressobj(6)
+    if method == COMPRESSION_LZMA:
+        return lzma.LZMACompressor()
+    if method == COMPRESSION_ZSTD:
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise ValueError("compressão zstd indisponível (instale o pacote 'zstandard')")
+        return zstandard.ZstdCompressor().compressobj()
+    raise ValueError(f"método de compressão desconhecido: '{method}'")
+
+
+class _ZlibDecompressor:
+    """Descompressão zlib limitada por max_length, retomada por unconsumed_tail."""
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj()
+
+    def decompress(self, data, emit):
+        while True:
+            piece = self._decompressor.decompress(data, MAX_OUTPUT_SIZE)
+            if piece:
+                emit(piece)
+            data = self._decompressor.unconsumed_tail
+            # Uma parte cheia pode ter deixado saída pendente mesmo sem entrada restante
+            if not data and len(piece) < MAX_OUTPUT_SIZE:
+                return
+
+    def flush(self, emit):
+        piece = self._decompressor.flush()
+        if piece:
+            emit(piece)
+
+
+class _LzmaDecompressor:
+    """Descompressão lzma limitada por max_length, retomada enquanto needs_input for falso."""
+
+    def __init__(self):
+        self._decompressor = lzma.LZMADecompressor()
+
+    def decompress(self, data, emit):
+        while not self._decompressor.eof:
+            piece = self._decompressor.decompress(data, MAX_OUTPUT_SIZE)
+            if piece:
+                emit(piece)
+            if self._decompressor.needs_input:
+                return
+            data = b''
+
+    def flush(self, emit):
+        pass
+
+
+class _Emitter:
+    """Destino do stream_writer do zstandard, que repassa cada parte a emit."""
+
+    def __init__(self):
+        self.emit = None
+
+    def write(self, data):
+        self.emit(data)
+        return len(data)
+
+
+class _ZstdDecompressor:
+    """
+    Descompressão zstd: o decompressobj do zstandard não aceita max_length,
+    então a saída passa por um stream_writer, que a grava em partes de
+    write_size bytes.
+    """
+
+    def __init__(self, zstandard):
+        self._emitter = _Emitter()
+        self._writer = zstandard.ZstdDecompressor().stream_writer(self._emitter, write_size=MAX_OUTPUT_SIZE,
+                                                                  closefd=False)
+
+    def decompress(self, data, emit):
+        self._emitter.emit = emit
+        self._writer.write(data)
+
+    def flush(self, emit):
+        pass
+
+
+def new_decompressor(method):
+    """
+    Cria um descompressor em fluxo com os métodos decompress(dados, emit) e
+    flush(emit), que passam a saída a emit em partes de no máximo MAX_OUTPUT_SIZE bytes.
+    """
+    if method == COMPRESSION_ZLIB:
+        return _ZlibDecompressor()
+    if method == COMPRESSION_LZMA:
+        return _LzmaDecompressor()
+    if method == COMPRESSION_ZSTD:
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise ValueError("descompressão zstd indisponível (instale o pacote 'zstandard')")
+        return _ZstdDecompressor(zstandard)
+    raise ValueError(f"método de compressão desconhecido: '{method}'")
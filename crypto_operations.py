@@ -1,25 +1,118 @@
 """
 Módulo para operações de criptografia e descriptografia.
 """
+import hashlib
 import os
+import threading
 from Crypto.Cipher import AES
-from Crypto.Protocol.KDF import PBKDF2
 from Crypto.Random import get_random_bytes
 from getpass import getpass
 
-from file_selector import get_files_for_encryption, get_files_for_decryption, select_files_to_process
+import metrics
+import progress
+from key_derivation import (
+    derive_key, clear_key_cache, key_check_value, key_matches, default_kdf, encode_kdf, kdf_from_header, check_kdf,
+    new_data_key, wrap_key, unwrap_key,
+)
+from batch_engine import DEFAULT_WORKERS, run_parallel
+from stream_pipeline import PIPELINE_BUFFERS, PIPELINE_MIN_SIZE, transform_stream, PrefixedReader
+from chunk_auth import (
+    AUTH_HMAC_SHA256, AUTH_AEAD, AUTH_HMAC_SHA256_HEADER, AUTH_AEAD_HEADER, AuthenticatedWriter, AuthenticatedReader,
+)
+from cipher_backend import CIPHER_AES_CTR, PayloadCipher, new_nonce, resolve_cipher
+from compression import COMPRESSION_NONE, SAMPLE_SIZE, looks_compressible, new_compressor, new_decompressor
+from change_manifest import (
+    manifest_path, load_manifest, save_manifest, filter_changed_files, update_manifest, file_hash,
+)
+from dedup_store import open_store, resolve_reference
+from job_journal import journal_path, start_job, reopen_job, load_job
+from vault_catalog import load_catalog, save_catalog, update_catalog, catalog_digests
+from vault_format import (
+    MAGIC_V2, CHUNK_SIZE, MAX_METADATA_SIZE,
+    FIELD_METADATA, FIELD_SALT, FIELD_NONCE, FIELD_CHUNK_SIZE, FIELD_KEY_CHECK, FIELD_COMPRESSION,
+    FIELD_KDF, FIELD_BLOB_REF, FIELD_WRAPPED_KEY, FIELD_AUTH, FIELD_CIPHER,
+    MAGIC_V3, FORMAT_V3, FORMAT_V2, FORMAT_LEGACY, FORMAT_ARCHIVE, FORMAT_UNKNOWN, LEGACY_SALT_SIZE, LEGACY_NONCE_SIZES,
+    write_header_v3, read_header_v3, probe_format, header_digest,
+)
+from file_selector import (
+    scan_folder, cached_size, get_files_for_encryption, get_files_for_decryption, select_files_to_process,
+)
 
 # Separador para metadados
 SEP = b'---\n\n'
 
+# Os metadados só são procurados neste trecho inicial do arquivo (64 KiB): um
+# separador encontrado por acaso no meio de um binário grande não deixa em
+# texto claro tudo o que vem antes dele, e o arquivo não é percorrido inteiro
+METADATA_WINDOW = 64 * 1024
 
-def encrypt_file(file_path, password, salt, key_size=32):
+# Sufixo dos arquivos temporários de saída (ver temp_output_path)
+TEMP_SUFFIX = '.pyvault-tmp'
+
+# Nome de cada operação nos registros de métricas
+METRIC_OPERATIONS = {
+    "Criptografando": "encrypt",
+    "Descriptografando": "decrypt",
+    "Verificando": "verify",
+}
+
+
+def split_metadata(head, window=METADATA_WINDOW):
+    """
+    Procura o separador de metadados apenas nos primeiros window bytes de head.
+    Retorna o tamanho dos metadados (incluindo o separador), ou 0 se não houver.
+    """
+    index = head.find(SEP, 0, window)
+    return index + len(SEP) if index != -1 else 0
+
+
+def read_metadata(f, window=METADATA_WINDOW):
+    """
+    Procura o separador de metadados no trecho inicial do arquivo (window
+    bytes, no máximo MAX_METADATA_SIZE, para que o cabeçalho caiba no limite
+    de leitura). Retorna os metadados (incluindo o separador) e deixa o
+    arquivo posicionado no início dos dados a criptografar.
+    """
+    window = min(window, MAX_METADATA_SIZE)
+    head = f.read(window) if window > 0 else b''
+    metadata_size = split_metadata(head, window)
+    f.seek(metadata_size)
+    return head[:metadata_size]
+
+
+def temp_output_path(output_path):
+    """
+    Caminho temporário em que um arquivo de saída é gravado antes de ser
+    renomeado para output_path. Fica na mesma pasta (a renomeação é atômica)
+    e começa com ponto, para ser ignorado pelas varreduras.
+    """
+    folder, name = os.path.split(output_path)
+    return os.path.join(folder, f".{name}{TEMP_SUFFIX}")
+
+
+def encrypt_file(file_path, password, salt, key_size=32, chunk_size=CHUNK_SIZE, compression=None, kdf=None,
+                 store=None, output_path=None, digests=None, metadata_window=METADATA_WINDOW, cipher=None):
     """
-    Função auxiliar para criptografar um único arquivo.
+    Função auxiliar para criptografar um único arquivo no formato V3.
+    Lê, criptografa e grava em blocos, mantendo o uso de memória constante;
+    arquivos grandes passam pelo pipeline de stream_pipeline.py.
+    compression: 'zlib', 'lzma' ou 'zstd' para comprimir antes de criptografar;
+    arquivos cuja amostra não comprime (JPEG, ZIP...) são gravados sem compressão.
+    kdf: parâmetros de derivação da chave (padrão: default_kdf()), gravados no cabeçalho.
+    store: DedupStore aberto para gravar o conteúdo deduplicado (ver encrypt_file_deduplicated).
+    output_path: caminho do arquivo criptografado (padrão: file_path + '.enc'); com um
+    destino próprio, a mensagem de sucesso fica a cargo de quem chamou.
+    digests: dicionário em que o SHA-256 do texto claro, calculado durante a
+    leitura, é registrado como digests[file_path] (usado pelo catálogo da pasta).
+    metadata_window: bytes iniciais em que o separador de metadados é procurado (0 desativa).
+    cipher: cifra dos dados (ver cipher_backend.py; padrão: AES-CTR), gravada no cabeçalho.
     """
+    if store is not None:
+        return encrypt_file_deduplicated(file_path, password, store, key_size, chunk_size, compression, digests,
+                                         metadata_window, cipher)
+
     try:
-        with open(file_path, 'rb') as f:
-            everything = f.read()
+        src = open(file_path, 'rb')
     except FileNotFoundError:
         print(f"  ❌ Erro: Arquivo '{file_path}' não encontrado. Pulando.")
         return False
@@ -27,105 +120,329 @@ def encrypt_file(file_path, password, salt, key_size=32):
         print(f"  ❌ Erro ao ler o arquivo '{file_path}': {e}. Pulando.")
         return False
 
-    key = PBKDF2(password.encode('utf-8'), salt, dkLen=key_size, count=10000000)
+    with src:
+        # Procura por metadados apenas no trecho inicial do arquivo
+        try:
+            metadata = read_metadata(src, metadata_window)
+        except Exception as e:
+            print(f"  ❌ Erro ao ler o arquivo '{file_path}': {e}. Pulando.")
+            return False
 
-    # Procura por metadados apenas se o separador existir
-    try:
-        if SEP in everything:
-            metadata_end_index = everything.index(SEP) + len(SEP)
-            metadata = everything[:metadata_end_index]
-            data = everything[metadata_end_index:]
-        else:
-            metadata = b''
-            data = everything
-    except ValueError:
-        metadata = b''
-        data = everything
+        compressor = None
+        if compression and compression != COMPRESSION_NONE:
+            try:
+                data_start = src.tell()
+                sample = src.read(SAMPLE_SIZE)
+                src.seek(data_start)
+                if looks_compressible(sample):
+                    compressor = new_compressor(compression)
+            except Exception as e:
+                print(f"  ❌ Erro ao preparar a compressão de '{file_path}': {e}. Pulando.")
+                return False
+
+        if kdf is None:
+            kdf = default_kdf()
+        try:
+            key = derive_key(password, salt, key_size, kdf)
+        except Exception as e:
+            print(f"  ❌ Erro na derivação da chave para '{file_path}': {e}. Pulando.")
+            return False
+
+        # Os dados usam uma chave própria, embrulhada pela chave da senha no cabeçalho
+        data_key = new_data_key(key_size)
+        try:
+            cipher = resolve_cipher(cipher)
+        except ValueError as e:
+            print(f"  ❌ Erro ao criar a cifra para '{file_path}': {e}.")
+            return False
+
+        encrypted_file_path = output_path or f"{file_path}.enc"
+
+        fields = {
+            FIELD_METADATA: metadata,
+            FIELD_SALT: salt,
+            FIELD_CHUNK_SIZE: chunk_size.to_bytes(4, byteorder='big'),
+            FIELD_KEY_CHECK: key_check_value(key),
+            FIELD_KDF: encode_kdf(kdf),
+            FIELD_WRAPPED_KEY: wrap_key(key, data_key),
+            **cipher_fields(cipher, new_nonce(cipher)),
+        }
+        if compressor is not None:
+            fields[FIELD_COMPRESSION] = compression.encode('ascii')
+        # As tags dos registros cobrem o cabeçalho, então ele precisa estar completo aqui
+        payload = payload_cipher(data_key, fields)
+
+        tmp_path = temp_output_path(encrypted_file_path)
+        try:
+            with open(tmp_path, 'wb') as dst:
+                readinto = progress.counted(metrics.timed('read', src.readinto, 'readinto'))
+                write = metrics.timed('write', dst.write, 'write')
+                transform, flush = encrypt_transform(payload.stream, compressor)
+                if digests is not None:
+                    digest = hashlib.sha256(metadata)
+                    readinto = hashing_reader(readinto, metrics.timed('hash', digest.update))
+
+                write_header_v3(dst, fields)
+                # Os dados criptografados são gravados em registros autenticados
+                auth = record_writer(write, payload, chunk_size)
+                transform_stream(readinto, auth.write, transform, chunk_size,
+                                 os.fstat(src.fileno()).st_size - src.tell(), flush)
+                auth.finish()
+            os.replace(tmp_path, encrypted_file_path)
+            if digests is not None:
+                digests[file_path] = digest.hexdigest()
+            if output_path is None:
+                print(f"  ✅ Criptografado: '{os.path.basename(file_path)}' -> '{os.path.basename(encrypted_file_path)}'")
+            return True
+        except Exception as e:
+            print(f"  ❌ Erro durante a criptografia de '{file_path}': {e}. Pulando.")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+
+def payload_key(key, fields):
+    """
+    Chave que criptografa os dados de um arquivo V3: a chave de dados
+    embrulhada no cabeçalho ou, nos V3 anteriores ao envelope, a própria
+    chave derivada da senha. Lança ValueError se o embrulho não conferir.
+    """
+    if FIELD_WRAPPED_KEY in fields:
+        return unwrap_key(key, fields[FIELD_WRAPPED_KEY])
+    return key
+
+
+def cipher_fields(cipher, nonce):
+    """Campos do cabeçalho que descrevem a cifra dos dados: nonce, cifra e autenticação."""
+    auth = AUTH_HMAC_SHA256_HEADER if cipher == CIPHER_AES_CTR else AUTH_AEAD_HEADER
+    return {
+        FIELD_NONCE: nonce,
+        FIELD_CIPHER: cipher.encode('ascii'),
+        FIELD_AUTH: auth.encode('ascii'),
+    }
+
+
+def payload_cipher(data_key, fields):
+    """
+    Cifra dos dados de um arquivo V3 segundo o cabeçalho: FIELD_CIPHER (sem
+    ele, AES-CTR) e FIELD_AUTH (sem ele, AES-CTR sem autenticação). Com
+    AUTH_HMAC_SHA256_HEADER/AUTH_AEAD_HEADER, as tags cobrem também o
+    cabeçalho (ver vault_format.authenticated_header).
+    Lança ValueError se a cifra ou a autenticação forem desconhecidas ou se
+    o cabeçalho tiver perdido a autenticação.
+    """
+    cipher = fields.get(FIELD_CIPHER, CIPHER_AES_CTR.encode('ascii')).decode('ascii', errors='replace')
+    auth = fields[FIELD_AUTH].decode('ascii', errors='replace') if FIELD_AUTH in fields else None
+    if auth is None:
+        # A chave de dados e a autenticação sempre foram gravadas juntas
+        if FIELD_WRAPPED_KEY in fields:
+            raise ValueError("cabeçalho adulterado: chave de dados sem autenticação")
+        if cipher != CIPHER_AES_CTR:
+            raise ValueError(f"cifra {cipher} sem autenticação")
+        return PayloadCipher(cipher, data_key, fields[FIELD_NONCE], authenticated=False)
+
+    if auth == (AUTH_HMAC_SHA256_HEADER if cipher == CIPHER_AES_CTR else AUTH_AEAD_HEADER):
+        header = header_digest(fields)
+    elif auth == (AUTH_HMAC_SHA256 if cipher == CIPHER_AES_CTR else AUTH_AEAD):
+        header = b''
+    else:
+        raise ValueError(f"autenticação não suportada: {auth}")
+    return PayloadCipher(cipher, data_key, fields[FIELD_NONCE], header=header)
+
+
+def record_writer(write, payload, chunk_size):
+    """
+    AuthenticatedWriter que sela os registros com a cifra do arquivo. Nas
+    cifras autenticadas a cifra é aplicada aqui, registro a registro.
+    """
+    phase = 'auth' if payload.stream is not None else 'encrypt'
+    return AuthenticatedWriter(write, metrics.timed(phase, payload.records.seal), chunk_size)
+
+
+def authenticated_reader(readinto, payload, chunk_size):
+    """
+    Envolve readinto para abrir os registros de um arquivo V3 autenticado,
+    conferindo as tags, e entregar apenas os dados (ainda cifrados no
+    AES-CTR, já decifrados nas cifras autenticadas).
+    Em arquivos sem autenticação, devolve o próprio readinto.
+    """
+    if payload.records is None:
+        return readinto
+    phase = 'auth' if payload.stream is not None else 'decrypt'
+    return AuthenticatedReader(readinto, metrics.timed(phase, payload.records.open), chunk_size).readinto
+
+
+def hashing_reader(readinto, update):
+    """
+    Envolve readinto para passar cada bloco lido a update (ex.: digest.update)
+    antes de ele ser transformado no próprio buffer.
+    """
+    def wrapper(buffer):
+        size_read = readinto(buffer)
+        if size_read:
+            update(memoryview(buffer)[:size_read])
+        return size_read
+    return wrapper
 
+
+def _unchanged(data):
+    return data
+
+
+def _nothing():
+    pass
+
+
+def encrypt_transform(stream, compressor=None):
+    """
+    Monta a etapa de cifra para transform_stream: comprime (se houver
+    compressor) e criptografa cada bloco com a cifra contínua stream (AES-CTR;
+    None nas cifras autenticadas, aplicadas depois, a cada registro).
+    Retorna (transform, flush).
+    """
+    encrypt = metrics.timed('encrypt', stream.process) if stream is not None else _unchanged
+
+    if compressor is None:
+        return encrypt, None
+
+    compress = metrics.timed('compress', compressor.compress)
+
+    def transform(view):
+        data = compress(view)
+        return encrypt(data) if data else b''
+
+    def flush():
+        return encrypt(compressor.flush())
+
+    return transform, flush
+
+
+def decrypt_transform(stream):
+    """
+    Monta a etapa de decifra para transform_stream: descriptografa cada bloco
+    com a cifra contínua stream (no próprio buffer, quando possível; None nas
+    cifras autenticadas, já decifradas na leitura dos registros).
+    """
+    return metrics.timed('decrypt', stream.process) if stream is not None else _unchanged
+
+
+def decompressing_writer(write, decompressor=None):
+    """
+    Envolve write para descomprimir os dados decifrados antes de gravá-los.
+    A saída é gravada em partes limitadas (ver compression.MAX_OUTPUT_SIZE)
+    à medida que é produzida, então a memória não cresce com a razão de
+    compressão. Retorna (write, finish); finish() grava o restante ao fim.
+    """
+    if decompressor is None:
+        return write, _nothing
+
+    # O tempo medido inclui a gravação das partes
+    decompress = metrics.timed('decompress', decompressor.decompress)
+
+    def wrapper(data):
+        decompress(data, write)
+
+    def finish():
+        decompressor.flush(write)
+
+    return wrapper, finish
+
+
+def encrypt_file_deduplicated(file_path, password, store, key_size=32, chunk_size=CHUNK_SIZE, compression=None,
+                              digests=None, metadata_window=METADATA_WINDOW, cipher=None):
+    """
+    Guarda o conteúdo do arquivo no armazenamento de deduplicação, se ainda
+    não estiver lá, e grava em file_path + '.enc' uma referência para ele.
+    digests, metadata_window, cipher: como em encrypt_file.
+    """
     try:
-        cipher = AES.new(key, AES.MODE_CTR)
-        ct = cipher.encrypt(data)
-        nonce = cipher.nonce
-    except ValueError as e:
-        print(f"  ❌ Erro ao criar cifrador AES para '{file_path}': {e}.")
+        with metrics.phase('hash'):
+            content_hash = file_hash(file_path)
+            blob_id = store.blob_id(bytes.fromhex(content_hash))
+    except FileNotFoundError:
+        print(f"  ❌ Erro: Arquivo '{file_path}' não encontrado. Pulando.")
         return False
     except Exception as e:
-        print(f"  ❌ Erro durante a criptografia de '{file_path}': {e}. Pulando.")
+        print(f"  ❌ Erro ao ler o arquivo '{file_path}': {e}. Pulando.")
         return False
 
-    encrypted_file_path = f"{file_path}.enc"
+    blob_path = store.blob_path(blob_id)
+    with store.blob_lock(blob_id):
+        is_new = not os.path.exists(blob_path)
+        if is_new:
+            try:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            except OSError as e:
+                print(f"  ❌ Erro ao preparar o armazenamento para '{file_path}': {e}. Pulando.")
+                return False
+            if not encrypt_file(file_path, password, store.salt, key_size, chunk_size, compression, store.kdf,
+                                output_path=blob_path, metadata_window=metadata_window, cipher=cipher):
+                return False
 
+    encrypted_file_path = f"{file_path}.enc"
+    tmp_path = temp_output_path(encrypted_file_path)
     try:
-        with open(encrypted_file_path, 'wb') as f:
-            f.write(b'ENC_FILE_V2\n')
-            f.write(len(metadata).to_bytes(4, byteorder='big'))
-            f.write(metadata)
-            f.write(salt)
-            f.write(len(nonce).to_bytes(1, byteorder='big'))
-            f.write(nonce)
-            f.write(ct)
-        print(f"  ✅ Criptografado: '{os.path.basename(file_path)}' -> '{os.path.basename(encrypted_file_path)}'")
-        return True
+        with open(tmp_path, 'wb') as dst:
+            write_header_v3(dst, store.reference_fields(blob_id))
+        os.replace(tmp_path, encrypted_file_path)
     except Exception as e:
-        print(f"  ❌ Erro ao escrever o arquivo criptografado '{encrypted_file_path}': {e}. Pulando.")
-        if os.path.exists(encrypted_file_path):
-            os.remove(encrypted_file_path)
+        print(f"  ❌ Erro ao gravar a referência '{encrypted_file_path}': {e}. Pulando.")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return False
 
+    if digests is not None:
+        digests[file_path] = content_hash
+    status = "conteúdo novo" if is_new else "conteúdo já armazenado"
+    print(f"  ✅ Criptografado: '{os.path.basename(file_path)}' -> '{os.path.basename(encrypted_file_path)}' "
+          f"(referência, {status})")
+    return True
+
 
 def decrypt_file_old_format(content, password, key_size=32):
     """
     Descriptografia para arquivos no formato antigo (sem cabeçalho).
     """
-    metadata = b''
-    start_crypto_data = 0
-    
-    if SEP in content:
-        try:
-            metadata_end_index = content.index(SEP) + len(SEP)
-            metadata = content[:metadata_end_index]
-            start_crypto_data = metadata_end_index
-        except ValueError:
-            pass
-    
+    start_crypto_data = split_metadata(content)
+    if not start_crypto_data:
+        # Arquivos antigos foram gravados procurando o separador no arquivo inteiro
+        index = content.find(SEP, METADATA_WINDOW - len(SEP) + 1)
+        if index != -1:
+            start_crypto_data = index + len(SEP)
+    metadata = content[:start_crypto_data]
+
     remaining_content = content[start_crypto_data:]
-    
-    if len(remaining_content) < 32:
-        if len(remaining_content) >= 16 + 8:
-            for nonce_size_alt in [8, 12]:
-                if len(remaining_content) >= 16 + nonce_size_alt:
-                    extracted_salt_alt = remaining_content[:16]
-                    extracted_nonce_alt = remaining_content[16:16+nonce_size_alt]
-                    ct_alt = remaining_content[16+nonce_size_alt:]
-                    try:
-                        key_alt = PBKDF2(password.encode('utf-8'), extracted_salt_alt, dkLen=key_size, count=10000000)
-                        cipher_alt = AES.new(key_alt, AES.MODE_CTR, nonce=extracted_nonce_alt)
-                        plaintext_data_alt = cipher_alt.decrypt(ct_alt)
-                        if any(char.isprintable() for char in plaintext_data_alt[:100].decode('utf-8', errors='ignore')):
-                            return metadata, plaintext_data_alt
-                    except Exception:
-                        pass
-        return None, None
 
-    extracted_salt = remaining_content[:16]
-    extracted_nonce = remaining_content[16:32]
-    ct = remaining_content[32:]
-        
-    try:
-        key = PBKDF2(password.encode('utf-8'), extracted_salt, dkLen=key_size, count=10000000)
-        cipher = AES.new(key, AES.MODE_CTR, nonce=extracted_nonce)
-        plaintext_data = cipher.decrypt(ct)
-        return metadata, plaintext_data
-    except Exception as e:
-        print(f"  Depuração: Erro ao tentar formato antigo padrão (salt 16, nonce 16): {e}")
+    if len(remaining_content) < LEGACY_SALT_SIZE + min(LEGACY_NONCE_SIZES):
         return None, None
 
+    # Uma única derivação: todos os layouts conhecidos usam o mesmo salt de 16 bytes
+    extracted_salt = remaining_content[:LEGACY_SALT_SIZE]
+    key = derive_key(password, extracted_salt, key_size)
+
+    # O tamanho do nonce não foi gravado; testa os layouts conhecidos com a mesma chave
+    for nonce_size in LEGACY_NONCE_SIZES:
+        if len(remaining_content) < LEGACY_SALT_SIZE + nonce_size:
+            continue
+        extracted_nonce = remaining_content[LEGACY_SALT_SIZE:LEGACY_SALT_SIZE+nonce_size]
+        ct = remaining_content[LEGACY_SALT_SIZE+nonce_size:]
+        try:
+            cipher = AES.new(key, AES.MODE_CTR, nonce=extracted_nonce)
+            with metrics.phase('decrypt'):
+                plaintext_data = cipher.decrypt(ct)
+            if any(char.isprintable() for char in plaintext_data[:100].decode('utf-8', errors='ignore')):
+                return metadata, plaintext_data
+        except Exception as e:
+            print(f"  Depuração: Erro ao tentar formato antigo (salt 16, nonce {nonce_size}): {e}")
+
+    return None, None
+
 
 def decrypt_file_new_format(content, password, key_size=32):
     """
     Descriptografia para arquivos no formato novo (com cabeçalho V2).
     """
-    offset = len(b'ENC_FILE_V2\n')
+    offset = len(MAGIC_V2)
     
     if len(content) < offset + 4:
         return None, None
@@ -154,22 +471,268 @@ def decrypt_file_new_format(content, password, key_size=32):
     ct = content[offset:]
 
     try:
-        key = PBKDF2(password.encode('utf-8'), extracted_salt, dkLen=key_size, count=10000000)
+        key = derive_key(password, extracted_salt, key_size)
         cipher = AES.new(key, AES.MODE_CTR, nonce=extracted_nonce)
-        plaintext_data = cipher.decrypt(ct)
+        with metrics.phase('decrypt'):
+            plaintext_data = cipher.decrypt(ct)
         return metadata, plaintext_data
     except Exception as e:
         print(f"  Depuração: Erro ao tentar formato V2: {e}")
         return None, None
 
 
+def decrypted_output_path(file_path):
+    """
+    Retorna o caminho do arquivo descriptografado correspondente a um arquivo .enc.
+    """
+    decrypted_file_path = file_path
+    if decrypted_file_path.endswith('.enc'):
+        decrypted_file_path = decrypted_file_path[:-len('.enc')]
+        if decrypted_file_path.endswith('.new'):
+            decrypted_file_path = decrypted_file_path[:-len('.new')]
+    else:
+        decrypted_file_path = file_path + ".decrypted"
+    return decrypted_file_path
+
+
+def decrypt_file_v3(src, fields, file_path, password, key_size=32):
+    """
+    Descriptografia em blocos para arquivos no formato V3.
+    src deve estar posicionado logo após o cabeçalho, já lido em fields.
+    """
+    metadata = fields.get(FIELD_METADATA, b'')
+    chunk_size = int.from_bytes(fields.get(FIELD_CHUNK_SIZE, b''), byteorder='big') or CHUNK_SIZE
+
+    try:
+        key = derive_key(password, fields[FIELD_SALT], key_size, kdf_from_header(fields.get(FIELD_KDF)))
+    except Exception as e:
+        print(f"  ❌ Erro de descriptografia para '{file_path}': {e}")
+        return False
+
+    # Rejeita a senha errada antes de descriptografar qualquer dado
+    if FIELD_KEY_CHECK in fields and not key_matches(key, fields[FIELD_KEY_CHECK]):
+        print(f"  ❌ Senha incorreta para '{file_path}'.")
+        return False
+
+    try:
+        payload = payload_cipher(payload_key(key, fields), fields)
+        decompressor = None
+        if FIELD_COMPRESSION in fields:
+            decompressor = new_decompressor(fields[FIELD_COMPRESSION].decode('ascii'))
+        readinto = authenticated_reader(progress.counted(metrics.timed('read', src.readinto, 'readinto')),
+                                        payload, chunk_size)
+    except Exception as e:
+        print(f"  ❌ Erro de descriptografia para '{file_path}': {e}")
+        return False
+
+    decrypted_file_path = decrypted_output_path(file_path)
+    tmp_path = temp_output_path(decrypted_file_path)
+
+    try:
+        with open(tmp_path, 'wb') as dst:
+            write = metrics.timed('write', dst.write, 'write')
+            write(metadata)
+            write, finish = decompressing_writer(write, decompressor)
+            transform_stream(readinto, write, decrypt_transform(payload.stream), chunk_size,
+                             os.fstat(src.fileno()).st_size - src.tell())
+            finish()
+        os.replace(tmp_path, decrypted_file_path)
+
+        print(f"  ✅ Descriptografado: '{os.path.basename(file_path)}' -> '{os.path.basename(decrypted_file_path)}'")
+        return True
+    except ValueError as e:
+        # Tag de registro que não confere: nenhum texto claro é deixado no destino
+        print(f"  ❌ '{file_path}' está corrompido: {e}. Pulando.")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    except Exception as e:
+        print(f"  ❌ Erro ao escrever o arquivo descriptografado '{decrypted_file_path}': {e}. Pulando.")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+def decrypt_reference(fields, file_path, password, key_size=32):
+    """
+    Descriptografa um .enc de deduplicação: confere a senha pelo cabeçalho da
+    referência e descriptografa o conteúdo do armazenamento para o destino
+    correspondente a file_path.
+    """
+    try:
+        key = derive_key(password, fields[FIELD_SALT], key_size, kdf_from_header(fields.get(FIELD_KDF)))
+    except Exception as e:
+        print(f"  ❌ Erro de descriptografia para '{file_path}': {e}")
+        return False
+    if not key_matches(key, fields.get(FIELD_KEY_CHECK, b'')):
+        print(f"  ❌ Senha incorreta para '{file_path}'.")
+        return False
+
+    blob_path = resolve_reference(file_path, fields[FIELD_BLOB_REF].decode('ascii', errors='replace'))
+    if blob_path is None or not os.path.isfile(blob_path):
+        print(f"  ❌ Conteúdo referenciado por '{file_path}' não encontrado no armazenamento de deduplicação.")
+        return False
+
+    try:
+        with open(blob_path, 'rb') as src:
+            blob_format, blob_fields = probe_format(src)
+            if blob_format != FORMAT_V3 or FIELD_BLOB_REF in blob_fields:
+                print(f"  ❌ Conteúdo referenciado por '{file_path}' está corrompido.")
+                return False
+            return decrypt_file_v3(src, blob_fields, file_path, password, key_size)
+    except Exception as e:
+        print(f"  ❌ Erro ao ler o conteúdo referenciado por '{file_path}': {e}. Pulando.")
+        return False
+
+
+def password_matches(file_path, password, key_size=32):
+    """
+    Confere a senha contra o valor de verificação do cabeçalho, sem descriptografar dados.
+    Retorna True/False, ou None se o arquivo não tiver valor de verificação.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            file_format, fields = probe_format(f)
+    except Exception:
+        return None
+
+    if file_format != FORMAT_V3 or FIELD_KEY_CHECK not in fields:
+        return None
+
+    try:
+        key = derive_key(password, fields[FIELD_SALT], key_size, kdf_from_header(fields.get(FIELD_KDF)))
+    except Exception:
+        return None
+    return key_matches(key, fields[FIELD_KEY_CHECK])
+
+
+def verify_file(file_path, password, key_size=32, rate_limiter=None):
+    """
+    Verifica um arquivo criptografado sem gravar texto claro: identifica o
+    formato, confere a senha e, nos arquivos autenticados, lê o arquivo
+    inteiro conferindo a tag de cada registro (ver chunk_auth.py), sem
+    descriptografar no AES-CTR (nas cifras autenticadas, a tag só é conferida
+    decifrando o registro, em memória). Referências de deduplicação são verificadas pelo
+    conteúdo correspondente no armazenamento.
+    Arquivos sem o que conferir (V2, formato antigo, V3 sem verificação da
+    senha ou sem autenticação) são informados como não verificáveis e
+    retornam False, como uma falha.
+    rate_limiter: RateLimiter compartilhado pelo lote, que limita a vazão de leitura.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            file_format, fields = probe_format(f)
+            if file_format == FORMAT_V3 and FIELD_KEY_CHECK in fields and FIELD_BLOB_REF not in fields:
+                return verify_payload(f, fields, file_path, password, key_size, rate_limiter)
+    except FileNotFoundError:
+        print(f"  ❌ Erro: Arquivo '{file_path}' não encontrado. Pulando.")
+        return False
+    except Exception as e:
+        print(f"  ❌ Erro ao ler o arquivo '{file_path}': {e}. Pulando.")
+        return False
+
+    if file_format == FORMAT_UNKNOWN:
+        print(f"  ❌ Formato desconhecido para '{file_path}'.")
+        return False
+    if file_format == FORMAT_ARCHIVE:
+        print(f"  ❌ '{file_path}' é um cofre; use a listagem/extração de cofres.")
+        return False
+
+    # Sem verificação da chave nem tags, nada pode ser conferido: conta como falha
+    if file_format != FORMAT_V3 or FIELD_KEY_CHECK not in fields:
+        print(f"  ⚠️ Não verificável: '{os.path.basename(file_path)}' (formato {file_format}, "
+              f"sem verificação da senha nem da integridade)")
+        return False
+
+    # Referência de deduplicação: confere a senha e verifica o conteúdo armazenado
+    try:
+        key = derive_key(password, fields[FIELD_SALT], key_size, kdf_from_header(fields.get(FIELD_KDF)))
+    except Exception as e:
+        print(f"  ❌ Erro na derivação da chave para '{file_path}': {e}.")
+        return False
+    if not key_matches(key, fields[FIELD_KEY_CHECK]):
+        print(f"  ❌ Senha incorreta para '{file_path}'.")
+        return False
+
+    blob_path = resolve_reference(file_path, fields[FIELD_BLOB_REF].decode('ascii', errors='replace'))
+    if blob_path is None or not os.path.isfile(blob_path):
+        print(f"  ❌ Conteúdo referenciado por '{file_path}' não encontrado no armazenamento de deduplicação.")
+        return False
+    try:
+        with open(blob_path, 'rb') as src:
+            blob_format, blob_fields = probe_format(src)
+            if blob_format != FORMAT_V3 or FIELD_BLOB_REF in blob_fields or FIELD_KEY_CHECK not in blob_fields:
+                print(f"  ❌ Conteúdo referenciado por '{file_path}' está corrompido.")
+                return False
+            return verify_payload(src, blob_fields, file_path, password, key_size, rate_limiter)
+    except Exception as e:
+        print(f"  ❌ Erro ao ler o conteúdo referenciado por '{file_path}': {e}.")
+        return False
+
+
+def verify_payload(src, fields, file_path, password, key_size=32, rate_limiter=None):
+    """
+    Confere a senha e as tags dos registros de um arquivo V3, com src
+    posicionado logo após o cabeçalho. Os dados lidos são descartados.
+    """
+    name = os.path.basename(file_path)
+    try:
+        key = derive_key(password, fields[FIELD_SALT], key_size, kdf_from_header(fields.get(FIELD_KDF)))
+    except Exception as e:
+        print(f"  ❌ Erro na derivação da chave para '{file_path}': {e}.")
+        return False
+    if not key_matches(key, fields[FIELD_KEY_CHECK]):
+        print(f"  ❌ Senha incorreta para '{file_path}'.")
+        return False
+
+    # Com a chave de dados embrulhada e sem FIELD_AUTH, payload_cipher acusa a adulteração
+    if FIELD_AUTH not in fields and FIELD_WRAPPED_KEY not in fields:
+        print(f"  ⚠️ Não verificável: '{name}' (V3 sem autenticação: só a senha foi conferida)")
+        return False
+
+    chunk_size = int.from_bytes(fields.get(FIELD_CHUNK_SIZE, b''), byteorder='big') or CHUNK_SIZE
+    readinto = progress.counted(metrics.timed('read', src.readinto, 'readinto'))
+    if rate_limiter is not None:
+        readinto = rate_limiter.wrap(readinto)
+    try:
+        readinto = authenticated_reader(readinto, payload_cipher(payload_key(key, fields), fields), chunk_size)
+        buffer = bytearray(chunk_size)
+        total = 0
+        while True:
+            size_read = readinto(buffer)
+            if not size_read:
+                break
+            total += size_read
+    except ValueError as e:
+        print(f"  ❌ '{file_path}' está corrompido: {e}.")
+        return False
+
+    print(f"  ✅ Verificado: '{name}' (autenticado, {total / (1024 * 1024):.1f} MB)")
+    return True
+
+
 def decrypt_file(file_path, password, key_size=32):
     """
     Função auxiliar para descriptografar um único arquivo.
     """
     try:
         with open(file_path, 'rb') as f:
-            content = f.read()
+            # Escolhe um único caminho de decodificação antes de derivar qualquer chave
+            file_format, fields = probe_format(f)
+            if file_format == FORMAT_UNKNOWN:
+                print(f"  ❌ Formato desconhecido para '{file_path}'. Pulando.")
+                return False
+            if file_format == FORMAT_ARCHIVE:
+                print(f"  ❌ '{file_path}' é um cofre; use a listagem/extração de cofres. Pulando.")
+                return False
+
+            print(f"  📄 Detectado formato {file_format} para '{os.path.basename(file_path)}'")
+            if file_format == FORMAT_V3 and FIELD_BLOB_REF in fields:
+                return decrypt_reference(fields, file_path, password, key_size)
+            if file_format == FORMAT_V3:
+                return decrypt_file_v3(f, fields, file_path, password, key_size)
+            content = metrics.timed('read', f.read, 'read')()
+            progress.advance(len(content))
     except FileNotFoundError:
         print(f"  ❌ Erro: Arquivo '{file_path}' não encontrado. Pulando.")
         return False
@@ -177,66 +740,253 @@ def decrypt_file(file_path, password, key_size=32):
         print(f"  ❌ Erro ao ler o arquivo '{file_path}': {e}. Pulando.")
         return False
 
-    metadata = None
-    plaintext_data = None
-
-    if content.startswith(b'ENC_FILE_V2\n'):
-        print(f"  📄 Detectado formato V2 para '{os.path.basename(file_path)}'")
+    if file_format == FORMAT_V2:
         metadata, plaintext_data = decrypt_file_new_format(content, password, key_size)
-    
-    if metadata is None or plaintext_data is None:
-        print(f"  📄 Tentando formato antigo para '{os.path.basename(file_path)}'")
+    else:
         metadata, plaintext_data = decrypt_file_old_format(content, password, key_size)
 
     if metadata is None or plaintext_data is None:
         print(f"  ❌ Erro de descriptografia para '{file_path}': Senha incorreta ou arquivo corrompido.")
         return False
 
-    decrypted_file_path = file_path
-    if decrypted_file_path.endswith('.enc'):
-        decrypted_file_path = decrypted_file_path[:-len('.enc')]
-        if decrypted_file_path.endswith('.new'):
-            decrypted_file_path = decrypted_file_path[:-len('.new')]
-    else:
-        decrypted_file_path = file_path + ".decrypted"
+    decrypted_file_path = decrypted_output_path(file_path)
+    tmp_path = temp_output_path(decrypted_file_path)
 
     try:
-        with open(decrypted_file_path, 'wb') as f:
-            f.write(metadata)
-            f.write(plaintext_data)
-                
+        with open(tmp_path, 'wb') as f:
+            write = metrics.timed('write', f.write, 'write')
+            write(metadata)
+            write(plaintext_data)
+        os.replace(tmp_path, decrypted_file_path)
+
         print(f"  ✅ Descriptografado: '{os.path.basename(file_path)}' -> '{os.path.basename(decrypted_file_path)}'")
         return True
     except Exception as e:
         print(f"  ❌ Erro ao escrever o arquivo descriptografado '{decrypted_file_path}': {e}. Pulando.")
-        if os.path.exists(decrypted_file_path):
-            os.remove(decrypted_file_path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return False
 
 
-def process_files(file_list, operation, password, salt=None):
+def encrypt_stream(src, dst, password, key_size=32, chunk_size=CHUNK_SIZE, compression=None, kdf=None,
+                   cipher=None):
     """
-    Processa uma lista de arquivos com a operação especificada.
+    Criptografa um fluxo de bytes (ex.: stdin) para outro (ex.: stdout) no formato V3.
+    O V3 não registra o tamanho dos dados (cabeçalho seguido dos registros
+    autenticados, o último marcado como tal), então a entrada pode ter tamanho desconhecido e não precisa permitir seek;
+    a memória usada fica limitada aos buffers do pipeline. Os metadados não são
+    extraídos: o fluxo é gravado como está.
     """
-    successful_operations = []
-    failed_operations = []
+    try:
+        compressor = None
+        if compression and compression != COMPRESSION_NONE:
+            # A amostra lida é devolvida ao fluxo por PrefixedReader
+            sample = src.read(SAMPLE_SIZE)
+            src = PrefixedReader(sample, src)
+            if looks_compressible(sample):
+                compressor = new_compressor(compression)
 
-    for file_path in file_list:
-        print(f"Processando ({operation}): {os.path.basename(file_path)}")
-        
+        salt = get_random_bytes(16)
+        if kdf is None:
+            kdf = default_kdf()
+        key = derive_key(password, salt, key_size, kdf)
+        data_key = new_data_key(key_size)
+        cipher = resolve_cipher(cipher)
+
+        fields = {
+            FIELD_SALT: salt,
+            FIELD_CHUNK_SIZE: chunk_size.to_bytes(4, byteorder='big'),
+            FIELD_KEY_CHECK: key_check_value(key),
+            FIELD_KDF: encode_kdf(kdf),
+            FIELD_WRAPPED_KEY: wrap_key(key, data_key),
+            **cipher_fields(cipher, new_nonce(cipher)),
+        }
+        if compressor is not None:
+            fields[FIELD_COMPRESSION] = compression.encode('ascii')
+        # As tags dos registros cobrem o cabeçalho, então ele precisa estar completo aqui
+        payload = payload_cipher(data_key, fields)
+
+        readinto = metrics.timed('read', src.readinto, 'readinto')
+        write = metrics.timed('write', dst.write, 'write')
+        transform, flush = encrypt_transform(payload.stream, compressor)
+
+        write_header_v3(dst, fields)
+        auth = record_writer(write, payload, chunk_size)
+        transform_stream(readinto, auth.write, transform, chunk_size, flush=flush, pipelined=True)
+        auth.finish()
+        dst.flush()
+        return True
+    except Exception as e:
+        print(f"❌ Erro durante a criptografia do fluxo: {e}")
+        return False
+    finally:
+        clear_key_cache()
+
+
+def decrypt_stream(src, dst, password, key_size=32):
+    """
+    Descriptografa um fluxo V3 (ex.: stdin) para outro (ex.: stdout), sem seek.
+    Referências de deduplicação e os formatos V2/antigo, que dependem do
+    arquivo inteiro, não são aceitos. Cada registro é autenticado antes de ser
+    descriptografado; em um registro corrompido a saída é interrompida, mas o
+    que já foi gravado no destino não é desfeito.
+    """
+    try:
+        if src.read(len(MAGIC_V3)) != MAGIC_V3:
+            print("❌ O fluxo de entrada não está no formato V3.")
+            return False
+        fields = read_header_v3(src)
+        if fields is not None and FIELD_BLOB_REF in fields:
+            print("❌ O fluxo é uma referência de deduplicação; descriptografe a pasta de origem.")
+            return False
+        if fields is None or FIELD_SALT not in fields or FIELD_NONCE not in fields:
+            print("❌ Cabeçalho do fluxo inválido ou truncado.")
+            return False
+
+        key = derive_key(password, fields[FIELD_SALT], key_size, kdf_from_header(fields.get(FIELD_KDF)))
+        if FIELD_KEY_CHECK in fields and not key_matches(key, fields[FIELD_KEY_CHECK]):
+            print("❌ Senha incorreta para o fluxo de entrada.")
+            return False
+
+        payload = payload_cipher(payload_key(key, fields), fields)
+        decompressor = None
+        if FIELD_COMPRESSION in fields:
+            decompressor = new_decompressor(fields[FIELD_COMPRESSION].decode('ascii'))
+        chunk_size = int.from_bytes(fields.get(FIELD_CHUNK_SIZE, b''), byteorder='big') or CHUNK_SIZE
+
+        readinto = authenticated_reader(metrics.timed('read', src.readinto, 'readinto'), payload, chunk_size)
+        write = metrics.timed('write', dst.write, 'write')
+        write(fields.get(FIELD_METADATA, b''))
+        write, finish = decompressing_writer(write, decompressor)
+        transform_stream(readinto, write, decrypt_transform(payload.stream), chunk_size, pipelined=True)
+        finish()
+        dst.flush()
+        return True
+    except Exception as e:
+        print(f"❌ Erro durante a descriptografia do fluxo: {e}")
+        return False
+    finally:
+        clear_key_cache()
+
+
+def process_single_file(file_path, operation, password, salt=None, encrypt_options=None, journal=None):
+    """
+    Processa um único arquivo com a operação especificada.
+    encrypt_options: argumentos extras repassados a encrypt_file (ex.: compression)
+    ou, na verificação, a verify_file (ex.: rate_limiter).
+    journal: JobJournal em que o início e a conclusão do arquivo são registrados.
+    """
+    print(f"Processando ({operation}): {os.path.basename(file_path)}")
+
+    metrics.start_file(file_path, METRIC_OPERATIONS.get(operation, operation))
+    progress.start_file(file_path)
+    if journal is not None:
+        journal.started(file_path)
+    success = False
+    try:
         if operation == "Criptografando":
-            success = encrypt_file(file_path, password, salt)
+            success = encrypt_file(file_path, password, salt, **(encrypt_options or {}))
+        elif operation == "Verificando":
+            success = verify_file(file_path, password, **(encrypt_options or {}))
         else:  # Descriptografando
             success = decrypt_file(file_path, password)
-            
-        if success:
-            successful_operations.append(file_path)
+        if journal is not None:
+            journal.finished(file_path, success)
+        return success
+    finally:
+        metrics.finish_file(success)
+        progress.finish_file()
+
+
+def estimate_work(file_path, operation, chunk_size=CHUNK_SIZE):
+    """
+    Estima o trabalho de um arquivo para o escalonamento do lote, apenas pelo
+    tamanho (o stat da varredura da pasta, em file_selector.cached_size), sem
+    abrir o arquivo. Retorna (bytes a processar, memória necessária): nos
+    formatos em blocos, a memória são os buffers do pipeline. Na
+    descriptografia o formato só é conhecido ao abrir o arquivo, então vale o
+    pior caso, o dos formatos V2 e antigo, que carregam o arquivo inteiro: o
+    arquivo mais o texto claro. Referências de deduplicação contam o próprio
+    tamanho; o progresso corrige o total quando o conteúdo armazenado é lido.
+    """
+    try:
+        size = cached_size(file_path)
+    except OSError:
+        return 0, chunk_size
+
+    # Buffers em circulação mais um bloco de saída (compressão, registro autenticado)
+    buffers = PIPELINE_BUFFERS if size >= PIPELINE_MIN_SIZE else 1
+    memory = (buffers + 1) * chunk_size
+    if operation == "Descriptografando":
+        memory = max(memory, 2 * size)
+    return size, memory
+
+
+def process_files(file_list, operation, password, salt=None, workers=1, stop_on_wrong_password=False,
+                  encrypt_options=None, journal=None):
+    """
+    Processa uma lista de arquivos com a operação especificada.
+    Com workers > 1, os arquivos são processados em paralelo, os maiores
+    primeiro e com a memória das tarefas em andamento limitada ao orçamento
+    de batch_engine.memory_budget(); as listas retornadas e a saída de cada
+    arquivo seguem a ordem de file_list, como no processamento sequencial.
+    Com stop_on_wrong_password, a descriptografia é interrompida no primeiro
+    arquivo cuja senha não confere; os arquivos restantes não são processados.
+    journal: JobJournal do trabalho de pasta, para que possa ser retomado.
+    O progresso (bytes, vazão e tempo restante) é mostrado durante o lote; ver progress.py.
+    """
+    successful_operations = []
+    failed_operations = []
+    cancel = threading.Event()
+    chunk_size = (encrypt_options or {}).get('chunk_size', CHUNK_SIZE)
+    work = {file_path: estimate_work(file_path, operation, chunk_size) for file_path in file_list}
+    sizes = {file_path: size for file_path, (size, _) in work.items()}
+    metrics.start_batch(METRIC_OPERATIONS.get(operation, operation))
+    progress.start_batch(operation, sizes)
+
+    try:
+        if workers > 1 and len(file_list) > 1:
+            costs = {file_path: memory for file_path, (_, memory) in work.items()}
+            results = run_parallel(process_single_file, file_list, workers, operation, password, salt,
+                                   encrypt_options, journal, sizes=sizes, costs=costs, cancel=cancel)
         else:
-            failed_operations.append(file_path)
+            results = ((file_path, process_single_file(file_path, operation, password, salt, encrypt_options,
+                                                       journal))
+                       for file_path in file_list if not cancel.is_set())
+
+        for file_path, success in results:
+            if success:
+                successful_operations.append(file_path)
+            else:
+                failed_operations.append(file_path)
+                if (stop_on_wrong_password and operation != "Criptografando"
+                        and not cancel.is_set() and password_matches(file_path, password) is False):
+                    print("⛔ Senha incorreta detectada. Interrompendo o processamento dos arquivos restantes.")
+                    cancel.set()
+    finally:
+        # As chaves derivadas valem apenas para este lote
+        clear_key_cache()
+        progress.finish_batch()
+        show_metrics_summary(metrics.finish_batch())
 
     return successful_operations, failed_operations
 
 
+def show_metrics_summary(summary):
+    """
+    Mostra o resumo de métricas de um lote, se as métricas estiverem ativas.
+    """
+    if summary is None or not summary['files']:
+        return
+    print(f"\n📊 Métricas ({summary['operation']}): {summary['files']} arquivo(s) em {summary['seconds']:.2f} s, "
+          f"{summary['mb_per_s'] or 0:.1f} MB/s, {summary['files_per_s'] or 0:.1f} arquivos/s")
+    print(f"   Duração por arquivo: p50 {summary['p50_seconds']:.3f} s, p90 {summary['p90_seconds']:.3f} s, "
+          f"p99 {summary['p99_seconds']:.3f} s, máx {summary['max_seconds']:.3f} s")
+    phases = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in sorted(summary['phase_seconds'].items()))
+    if phases:
+        print(f"   Tempo por fase: {phases}")
+
+
 def show_operation_summary(operation, successful, failed):
     """
     Mostra resumo da operação realizada.
@@ -268,18 +1018,63 @@ def ask_delete_originals(successful_operations, operation):
     
     delete_originals = input(message).lower()
     if delete_originals == 's':
-        for file_path in successful_operations:
-            try:
-                os.remove(file_path)
-                print(f"  Removido {file_type}: '{os.path.basename(file_path)}'")
-            except Exception as e:
-                print(f"  ❌ Erro ao remover o arquivo {file_type} '{os.path.basename(file_path)}': {e}")
+        delete_files(successful_operations, file_type)
     else:
         print(f"Arquivos {file_type}s não serão removidos.")
 
 
+def delete_files(file_list, file_type):
+    """
+    Remove os arquivos da lista, informando cada remoção.
+    file_type: 'original' ou 'criptografado'
+    """
+    for file_path in file_list:
+        metrics.start_file(file_path, 'delete')
+        try:
+            with metrics.phase('delete'):
+                os.remove(file_path)
+            metrics.finish_file(True)
+            print(f"  Removido {file_type}: '{os.path.basename(file_path)}'")
+        except Exception as e:
+            metrics.finish_file(False)
+            print(f"  ❌ Erro ao remover o arquivo {file_type} '{os.path.basename(file_path)}': {e}")
+
+
+def ask_incremental():
+    """
+    Pergunta se a criptografia da pasta deve ignorar arquivos inalterados.
+    """
+    answer = input("Criptografar apenas arquivos novos ou modificados desde a última execução? (s/N): ").lower()
+    return answer == 's'
+
+
+def ask_dedup():
+    """
+    Pergunta se arquivos de conteúdo idêntico devem ser guardados uma única vez.
+    """
+    answer = input("Guardar uma única vez os arquivos de conteúdo idêntico (deduplicação)? (s/N): ").lower()
+    return answer == 's'
+
+
+def ask_resume():
+    """
+    Pergunta se o trabalho interrompido da pasta deve ser retomado.
+    """
+    print("\n⚠️ Há um trabalho interrompido nesta pasta.")
+    answer = input("Retomar de onde parou? (S/n): ").lower()
+    return answer != 'n'
+
+
+def ask_stop_on_wrong_password():
+    """
+    Pergunta se a descriptografia deve parar no primeiro arquivo com senha incorreta.
+    """
+    answer = input("Interromper no primeiro arquivo com senha incorreta? (s/N): ").lower()
+    return answer == 's'
+
+
 # Funções principais para serem chamadas pelo main.py
-def encrypt_selected_files(path_folder):
+def encrypt_selected_files(path_folder, workers=DEFAULT_WORKERS):
     """Criptografia seletiva de arquivos."""
     print(f"Criptografia seletiva na pasta: '{path_folder}'")
     
@@ -300,14 +1095,14 @@ def encrypt_selected_files(path_folder):
     
     print(f"Iniciando criptografia de {len(selected_files)} arquivo(s)...\n")
     
-    successful, failed = process_files(selected_files, "Criptografando", password, session_salt)
+    successful, failed = process_files(selected_files, "Criptografando", password, session_salt, workers)
     show_operation_summary("Criptografia", successful, failed)
     ask_delete_originals(successful, "Criptografia")
     
     print("\nCriptografia seletiva concluída.")
 
 
-def decrypt_selected_files(path_folder):
+def decrypt_selected_files(path_folder, workers=DEFAULT_WORKERS, stop_on_wrong_password=None):
     """Descriptografia seletiva de arquivos."""
     print(f"Descriptografia seletiva na pasta: '{path_folder}'")
     
@@ -323,17 +1118,349 @@ def decrypt_selected_files(path_folder):
         print("Senha não pode ser vazia. Descriptografia abortada.")
         return
 
+    if stop_on_wrong_password is None:
+        stop_on_wrong_password = ask_stop_on_wrong_password()
+
     print(f"Iniciando descriptografia de {len(selected_files)} arquivo(s)...\n")
     
-    successful, failed = process_files(selected_files, "Descriptografando", password)
+    successful, failed = process_files(selected_files, "Descriptografando", password, workers=workers,
+                                       stop_on_wrong_password=stop_on_wrong_password)
     show_operation_summary("Descriptografia", successful, failed)
     ask_delete_originals(successful, "Descriptografia")
     
     print("\nDescriptografia seletiva concluída.")
 
 
-def encrypt_folder(path_folder):
+def encrypt_folder_files(path_folder, password, salt, workers=DEFAULT_WORKERS, incremental=False, use_hash=False,
+                         encrypt_options=None, dedup=False):
+    """
+    Criptografa os arquivos da pasta sem interagir com o usuário.
+    Com incremental, apenas arquivos novos ou modificados desde a última
+    execução (segundo o manifesto da pasta) são criptografados; com use_hash,
+    também os de conteúdo igual ao SHA-256 registrado no catálogo são ignorados.
+    Com dedup, arquivos de conteúdo idêntico são guardados uma única vez no
+    armazenamento da pasta e os .enc passam a ser referências (ver dedup_store.py).
+    encrypt_options: argumentos extras repassados a encrypt_file.
+    Retorna (sucessos, falhas), ou None se a pasta não tiver arquivos.
+    """
+    scan = scan_folder(path_folder)
+    files_to_process = get_files_for_encryption(path_folder, scan)
+
+    if not files_to_process:
+        print("Nenhum arquivo encontrado para criptografar na pasta.")
+        return None
+
+    print(f"Encontrados {len(files_to_process)} arquivos para criptografar.")
+
+    all_files = files_to_process
+    manifest = load_manifest(path_folder)
+    # O SHA-256 de cada arquivo fica apenas no catálogo, que é criptografado
+    catalog = load_catalog(path_folder, password)
+    digests = catalog_digests(path_folder, catalog) if use_hash and catalog else None
+    files_to_process, unchanged, stats = filter_changed_files(
+        path_folder, all_files, manifest if incremental else {}, digests, scan)
+    if unchanged:
+        print(f"{len(unchanged)} arquivo(s) inalterado(s) desde a última execução serão ignorados.")
+
+    if not files_to_process:
+        print("Nenhum arquivo novo ou modificado para criptografar.")
+        save_folder_manifest(path_folder, manifest, [], stats, all_files)
+        return [], []
+
+    # Os parâmetros ficam no diário para que uma retomada grave arquivos idênticos
+    encrypt_options = dict(encrypt_options or {})
+    if encrypt_options.get('kdf') is None:
+        encrypt_options['kdf'] = default_kdf()
+    encrypt_options['cipher'] = resolve_cipher(encrypt_options.get('cipher'))
+    params = {
+        'salt': salt.hex(),
+        'kdf': encrypt_options['kdf'],
+        'compression': encrypt_options.get('compression'),
+        'cipher': encrypt_options['cipher'],
+        'metadata_window': encrypt_options.get('metadata_window', METADATA_WINDOW),
+        'dedup': dedup,
+    }
+    if dedup:
+        store = open_store(path_folder, password)
+        if store is None:
+            return [], files_to_process
+        encrypt_options['store'] = store
+        catalog_key = (store.key, store.salt, store.kdf)
+    else:
+        key = derive_key(password, salt, kdf=encrypt_options['kdf'])
+        params['key_check'] = key_check_value(key).hex()
+        catalog_key = (key, salt, encrypt_options['kdf'])
+    encrypt_options['digests'] = {}
+
+    journal = open_journal(path_folder, 'encrypt', files_to_process, params)
+    successful, failed = run_folder_job(journal, files_to_process, "Criptografando", password, salt, workers,
+                                        encrypt_options=encrypt_options)
+
+    save_folder_manifest(path_folder, manifest, successful, stats, all_files)
+    save_folder_catalog(path_folder, catalog, catalog_key, successful, stats, encrypt_options['digests'], dedup, scan)
+    return successful, failed
+
+
+def encrypt_new_files(path_folder, file_list, password, salt, workers=DEFAULT_WORKERS, encrypt_options=None,
+                      delete_originals=False, catalog=None, catalog_key=None):
+    """
+    Criptografa um lote de arquivos da pasta vindo do modo de vigilância
+    (folder_watcher.py). Arquivos inalterados desde a última criptografia,
+    segundo o manifesto, são ignorados. O manifesto e o catálogo são
+    atualizados apenas com o lote, sem percorrer a pasta de novo.
+    catalog, catalog_key: como em save_folder_catalog.
+    Retorna (sucessos, falhas).
+    """
+    manifest = load_manifest(path_folder)
+    files_to_process, _, stats = filter_changed_files(path_folder, file_list, manifest)
+    if not files_to_process:
+        return [], []
+
+    print(f"\n📄 {len(files_to_process)} arquivo(s) novo(s) ou modificado(s) para criptografar.")
+    encrypt_options = dict(encrypt_options or {})
+    encrypt_options['digests'] = {}
+    successful, failed = process_files(files_to_process, "Criptografando", password, salt, workers,
+                                       encrypt_options=encrypt_options)
+
+    try:
+        update_manifest(path_folder, manifest, successful, stats)
+        save_manifest(path_folder, manifest)
+    except Exception as e:
+        print(f"⚠️ Não foi possível atualizar o manifesto da pasta: {e}")
+    if catalog is not None:
+        try:
+            update_catalog(path_folder, catalog, successful, stats, encrypt_options['digests'])
+            save_catalog(path_folder, catalog, *catalog_key)
+        except Exception as e:
+            print(f"⚠️ Não foi possível atualizar o catálogo da pasta: {e}")
+
+    show_operation_summary("Criptografia", successful, failed)
+    if delete_originals:
+        delete_files(successful, "original")
+    return successful, failed
+
+
+def watch_folder_files(path_folder, password, salt, workers=DEFAULT_WORKERS, encrypt_options=None,
+                       delete_originals=False, poll=False):
+    """
+    Vigia a pasta e criptografa os arquivos novos ou modificados assim que
+    ficam quietos, até ser interrompido. Retorna False se a senha não conferir
+    com a do catálogo da pasta.
+    """
+    # Importado sob demanda: só o modo de vigilância usa o inotify
+    from folder_watcher import watch_folder
+
+    encrypt_options = dict(encrypt_options or {})
+    if encrypt_options.get('kdf') is None:
+        encrypt_options['kdf'] = default_kdf()
+    catalog = load_catalog(path_folder, password)
+    if catalog is None:
+        return False
+    catalog_key = (derive_key(password, salt, kdf=encrypt_options['kdf']), salt, encrypt_options['kdf'])
+
+    def handle_batch(file_list):
+        encrypt_new_files(path_folder, file_list, password, salt, workers, encrypt_options, delete_originals,
+                          catalog, catalog_key)
+
+    watch_folder(path_folder, handle_batch, poll)
+    return True
+
+
+def save_folder_manifest(path_folder, manifest, successful, stats, all_files):
+    """
+    Registra os arquivos criptografados no manifesto da pasta e o grava.
+    """
+    try:
+        update_manifest(path_folder, manifest, successful, stats, keep_files=all_files)
+        save_manifest(path_folder, manifest)
+    except Exception as e:
+        print(f"⚠️ Não foi possível atualizar o manifesto da pasta: {e}")
+
+
+def save_folder_catalog(path_folder, catalog, catalog_key, successful, stats, digests, dedup=False, scan=None):
+    """
+    Registra os arquivos criptografados no catálogo da pasta e o grava.
+    catalog: entradas já carregadas (None se o catálogo existente não pôde ser lido,
+    caso em que ele não é alterado); catalog_key: (chave, salt, kdf) do trabalho.
+    scan: varredura da pasta já feita pelo trabalho, para não percorrê-la de
+    novo; os .enc gravados depois dela são os de successful.
+    """
+    if catalog is None:
+        print("⚠️ O catálogo da pasta não foi atualizado.")
+        return
+    try:
+        encrypted_files = get_files_for_decryption(path_folder, scan)
+        update_catalog(path_folder, catalog, successful, stats, digests, dedup, encrypted_files)
+        save_catalog(path_folder, catalog, *catalog_key)
+    except Exception as e:
+        print(f"⚠️ Não foi possível atualizar o catálogo da pasta: {e}")
+
+
+def open_journal(path_folder, job_operation, file_list, params):
+    """
+    Cria o diário de um trabalho de pasta. Se não for possível gravá-lo, o
+    trabalho segue sem a possibilidade de retomada.
+    """
+    try:
+        return start_job(path_folder, job_operation, file_list, params)
+    except OSError as e:
+        print(f"⚠️ Não foi possível criar o diário do trabalho ({e}); ele não poderá ser retomado.")
+        return None
+
+
+def run_folder_job(journal, file_list, operation, password, salt=None, workers=DEFAULT_WORKERS,
+                   stop_on_wrong_password=False, encrypt_options=None):
+    """
+    Processa os arquivos de um trabalho de pasta, registrando-os no diário.
+    O diário é removido quando todos os arquivos foram processados; se o
+    trabalho for interrompido, ele é mantido para resume_folder_job.
+    """
+    try:
+        successful, failed = process_files(file_list, operation, password, salt, workers, stop_on_wrong_password,
+                                           encrypt_options, journal)
+    except BaseException:
+        if journal is not None:
+            journal.close()
+            print("\n⛔ Trabalho interrompido. Ele pode ser retomado de onde parou.")
+        raise
+
+    if journal is not None:
+        if len(successful) + len(failed) == len(file_list):
+            journal.complete()
+        else:
+            journal.close()
+            print("⚠️ Trabalho incompleto. Ele pode ser retomado para processar os arquivos restantes.")
+    return successful, failed
+
+
+def has_pending_job(path_folder):
+    """Indica se a pasta tem um trabalho interrompido que pode ser retomado."""
+    return os.path.exists(journal_path(path_folder))
+
+
+def discard_temp_outputs(file_list, operation):
+    """
+    Remove os arquivos temporários deixados por um trabalho interrompido
+    durante o processamento dos arquivos indicados.
+    """
+    for file_path in file_list:
+        if operation == "Criptografando":
+            output_path = f"{file_path}.enc"
+        else:
+            output_path = decrypted_output_path(file_path)
+        try:
+            os.remove(temp_output_path(output_path))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ Não foi possível remover o temporário de '{file_path}': {e}")
+
+
+def resume_folder_job(path_folder, password, workers=DEFAULT_WORKERS):
+    """
+    Retoma o trabalho interrompido da pasta, processando apenas os arquivos
+    que não foram concluídos com sucesso (os que falharam são tentados de novo).
+    Retorna (operação, sucessos, falhas), com os concluídos antes da
+    interrupção entre os sucessos, ou None se não houver trabalho a retomar
+    ou a senha não conferir.
+    """
+    try:
+        job = load_job(path_folder)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Diário de trabalho inválido em '{path_folder}': {e}")
+        return None
+    if job is None:
+        print(f"Nenhum trabalho interrompido encontrado em '{path_folder}'.")
+        return None
+
+    params = job['params']
+    encrypting = job['operation'] == 'encrypt'
+    operation = "Criptografando" if encrypting else "Descriptografando"
+    remaining = [file_path for file_path in job['files'] if file_path not in job['completed']]
+    done_before = [file_path for file_path in job['files'] if file_path in job['completed']]
+    print(f"Retomando trabalho ({operation}): {len(done_before)} de {len(job['files'])} arquivo(s) já "
+          f"concluído(s), {len(remaining)} restante(s).")
+
+    salt = None
+    encrypt_options = None
+    if encrypting:
+        try:
+            salt = bytes.fromhex(params['salt'])
+            encrypt_options = {
+                'compression': params.get('compression'),
+                'cipher': resolve_cipher(params.get('cipher')),
+                'kdf': check_kdf(params['kdf']),
+                'metadata_window': int(params.get('metadata_window', METADATA_WINDOW)),
+            }
+        except (KeyError, ValueError) as e:
+            print(f"❌ Diário de trabalho inválido em '{path_folder}': {e}")
+            return None
+        if params.get('dedup'):
+            store = open_store(path_folder, password)
+            if store is None:
+                return None
+            encrypt_options['store'] = store
+            catalog_key = (store.key, store.salt, store.kdf)
+        else:
+            key = derive_key(password, salt, kdf=encrypt_options['kdf'])
+            if 'key_check' in params and not key_matches(key, bytes.fromhex(params['key_check'])):
+                print("❌ A senha não confere com a usada no trabalho interrompido.")
+                clear_key_cache()
+                return None
+            catalog_key = (key, salt, encrypt_options['kdf'])
+        catalog = load_catalog(path_folder, password)
+        encrypt_options['digests'] = {}
+
+    discard_temp_outputs(remaining, operation)
+    try:
+        journal = reopen_job(path_folder)
+    except OSError as e:
+        print(f"⚠️ Não foi possível reabrir o diário do trabalho ({e}); ele não poderá ser retomado de novo.")
+        journal = None
+
+    successful, failed = run_folder_job(journal, remaining, operation, password, salt, workers,
+                                        params.get('stop_on_wrong_password', False), encrypt_options)
+    successful = done_before + successful
+
+    if encrypting:
+        # Uma única varredura serve ao manifesto e ao catálogo
+        scan = scan_folder(path_folder)
+        _, _, stats = filter_changed_files(path_folder, successful, {}, scan=scan)
+        save_folder_manifest(path_folder, load_manifest(path_folder), successful, stats,
+                             get_files_for_encryption(path_folder, scan))
+        # O SHA-256 dos arquivos concluídos antes da interrupção não é conhecido e fica vazio no catálogo
+        save_folder_catalog(path_folder, catalog, catalog_key, successful, stats, encrypt_options['digests'],
+                            params.get('dedup', False), scan)
+    return job['operation'], successful, failed
+
+
+def decrypt_folder_files(path_folder, password, workers=DEFAULT_WORKERS, stop_on_wrong_password=False):
+    """
+    Descriptografa os arquivos .enc da pasta sem interagir com o usuário,
+    registrando o trabalho no diário para que possa ser retomado.
+    Retorna (sucessos, falhas), ou None se a pasta não tiver arquivos .enc.
+    """
+    files_to_process = get_files_for_decryption(path_folder)
+
+    if not files_to_process:
+        print("Nenhum arquivo .enc encontrado para descriptografar na pasta.")
+        return None
+
+    print(f"Encontrados {len(files_to_process)} arquivos .enc para descriptografar.")
+
+    journal = open_journal(path_folder, 'decrypt', files_to_process,
+                           {'stop_on_wrong_password': stop_on_wrong_password})
+    return run_folder_job(journal, files_to_process, "Descriptografando", password, workers=workers,
+                          stop_on_wrong_password=stop_on_wrong_password)
+
+
+def encrypt_folder(path_folder, workers=DEFAULT_WORKERS, incremental=None, use_hash=False, encrypt_options=None,
+                   dedup=None):
     """Criptografia de todos os arquivos da pasta."""
+    if has_pending_job(path_folder) and ask_resume():
+        resume_folder(path_folder, workers)
+        return
+
     print(f"Iniciando criptografia da pasta: '{path_folder}'")
 
     password = getpass("Digite a senha de criptografia para todos os arquivos: ")
@@ -344,23 +1471,29 @@ def encrypt_folder(path_folder):
     session_salt = get_random_bytes(16)
     print("\n⚠️ IMPORTANTE: Guarde bem a senha que você digitou. Sem ela, seus arquivos NÃO poderão ser recuperados.")
 
-    files_to_process = get_files_for_encryption(path_folder)
+    if incremental is None:
+        incremental = os.path.exists(manifest_path(path_folder)) and ask_incremental()
+    if dedup is None:
+        dedup = ask_dedup()
 
-    if not files_to_process:
-        print("Nenhum arquivo encontrado para criptografar na pasta.")
+    result = encrypt_folder_files(path_folder, password, session_salt, workers, incremental, use_hash,
+                                  encrypt_options, dedup)
+    if result is None:
         return
 
-    print(f"Encontrados {len(files_to_process)} arquivos para criptografar.")
-
-    successful, failed = process_files(files_to_process, "Criptografando", password, session_salt)
+    successful, failed = result
     show_operation_summary("Criptografia", successful, failed)
     ask_delete_originals(successful, "Criptografia")
 
     print("\nCriptografia de pasta concluída.")
 
 
-def decrypt_folder(path_folder):
+def decrypt_folder(path_folder, workers=DEFAULT_WORKERS, stop_on_wrong_password=None):
     """Descriptografia de todos os arquivos .enc da pasta."""
+    if has_pending_job(path_folder) and ask_resume():
+        resume_folder(path_folder, workers)
+        return
+
     print(f"Iniciando descriptografia da pasta: '{path_folder}'")
 
     password = getpass("Digite a senha de descriptografia para todos os arquivos: ")
@@ -368,16 +1501,69 @@ def decrypt_folder(path_folder):
         print("Senha não pode ser vazia. Descriptografia abortada.")
         return
 
-    files_to_process = get_files_for_decryption(path_folder)
+    if stop_on_wrong_password is None and get_files_for_decryption(path_folder):
+        stop_on_wrong_password = ask_stop_on_wrong_password()
 
-    if not files_to_process:
-        print("Nenhum arquivo .enc encontrado para descriptografar na pasta.")
+    result = decrypt_folder_files(path_folder, password, workers, bool(stop_on_wrong_password))
+    if result is None:
         return
 
-    print(f"Encontrados {len(files_to_process)} arquivos .enc para descriptografar.")
-
-    successful, failed = process_files(files_to_process, "Descriptografando", password)
+    successful, failed = result
     show_operation_summary("Descriptografia", successful, failed)
     ask_delete_originals(successful, "Descriptografia")
 
-    print("\nDescriptografia de pasta concluída.")
\ No newline at end of file
+    print("\nDescriptografia de pasta concluída.")
+
+
+def verify_folder(path_folder, workers=DEFAULT_WORKERS):
+    """Verifica a integridade de todos os arquivos .enc da pasta, sem gravar texto claro."""
+    files_to_process = get_files_for_decryption(path_folder)
+    if not files_to_process:
+        print("Nenhum arquivo .enc encontrado para verificar na pasta.")
+        return
+
+    print(f"Verificando {len(files_to_process)} arquivo(s) .enc da pasta: '{path_folder}'")
+    password = getpass("Digite a senha dos arquivos: ")
+    if not password:
+        print("Senha não pode ser vazia. Verificação abortada.")
+        return
+
+    successful, failed = process_files(files_to_process, "Verificando", password, workers=workers)
+    show_operation_summary("Verificação", successful, failed)
+
+
+def watch_folder(path_folder, workers=DEFAULT_WORKERS):
+    """Vigia a pasta e criptografa os arquivos que forem chegando."""
+    print(f"Vigiando a pasta para criptografar os arquivos novos: '{path_folder}'")
+
+    password = getpass("Digite a senha de criptografia para os arquivos da pasta: ")
+    if not password:
+        print("Senha não pode ser vazia. Operação abortada.")
+        return
+
+    session_salt = get_random_bytes(16)
+    print("\n⚠️ IMPORTANTE: Guarde bem a senha que você digitou. Sem ela, seus arquivos NÃO poderão ser recuperados.")
+    answer = input("Remover os originais depois de criptografados? (s/N): ").lower()
+
+    watch_folder_files(path_folder, password, session_salt, workers, delete_originals=answer == 's')
+
+
+def resume_folder(path_folder, workers=DEFAULT_WORKERS):
+    """Retoma o trabalho interrompido da pasta."""
+    print(f"Retomando o trabalho interrompido na pasta: '{path_folder}'")
+
+    password = getpass("Digite a senha usada no trabalho interrompido: ")
+    if not password:
+        print("Senha não pode ser vazia. Operação abortada.")
+        return
+
+    result = resume_folder_job(path_folder, password, workers)
+    if result is None:
+        return
+
+    job_operation, successful, failed = result
+    summary = "Criptografia" if job_operation == 'encrypt' else "Descriptografia"
+    show_operation_summary(summary, successful, failed)
+    ask_delete_originals(successful, summary)
+
+    print("\nTrabalho retomado concluído.")
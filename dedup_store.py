@@ -0,0 +1,165 @@
+"""
+Módulo para o armazenamento de conteúdo deduplicado (endereçado por conteúdo).
+
+No modo de deduplicação, o conteúdo de cada arquivo é guardado uma única vez
+em DEDUP_STORE_NAME, na raiz da pasta criptografada, e cada arquivo .enc
+passa a ser uma referência pequena para esse conteúdo. Cópias idênticas (o
+mesmo PDF em dezenas de pastas) ocupam o espaço de um único arquivo.
+
+O nome de cada conteúdo é um HMAC-SHA256 do SHA-256 do texto claro, com uma
+chave de identificação aleatória guardada em STORE_INFO_NAME, embrulhada pela
+chave da senha: sem a senha, não é possível saber se um arquivo conhecido
+está guardado, e a troca de senha não muda os nomes. O salt, os parâmetros do KDF e o valor de verificação
+da chave ficam em STORE_INFO_NAME, e todas as referências e conteúdos usam
+esse mesmo salt.
+
+Conteúdos que deixam de ser referenciados não são removidos automaticamente.
+"""
+import hashlib
+import hmac
+import json
+import os
+import threading
+
+from Crypto.Random import get_random_bytes
+
+from key_derivation import (
+    derive_key, key_check_value, key_matches, default_kdf, check_kdf, encode_kdf, new_data_key, wrap_key, unwrap_key,
+)
+from vault_format import DEDUP_STORE_NAME, FIELD_SALT, FIELD_KEY_CHECK, FIELD_KDF, FIELD_BLOB_REF
+
+STORE_INFO_NAME = 'store.json'
+STORE_VERSION = 1
+
+
+class DedupStore:
+    """Armazenamento de conteúdo de uma pasta, já aberto com a senha."""
+
+    def __init__(self, root, key, salt, kdf, id_key=None):
+        self.root = root
+        self.key = key
+        self.salt = salt
+        self.kdf = kdf
+        # Armazenamentos anteriores à chave de identificação usam a chave da senha
+        self.id_key = id_key or key
+        self._lock = threading.Lock()
+        self._blob_locks = {}
+
+    def blob_id(self, digest):
+        """Nome do conteúdo a partir do SHA-256 do texto claro."""
+        return hmac.new(self.id_key, digest, hashlib.sha256).hexdigest()
+
+    def blob_path(self, blob_id):
+        """Caminho do conteúdo neste armazenamento."""
+        return blob_path(self.root, blob_id)
+
+    def blob_lock(self, blob_id):
+        """Lock por conteúdo, para que cópias processadas em paralelo o gravem uma única vez."""
+        with self._lock:
+            return self._blob_locks.setdefault(blob_id, threading.Lock())
+
+    def reference_fields(self, blob_id):
+        """Campos do cabeçalho de uma referência para o conteúdo."""
+        return {
+            FIELD_SALT: self.salt,
+            FIELD_KEY_CHECK: key_check_value(self.key),
+            FIELD_KDF: encode_kdf(self.kdf),
+            FIELD_BLOB_REF: blob_id.encode('ascii'),
+        }
+
+
+def blob_path(root, blob_id):
+    """Caminho do conteúdo, distribuído em subpastas pelos dois primeiros caracteres."""
+    return os.path.join(root, blob_id[:2], blob_id + '.enc')
+
+
+def resolve_reference(file_path, blob_id):
+    """
+    Localiza o conteúdo referenciado por um .enc de deduplicação.
+    Retorna o caminho do conteúdo ou None se o identificador for inválido
+    ou o armazenamento não for encontrado.
+    """
+    if len(blob_id) != 64 or any(c not in '0123456789abcdef' for c in blob_id):
+        return None
+    root = find_store_root(file_path)
+    if root is None:
+        return None
+    return blob_path(root, blob_id)
+
+
+def store_root(path_folder):
+    """Caminho do armazenamento de uma pasta."""
+    return os.path.join(path_folder, DEDUP_STORE_NAME)
+
+
+def find_store_root(file_path):
+    """
+    Procura o armazenamento na pasta do arquivo e nas pastas acima dela.
+    Retorna o caminho encontrado ou None.
+    """
+    folder = os.path.dirname(os.path.abspath(file_path))
+    while True:
+        candidate = store_root(folder)
+        if os.path.isfile(os.path.join(candidate, STORE_INFO_NAME)):
+            return candidate
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            return None
+        folder = parent
+
+
+def open_store(path_folder, password, key_size=32):
+    """
+    Abre o armazenamento da pasta, criando-o se ainda não existir.
+    Retorna o DedupStore ou None se a senha não conferir ou houver erro.
+    """
+    root = store_root(path_folder)
+    info_path = os.path.join(root, STORE_INFO_NAME)
+
+    try:
+        with open(info_path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        salt = bytes.fromhex(info['salt'])
+        kdf = check_kdf(info['kdf'])
+        key = derive_key(password, salt, key_size, kdf)
+        if not key_matches(key, bytes.fromhex(info['key_check'])):
+            print("❌ A senha não confere com a usada no armazenamento de deduplicação desta pasta.")
+            return None
+        id_key = unwrap_key(key, bytes.fromhex(info['id_key'])) if 'id_key' in info else None
+        return DedupStore(root, key, salt, kdf, id_key)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"❌ Armazenamento de deduplicação inválido em '{root}': {e}")
+        return None
+
+    salt = get_random_bytes(16)
+    kdf = default_kdf()
+    key = derive_key(password, salt, key_size, kdf)
+    id_key = new_data_key(key_size)
+    try:
+        save_store_info(root, salt, kdf, key, id_key)
+    except OSError as e:
+        print(f"❌ Não foi possível criar o armazenamento de deduplicação em '{root}': {e}")
+        return None
+    return DedupStore(root, key, salt, kdf, id_key)
+
+
+def save_store_info(root, salt, kdf, key, id_key):
+    """
+    Grava STORE_INFO_NAME de forma atômica, com a chave de identificação
+    embrulhada pela chave da senha (key). Lança OSError em caso de erro.
+    """
+    info = {
+        'version': STORE_VERSION,
+        'salt': salt.hex(),
+        'kdf': kdf,
+        'key_check': key_check_value(key).hex(),
+        'id_key': wrap_key(key, id_key).hex(),
+    }
+    os.makedirs(root, exist_ok=True)
+    info_path = os.path.join(root, STORE_INFO_NAME)
+    tmp_path = info_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2)
+    os.replace(tmp_path, info_path)
@@ -2,6 +2,91 @@
 Módulo para seleção de arquivos para processamento.
 """
 import os
+from collections import namedtuple
+
+from vault_format import DEDUP_STORE_NAME
+
+# Arquivo encontrado na varredura, com o stat já obtido (None se indisponível)
+ScanEntry = namedtuple('ScanEntry', ['path', 'name', 'stat'])
+
+# Resultado de uma varredura: arquivos em texto claro (candidatos à criptografia),
+# arquivos .enc e a quantidade de arquivos .enc que não são ocultos
+FolderScan = namedtuple('FolderScan', ['plaintext', 'encrypted', 'visible_encrypted'])
+
+# Stat dos arquivos vistos na última varredura, usado para exibir tamanhos
+# sem consultar o sistema de arquivos de novo
+_stat_cache = {}
+
+
+def is_plaintext_name(name):
+    """
+    Indica se um arquivo com este nome é candidato à criptografia: ignora os
+    .enc, os scripts .py e os arquivos ocultos (manifesto, diário, temporários).
+    """
+    return not name.endswith('.enc') and not name.endswith('.py') and not name.startswith('.')
+
+
+def scan_folder(path_folder):
+    """
+    Percorre a pasta uma única vez com os.scandir, obtendo o stat de cada
+    arquivo e classificando-o como texto claro ou .enc.
+    Segue a mesma ordem e as mesmas regras de os.walk (não entra em links
+    simbólicos para pastas e ignora pastas sem permissão de leitura).
+    O armazenamento da deduplicação (DEDUP_STORE_NAME) não é percorrido.
+    """
+    plaintext = []
+    encrypted = []
+    visible_encrypted = 0
+    _stat_cache.clear()
+
+    pending = [path_folder]
+    while pending:
+        folder = pending.pop()
+        subfolders = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+
+                    if is_dir:
+                        if not entry.is_symlink() and entry.name != DEDUP_STORE_NAME:
+                            subfolders.append(entry.path)
+                        continue
+
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        st = None
+                    if st is not None:
+                        _stat_cache[entry.path] = st
+
+                    name = entry.name
+                    if name.endswith('.enc'):
+                        encrypted.append(ScanEntry(entry.path, name, st))
+                        if not name.startswith('.'):
+                            visible_encrypted += 1
+                    elif is_plaintext_name(name):
+                        plaintext.append(ScanEntry(entry.path, name, st))
+        except OSError:
+            continue
+        # Visita as subpastas na ordem em que foram encontradas
+        pending.extend(reversed(subfolders))
+
+    return FolderScan(plaintext, encrypted, visible_encrypted)
+
+
+def cached_size(file_path):
+    """
+    Retorna o tamanho do arquivo usando o stat da última varredura, se houver.
+    """
+    st = _stat_cache.get(file_path)
+    if st is None:
+        st = os.stat(file_path)
+        _stat_cache[file_path] = st
+    return st.st_size
 
 
 def select_files_to_process(file_list, operation_type):
@@ -21,7 +106,7 @@ def select_files_to_process(file_list, operation_type):
         # Exibe lista numerada dos arquivos
         for i, file_path in enumerate(file_list, 1):
             file_name = os.path.basename(file_path)
-            file_size = os.path.getsize(file_path) / 1024  # Tamanho em KB
+            file_size = cached_size(file_path) / 1024  # Tamanho em KB
             print(f"{i:2d}. {file_name} ({file_size:.1f} KB)")
         
         print("=" * 60)
@@ -89,27 +174,21 @@ def select_files_to_process(file_list, operation_type):
             print("Nenhum arquivo válido selecionado com base na sua entrada. Tente novamente.")
 
 
-def get_files_for_encryption(path_folder):
+def get_files_for_encryption(path_folder, scan=None):
     """
     Retorna lista de arquivos disponíveis para criptografia.
+    Aceita uma varredura já feita por scan_folder para não percorrer a pasta de novo.
     """
-    available_files = []
-    for root, _, files in os.walk(path_folder):
-        for file in files:
-            full_path = os.path.join(root, file)
-            if not full_path.endswith('.enc') and not full_path.endswith('.py') and not file.startswith('.'):
-                available_files.append(full_path)
-    return available_files
+    if scan is None:
+        scan = scan_folder(path_folder)
+    return [entry.path for entry in scan.plaintext]
 
 
-def get_files_for_decryption(path_folder):
+def get_files_for_decryption(path_folder, scan=None):
     """
     Retorna lista de arquivos disponíveis para descriptografia.
+    Aceita uma varredura já feita por scan_folder para não percorrer a pasta de novo.
     """
-    available_files = []
-    for root, _, files in os.walk(path_folder):
-        for file in files:
-            full_path = os.path.join(root, file)
-            if full_path.endswith('.enc'):
-                available_files.append(full_path)
-    return available_files
\ No newline at end of file
+    if scan is None:
+        scan = scan_folder(path_folder)
+    return [entry.path for entry in scan.encrypted]
\ No newline at end of file
@@ -2,8 +2,10 @@
 Módulo para gerenciamento de pastas e seleção de diretórios.
 """
 import os
-import tkinter as tk
-from tkinter import filedialog
+from getpass import getpass
+
+from file_selector import scan_folder
+from vault_catalog import has_catalog, load_catalog, show_catalog_summary
 
 
 def select_folder():
@@ -11,6 +13,11 @@ def select_folder():
     Abre uma janela de diálogo para o usuário selecionar uma pasta.
     Retorna o caminho da pasta selecionada ou None se cancelado.
     """
+    # Importado apenas aqui: o tkinter é lento para carregar e pode não estar
+    # instalado em servidores, onde a seleção gráfica não é usada
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()  # Esconde a janela principal do tkinter
     
@@ -104,23 +111,25 @@ def choose_working_folder():
             print("❌ Opção inválida. Digite 1, 2, 3 ou 4.")
 
 
-def show_folder_info(folder_path):
+def show_folder_info(folder_path, password=None):
     """
     Mostra informações sobre a pasta selecionada.
+    Se a pasta tiver catálogo, o resumo vem dele, sem percorrer a pasta; sem
+    password, a senha é pedida (Enter vazio pula o catálogo e percorre a pasta).
     """
+    if has_catalog(folder_path):
+        if password is None:
+            password = getpass("Senha da pasta para o resumo do catálogo (Enter para pular): ")
+        catalog = load_catalog(folder_path, password) if password else None
+        if catalog is not None:
+            show_catalog_summary(folder_path, catalog)
+            return
+
     try:
-        total_files = 0
-        enc_files = 0
-        regular_files = 0
-        
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                if not file.startswith('.') and not file.endswith('.py'):
-                    total_files += 1
-                    if file.endswith('.enc'):
-                        enc_files += 1
-                    else:
-                        regular_files += 1
+        scan = scan_folder(folder_path)
+        enc_files = scan.visible_encrypted
+        regular_files = len(scan.plaintext)
+        total_files = enc_files + regular_files
         
         print(f"\n📁 Informações da pasta: {os.path.basename(folder_path)}")
         print(f"   Caminho completo: {folder_path}")
@@ -0,0 +1,218 @@
+"""
+Módulo para vigiar uma pasta e entregar, em lotes, os arquivos novos ou modificados.
+
+No Linux, usa o inotify (pela libc, via ctypes, sem dependências extras): o
+processo fica bloqueado até o kernel informar uma alteração, então o uso de
+CPU com a pasta parada é praticamente zero. Onde o inotify não existe (ou se
+for pedido), compara o tamanho e o mtime dos arquivos a cada POLL_INTERVAL
+segundos.
+
+Um arquivo só é entregue depois de ficar QUIET_PERIOD segundos sem
+alterações, para não criptografar uma cópia pela metade. Arquivos que chegam
+juntos são entregues em um único lote quando a pasta se acalma; se as
+alterações não pararem, os arquivos já quietos são entregues no máximo
+MAX_BATCH_DELAY segundos depois de aparecerem.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from file_selector import scan_folder, is_plaintext_name
+from vault_format import DEDUP_STORE_NAME
+
+# Tempo sem alterações para considerar um arquivo pronto (segundos)
+QUIET_PERIOD = 2.0
+# Espera máxima de um arquivo pronto enquanto outros continuam chegando (segundos)
+MAX_BATCH_DELAY = 30.0
+# Intervalo entre as varreduras do modo de polling (segundos)
+POLL_INTERVAL = 5.0
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _libc():
+    """Carrega a libc com as funções do inotify, ou retorna None se indisponível."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def inotify_available():
+    """Indica se o inotify pode ser usado neste sistema."""
+    return _libc() is not None
+
+
+def _watched_folders(path_folder):
+    """Pastas a vigiar: a pasta e as subpastas, menos o armazenamento da deduplicação e as ocultas."""
+    for folder, subfolders, _ in os.walk(path_folder):
+        subfolders[:] = [name for name in subfolders
+                         if name != DEDUP_STORE_NAME and not name.startswith('.')]
+        yield folder
+
+
+class InotifySource:
+    """Alterações da pasta informadas pelo inotify."""
+
+    def __init__(self, path_folder):
+        self._libc = _libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self._folders = {}
+        for folder in _watched_folders(path_folder):
+            self._add_watch(folder)
+
+    def _add_watch(self, folder):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), WATCH_MASK)
+        if wd >= 0:
+            self._folders[wd] = folder
+
+    def wait(self, timeout):
+        """
+        Espera até timeout segundos (None: sem limite) por alterações.
+        Retorna a lista de arquivos alterados, ou None se eventos foram
+        perdidos (fila do kernel cheia) e a pasta precisa ser varrida de novo.
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+
+        changed = []
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                if mask & IN_IGNORED:
+                    self._folders.pop(wd, None)
+                    continue
+                folder = self._folders.get(wd)
+                if folder is None or not name:
+                    continue
+                path = os.path.join(folder, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and name != DEDUP_STORE_NAME and not name.startswith('.'):
+                        # Arquivos podem ter sido criados antes de a pasta nova ser vigiada
+                        for subfolder in _watched_folders(path):
+                            self._add_watch(subfolder)
+                        changed.extend(entry.path for entry in scan_folder(path).plaintext)
+                elif is_plaintext_name(name):
+                    changed.append(path)
+        return None if overflow else changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingSource:
+    """Alterações da pasta detectadas comparando varreduras periódicas."""
+
+    def __init__(self, path_folder, interval=POLL_INTERVAL):
+        self._path_folder = path_folder
+        self._interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        return {entry.path: (entry.stat.st_size, entry.stat.st_mtime_ns)
+                for entry in scan_folder(self._path_folder).plaintext if entry.stat is not None}
+
+    def wait(self, timeout):
+        """Espera até a próxima varredura e retorna os arquivos novos ou alterados."""
+        time.sleep(self._interval if timeout is None else min(timeout, self._interval))
+        snapshot = self._scan()
+        changed = [path for path, signature in snapshot.items() if self._snapshot.get(path) != signature]
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_source(path_folder, poll=False, interval=POLL_INTERVAL):
+    """Abre a fonte de alterações: inotify, se disponível e poll for falso; senão, polling."""
+    if not poll and inotify_available():
+        try:
+            return InotifySource(path_folder)
+        except OSError as e:
+            print(f"⚠️ inotify indisponível ({e}); usando varreduras periódicas.")
+    return PollingSource(path_folder, interval)
+
+
+def watch_folder(path_folder, handle_batch, poll=False, quiet_period=QUIET_PERIOD, interval=POLL_INTERVAL):
+    """
+    Vigia a pasta e chama handle_batch(lista de arquivos) com os arquivos
+    novos ou modificados, já quietos. Os arquivos existentes no início são
+    entregues no primeiro lote (handle_batch decide quais ainda precisam ser
+    processados). Roda até ser interrompido (Ctrl-C).
+    """
+    source = open_source(path_folder, poll, interval)
+    mode = "inotify" if isinstance(source, InotifySource) else f"varredura a cada {interval:g}s"
+    print(f"👀 Vigiando '{path_folder}' ({mode}). Pressione Ctrl-C para encerrar.")
+
+    now = time.monotonic()
+    # Arquivo -> (primeira vez visto, última alteração)
+    pending = {entry.path: (now, now) for entry in scan_folder(path_folder).plaintext}
+    last_change = now
+
+    try:
+        while True:
+            # Sem arquivos pendentes, bloqueia até a próxima alteração
+            timeout = quiet_period / 2 if pending else None
+            changed = source.wait(timeout)
+            now = time.monotonic()
+            if changed is None:
+                print("⚠️ Alterações demais de uma vez; varrendo a pasta novamente.")
+                changed = [entry.path for entry in scan_folder(path_folder).plaintext]
+            for path in changed:
+                first_seen = pending.get(path, (now, now))[0]
+                pending[path] = (first_seen, now)
+            if changed:
+                last_change = now
+
+            ready = [path for path, (_, changed_at) in pending.items() if now - changed_at >= quiet_period]
+            if not ready:
+                continue
+            oldest = min(pending[path][0] for path in ready)
+            if now - last_change < quiet_period and now - oldest < MAX_BATCH_DELAY:
+                continue
+
+            for path in ready:
+                del pending[path]
+            batch = [path for path in ready if os.path.isfile(path)]
+            if batch:
+                handle_batch(batch)
+    except KeyboardInterrupt:
+        print("\n⛔ Vigilância encerrada.")
+    finally:
+        source.close()
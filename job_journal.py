@@ -0,0 +1,150 @@
+"""
+Módulo para o diário (journal) dos trabalhos de pasta, que permite retomá-los.
+
+Antes de processar uma pasta, o trabalho grava em JOURNAL_NAME, na raiz da
+pasta, a operação, os parâmetros e a lista de arquivos planejados. Durante o
+processamento acrescenta uma linha ao iniciar cada arquivo e outra ao
+concluí-lo (com sucesso ou falha). Ao fim do trabalho o diário é removido;
+se ele ainda existir, o trabalho foi interrompido (Ctrl-C, falta de memória,
+reinício da máquina) e pode ser retomado sem reprocessar os arquivos já
+concluídos.
+
+Formato: JSON lines. A primeira linha descreve o trabalho; as seguintes são
+{"event": "start" | "done", "file": caminho relativo, "ok": bool}. Uma última
+linha incompleta (gravação interrompida) é ignorada. As linhas são gravadas
+no sistema de arquivos a cada registro e sincronizadas com o disco a cada
+SYNC_INTERVAL segundos: após uma queda, no máximo os últimos registros se
+perdem, e esses arquivos são apenas processados de novo.
+"""
+import json
+import os
+import threading
+import time
+
+JOURNAL_NAME = '.pyvault_journal.jsonl'
+JOURNAL_VERSION = 1
+
+# Intervalo máximo entre sincronizações do diário com o disco (segundos)
+SYNC_INTERVAL = 1.0
+
+
+def journal_path(path_folder):
+    """Caminho do diário de trabalho de uma pasta."""
+    return os.path.join(path_folder, JOURNAL_NAME)
+
+
+class JobJournal:
+    """Diário de um trabalho em andamento. Pode ser usado por várias threads."""
+
+    def __init__(self, path_folder, f):
+        self.path_folder = path_folder
+        self._f = f
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+    def _append(self, record, sync=False):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._f.write(line)
+            self._f.flush()
+            if sync or time.monotonic() - self._last_sync >= SYNC_INTERVAL:
+                os.fsync(self._f.fileno())
+                self._last_sync = time.monotonic()
+
+    def _relative(self, file_path):
+        return os.path.relpath(file_path, self.path_folder)
+
+    def started(self, file_path):
+        """Registra que o processamento do arquivo começou."""
+        self._append({'event': 'start', 'file': self._relative(file_path)})
+
+    def finished(self, file_path, success):
+        """Registra a conclusão do arquivo."""
+        self._append({'event': 'done', 'file': self._relative(file_path), 'ok': bool(success)})
+
+    def close(self):
+        """Sincroniza e fecha o diário, mantendo-o para uma retomada."""
+        with self._lock:
+            if self._f.closed:
+                return
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._f.close()
+
+    def complete(self):
+        """Encerra o trabalho concluído: fecha e remove o diário."""
+        self.close()
+        try:
+            os.remove(journal_path(self.path_folder))
+        except FileNotFoundError:
+            pass
+
+
+def start_job(path_folder, operation, file_list, params):
+    """
+    Cria o diário de um novo trabalho, substituindo um diário anterior.
+    operation: 'encrypt' ou 'decrypt'; params: dicionário serializável em JSON.
+    """
+    header = {
+        'version': JOURNAL_VERSION,
+        'operation': operation,
+        'params': params,
+        'files': [os.path.relpath(file_path, path_folder) for file_path in file_list],
+    }
+    f = open(journal_path(path_folder), 'w', encoding='utf-8')
+    journal = JobJournal(path_folder, f)
+    journal._append(header, sync=True)
+    return journal
+
+
+def reopen_job(path_folder):
+    """Reabre o diário existente para continuar acrescentando registros."""
+    return JobJournal(path_folder, open(journal_path(path_folder), 'a', encoding='utf-8'))
+
+
+def load_job(path_folder):
+    """
+    Lê o diário de um trabalho interrompido.
+    Retorna None se não houver diário; senão, um dicionário com operation,
+    params, files (caminhos completos, na ordem planejada) e os conjuntos
+    completed (concluídos com sucesso), failed e in_progress.
+    Lança ValueError se o diário estiver corrompido.
+    """
+    try:
+        with open(journal_path(path_folder), 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return None
+
+    if not lines or not lines[0].endswith('\n'):
+        raise ValueError("diário de trabalho vazio ou incompleto")
+    header = json.loads(lines[0])
+    if header.get('version') != JOURNAL_VERSION:
+        raise ValueError(f"versão do diário não suportada: {header.get('version')}")
+
+    completed = set()
+    failed = set()
+    in_progress = set()
+    for line in lines[1:]:
+        if not line.endswith('\n'):
+            break  # última linha gravada pela metade
+        record = json.loads(line)
+        file_path = os.path.join(path_folder, record['file'])
+        if record['event'] == 'start':
+            in_progress.add(file_path)
+        elif record['event'] == 'done':
+            in_progress.discard(file_path)
+            if record.get('ok'):
+                completed.add(file_path)
+                failed.discard(file_path)
+            else:
+                failed.add(file_path)
+
+    return {
+        'operation': header['operation'],
+        'params': header.get('params', {}),
+        'files': [os.path.join(path_folder, relative_path) for relative_path in header['files']],
+        'completed': completed,
+        'failed': failed,
+        'in_progress': in_progress,
+    }
@@ -0,0 +1,348 @@
+"""
+Módulo para derivação de chaves a partir da senha.
+
+Algoritmos suportados: PBKDF2 (HMAC-SHA1), scrypt e Argon2id (este último
+apenas com o pacote `argon2-cffi` instalado). Os parâmetros usados ficam
+registrados no cabeçalho de cada arquivo, como um dicionário JSON, por
+exemplo {"name": "scrypt", "n": 131072, "r": 8, "p": 1}. Arquivos sem esse
+registro (antigo, V2 e V3 anteriores) usam o PBKDF2 com PBKDF2_ITERATIONS.
+
+Os parâmetros padrão das novas criptografias podem ser calibrados para um
+tempo alvo de desbloqueio nesta máquina (calibrate_kdf) e salvos em
+KDF_CONFIG_PATH.
+
+Envelope: os dados de cada arquivo são criptografados com uma chave de dados
+aleatória, e apenas ela é criptografada (embrulhada) com a chave derivada da
+senha (wrap_key/unwrap_key). Trocar a senha reescreve só a chave embrulhada.
+"""
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+from Crypto.Cipher import AES
+from Crypto.Protocol.KDF import PBKDF2, scrypt
+from Crypto.Random import get_random_bytes
+
+import metrics
+
+KDF_PBKDF2 = 'pbkdf2'
+KDF_SCRYPT = 'scrypt'
+KDF_ARGON2ID = 'argon2id'
+
+KDF_ALGORITHMS = (KDF_PBKDF2, KDF_SCRYPT, KDF_ARGON2ID)
+
+# Parâmetros do PBKDF2 usados pelos formatos V2 e antigo e pelos arquivos V3
+# gravados sem o registro do KDF
+PBKDF2_ITERATIONS = 10000000
+
+# Parâmetros padrão de cada algoritmo, antes de qualquer calibração.
+# scrypt: n é o custo (potência de 2), r o tamanho do bloco e p o paralelismo;
+# usa 128 * n * r bytes de memória (128 MiB com os valores abaixo).
+# Argon2id: memory_cost em KiB.
+DEFAULT_PARAMS = {
+    KDF_PBKDF2: {'iterations': PBKDF2_ITERATIONS},
+    KDF_SCRYPT: {'n': 2 ** 17, 'r': 8, 'p': 1},
+    KDF_ARGON2ID: {'time_cost': 3, 'memory_cost': 256 * 1024, 'parallelism': 4},
+}
+
+# Limites da calibração
+MIN_PBKDF2_ITERATIONS = 100000
+MAX_PBKDF2_ITERATIONS = 100000000
+MAX_SCRYPT_N = 2 ** 20
+MAX_ARGON2_TIME_COST = 64
+
+# Limite de cada parâmetro aceito por check_kdf. Os parâmetros vêm do
+# cabeçalho, antes de a senha ser conferida: sem limite, um arquivo corrompido
+# ou forjado faria a derivação levar horas ou alocar terabytes.
+MAX_PARAMS = {
+    KDF_PBKDF2: {'iterations': MAX_PBKDF2_ITERATIONS},
+    KDF_SCRYPT: {'n': MAX_SCRYPT_N, 'r': 32, 'p': 16},
+    KDF_ARGON2ID: {'time_cost': MAX_ARGON2_TIME_COST, 'memory_cost': 4 * 1024 * 1024, 'parallelism': 64},
+}
+# Memória do scrypt (128 * n * r bytes): 1 GiB, a do maior n com o r padrão
+MAX_SCRYPT_MEMORY = 128 * MAX_SCRYPT_N * 8
+
+# Arquivo com os parâmetros calibrados para esta máquina
+KDF_CONFIG_PATH = os.environ.get('PYVAULT_KDF_CONFIG', os.path.join(os.path.expanduser('~'), '.pyvault_kdf.json'))
+
+# Rótulo usado para calcular o valor de verificação da chave
+KEY_CHECK_LABEL = b'PyVault key check'
+
+# Cache das chaves derivadas no lote atual, mantido apenas em memória.
+# Indexado por (senha, salt, tamanho da chave, parâmetros do KDF).
+_key_cache = {}
+_cache_lock = threading.Lock()
+# Um lock por entrada, para que threads com o mesmo salt esperem a mesma
+# derivação em vez de repeti-la
+_key_locks = {}
+
+# Parâmetros padrão já carregados de KDF_CONFIG_PATH
+_default_kdf = None
+
+
+def _argon2():
+    """Importa as funções de baixo nível do argon2-cffi, se disponível."""
+    try:
+        from argon2.low_level import hash_secret_raw, Type
+    except ImportError:
+        return None
+    return hash_secret_raw, Type
+
+
+def available_kdfs():
+    """Retorna os algoritmos de derivação disponíveis neste ambiente."""
+    algorithms = [KDF_PBKDF2, KDF_SCRYPT]
+    if _argon2() is not None:
+        algorithms.append(KDF_ARGON2ID)
+    return algorithms
+
+
+def legacy_kdf():
+    """Parâmetros implícitos dos arquivos gravados sem o registro do KDF."""
+    return {'name': KDF_PBKDF2, 'iterations': PBKDF2_ITERATIONS}
+
+
+def kdf_params(name, **overrides):
+    """Monta os parâmetros de um algoritmo a partir dos valores padrão."""
+    if name not in DEFAULT_PARAMS:
+        raise ValueError(f"algoritmo de derivação desconhecido: '{name}'")
+    params = {'name': name}
+    params.update(DEFAULT_PARAMS[name])
+    params.update(overrides)
+    return params
+
+
+def encode_kdf(params):
+    """Serializa os parâmetros do KDF para o cabeçalho."""
+    return json.dumps(params, sort_keys=True, separators=(',', ':')).encode('ascii')
+
+
+def decode_kdf(value):
+    """
+    Lê os parâmetros do KDF gravados no cabeçalho.
+    Lança ValueError se o registro for inválido ou o algoritmo desconhecido.
+    """
+    return check_kdf(json.loads(value.decode('ascii')))
+
+
+def kdf_from_header(value):
+    """
+    Parâmetros do KDF de um arquivo a partir do campo do cabeçalho.
+    Sem o campo (value None), retorna os parâmetros implícitos legacy_kdf().
+    """
+    if value is None:
+        return legacy_kdf()
+    return decode_kdf(value)
+
+
+def check_kdf(params):
+    """
+    Valida um dicionário de parâmetros do KDF, inclusive os limites de
+    MAX_PARAMS e MAX_SCRYPT_MEMORY. Lança ValueError se inválido.
+    """
+    if not isinstance(params, dict) or params.get('name') not in DEFAULT_PARAMS:
+        raise ValueError("parâmetros de derivação de chave inválidos")
+    missing = set(DEFAULT_PARAMS[params['name']]) - set(params)
+    if missing:
+        raise ValueError(f"parâmetros de derivação incompletos: {', '.join(sorted(missing))}")
+    for name in DEFAULT_PARAMS[params['name']]:
+        if type(params[name]) is not int or params[name] < 1:
+            raise ValueError(f"parâmetro de derivação inválido: {name}={params[name]!r}")
+        if params[name] > MAX_PARAMS[params['name']][name]:
+            raise ValueError(f"parâmetro de derivação acima do limite: {name}={params[name]} "
+                             f"(máximo {MAX_PARAMS[params['name']][name]})")
+    if params['name'] == KDF_SCRYPT and 128 * params['n'] * params['r'] > MAX_SCRYPT_MEMORY:
+        raise ValueError(f"parâmetros do scrypt acima do limite de memória: n={params['n']}, r={params['r']}")
+    return params
+
+
+def describe_kdf(params):
+    """Descrição curta dos parâmetros, para mensagens."""
+    values = ", ".join(f"{name}={value}" for name, value in sorted(params.items()) if name != 'name')
+    return f"{params['name']} ({values})"
+
+
+def _derive(password, salt, key_size, params):
+    """Executa a derivação com os parâmetros indicados, sem cache."""
+    secret = password.encode('utf-8')
+    name = params['name']
+    if name == KDF_PBKDF2:
+        return PBKDF2(secret, salt, dkLen=key_size, count=params['iterations'])
+    if name == KDF_SCRYPT:
+        return scrypt(secret, salt, key_size, N=params['n'], r=params['r'], p=params['p'])
+    if name == KDF_ARGON2ID:
+        argon2 = _argon2()
+        if argon2 is None:
+            raise ValueError("Argon2id indisponível (instale o pacote 'argon2-cffi')")
+        hash_secret_raw, argon2_type = argon2
+        return hash_secret_raw(secret, salt, time_cost=params['time_cost'], memory_cost=params['memory_cost'],
+                               parallelism=params['parallelism'], hash_len=key_size, type=argon2_type.ID)
+    raise ValueError(f"algoritmo de derivação desconhecido: '{name}'")
+
+
+def derive_key(password, salt, key_size=32, kdf=None):
+    """
+    Deriva a chave, reaproveitando derivações já feitas no lote atual.
+    Arquivos de uma mesma sessão compartilham o salt, então o custo do lote
+    passa a ser de uma derivação por salt distinto.
+    kdf: parâmetros do algoritmo (ver kdf_params); sem kdf, usa legacy_kdf().
+    """
+    if kdf is None:
+        kdf = legacy_kdf()
+    cache_key = (password, bytes(salt), key_size, encode_kdf(kdf))
+    with _cache_lock:
+        key = _key_cache.get(cache_key)
+        if key is not None:
+            return key
+        key_lock = _key_locks.setdefault(cache_key, threading.Lock())
+
+    with key_lock:
+        key = _key_cache.get(cache_key)
+        if key is None:
+            with metrics.phase('kdf'):
+                key = _derive(password, salt, key_size, kdf)
+            with _cache_lock:
+                _key_cache[cache_key] = key
+    return key
+
+
+def clear_key_cache():
+    """
+    Descarta todas as chaves derivadas. Deve ser chamada ao fim de cada lote.
+    """
+    with _cache_lock:
+        _key_cache.clear()
+        _key_locks.clear()
+
+
+def key_check_value(key):
+    """
+    Calcula o valor de verificação da chave gravado no cabeçalho.
+    Permite confirmar a senha sem revelar a chave nem descriptografar dados.
+    """
+    return hmac.new(key, KEY_CHECK_LABEL, hashlib.sha256).digest()[:16]
+
+
+def key_matches(key, expected_check_value):
+    """
+    Confere a chave contra o valor de verificação gravado no cabeçalho.
+    """
+    return hmac.compare_digest(key_check_value(key), expected_check_value)
+
+
+def new_data_key(key_size=32):
+    """Gera uma chave de dados aleatória para um arquivo ou cofre."""
+    return get_random_bytes(key_size)
+
+
+def wrap_key(key, data_key):
+    """
+    Embrulha a chave de dados com a chave derivada da senha (AES-GCM).
+    Retorna nonce (12 bytes) + chave criptografada + tag (16 bytes).
+    """
+    cipher = AES.new(key, AES.MODE_GCM, nonce=get_random_bytes(12))
+    wrapped, tag = cipher.encrypt_and_digest(data_key)
+    return cipher.nonce + wrapped + tag
+
+
+def unwrap_key(key, wrapped):
+    """
+    Recupera a chave de dados embrulhada por wrap_key.
+    Lança ValueError se a chave estiver errada ou o valor, corrompido.
+    """
+    if len(wrapped) < 12 + 16 + 1:
+        raise ValueError("chave de dados embrulhada inválida")
+    cipher = AES.new(key, AES.MODE_GCM, nonce=wrapped[:12])
+    return cipher.decrypt_and_verify(wrapped[12:-16], wrapped[-16:])
+
+
+def default_kdf():
+    """
+    Parâmetros usados nas novas criptografias: os salvos por save_kdf_config
+    em KDF_CONFIG_PATH ou, sem calibração, o PBKDF2 com PBKDF2_ITERATIONS.
+    O arquivo é lido uma única vez por processo.
+    """
+    global _default_kdf
+    if _default_kdf is None:
+        params = None
+        try:
+            with open(KDF_CONFIG_PATH, 'r', encoding='utf-8') as f:
+                params = check_kdf(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Configuração de KDF inválida em '{KDF_CONFIG_PATH}' ({e}). Usando o padrão.")
+        if params is not None and params['name'] not in available_kdfs():
+            print(f"⚠️ {params['name']} indisponível neste ambiente. Usando o padrão.")
+            params = None
+        _default_kdf = params or legacy_kdf()
+    return dict(_default_kdf)
+
+
+def kdf_for_algorithm(name):
+    """
+    Parâmetros de um algoritmo escolhido pelo usuário: os calibrados, se a
+    configuração salva for do mesmo algoritmo, ou os padrão.
+    """
+    params = default_kdf()
+    if params['name'] == name:
+        return params
+    return kdf_params(name)
+
+
+def save_kdf_config(params):
+    """Salva os parâmetros como padrão das novas criptografias."""
+    global _default_kdf
+    tmp_path = KDF_CONFIG_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(params, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, KDF_CONFIG_PATH)
+    _default_kdf = dict(params)
+
+
+def _time_derivation(params):
+    """Mede uma derivação completa com os parâmetros indicados."""
+    salt = os.urandom(16)
+    start = time.perf_counter()
+    _derive('calibragem', salt, 32, params)
+    return time.perf_counter() - start
+
+
+def calibrate_kdf(name, target_seconds=1.0):
+    """
+    Escolhe os parâmetros do algoritmo para que uma derivação leve cerca de
+    target_seconds nesta máquina. Retorna (parâmetros, segundos medidos).
+    PBKDF2: ajusta as iterações proporcionalmente ao tempo medido.
+    scrypt: dobra n (e a memória) até atingir o alvo ou MAX_SCRYPT_N.
+    Argon2id: mantém a memória padrão e aumenta time_cost até o alvo.
+    """
+    if name not in available_kdfs():
+        raise ValueError(f"algoritmo de derivação indisponível: '{name}'")
+
+    if name == KDF_PBKDF2:
+        params = kdf_params(name, iterations=MIN_PBKDF2_ITERATIONS)
+        seconds = _time_derivation(params)
+        # Uma segunda medição, já perto do alvo, corrige o custo fixo da primeira
+        for _ in range(2):
+            iterations = int(params['iterations'] * target_seconds / max(seconds, 1e-6))
+            params['iterations'] = min(max(MIN_PBKDF2_ITERATIONS, iterations), MAX_PBKDF2_ITERATIONS)
+            seconds = _time_derivation(params)
+        return params, seconds
+
+    if name == KDF_SCRYPT:
+        params = kdf_params(name, n=2 ** 14)
+        seconds = _time_derivation(params)
+        while seconds < target_seconds and params['n'] < MAX_SCRYPT_N:
+            params['n'] *= 2
+            seconds = _time_derivation(params)
+        return params, seconds
+
+    params = kdf_params(name, time_cost=1)
+    seconds = _time_derivation(params)
+    while seconds < target_seconds and params['time_cost'] < MAX_ARGON2_TIME_COST:
+        params['time_cost'] += 1
+        seconds = _time_derivation(params)
+    return params, seconds
@@ -2,25 +2,43 @@
 """
 Aplicação Principal de Criptografia de Arquivos
 Permite criptografar e descriptografar arquivos com seleção de pastas via GUI
+
+Sem argumentos, abre o menu interativo. Com um comando (encrypt, decrypt,
+verify, resume, watch, rekey, pack, list, extract ou calibrate), roda em modo
+não interativo; veja batch_cli.py.
 """
 
 import sys
 import os
-from pathlib import Path
-
-# Importar os módulos do sistema
-try:
-    import crypto_operations
-    import file_selector
-    import folder_manager
-    print("✅ Todos os módulos carregados com sucesso!")
-except ImportError as e:
-    print(f"❌ Erro ao importar módulos: {e}")
-    sys.exit(1)
 
 # Variável global para armazenar a pasta de trabalho
 WORKING_FOLDER = None
 
+# Módulos do menu interativo, carregados por load_modules()
+crypto_operations = None
+file_selector = None
+folder_manager = None
+vault_archive = None
+vault_catalog = None
+vault_rekey = None
+
+
+def load_modules():
+    """Importa os módulos usados pelo menu interativo"""
+    global crypto_operations, file_selector, folder_manager, vault_archive, vault_catalog, vault_rekey
+
+    try:
+        import crypto_operations
+        import file_selector
+        import folder_manager
+        import vault_archive
+        import vault_catalog
+        import vault_rekey
+        print("✅ Todos os módulos carregados com sucesso!")
+    except ImportError as e:
+        print(f"❌ Erro ao importar módulos: {e}")
+        sys.exit(1)
+
 def main():
     """Função principal da aplicação"""
     global WORKING_FOLDER
@@ -152,9 +170,14 @@ def process_files():
         print("2. 🔓 Descriptografia seletiva")
         print("3. 📁 Criptografia completa da pasta")
         print("4. 📁 Descriptografia completa da pasta")
-        print("5. ↩️  Voltar ao menu principal")
+        print("5. 📦 Empacotar pasta em um cofre")
+        print("6. 📦 Listar/extrair um cofre")
+        print("7. 👀 Vigiar a pasta e criptografar os arquivos novos")
+        print("8. 🔑 Trocar a senha da pasta")
+        print("9. 🩺 Verificar a integridade dos arquivos da pasta")
+        print("10. ↩️  Voltar ao menu principal")
         
-        process_choice = input("\nDigite sua escolha (1-5): ").strip()
+        process_choice = input("\nDigite sua escolha (1-10): ").strip()
         
         if process_choice == "1":
             crypto_operations.encrypt_selected_files(WORKING_FOLDER)
@@ -165,6 +188,16 @@ def process_files():
         elif process_choice == "4":
             crypto_operations.decrypt_folder(WORKING_FOLDER)
         elif process_choice == "5":
+            vault_archive.pack_folder(WORKING_FOLDER)
+        elif process_choice == "6":
+            vault_archive.unpack_archive(WORKING_FOLDER)
+        elif process_choice == "7":
+            crypto_operations.watch_folder(WORKING_FOLDER)
+        elif process_choice == "8":
+            vault_rekey.change_folder_password(WORKING_FOLDER)
+        elif process_choice == "9":
+            crypto_operations.verify_folder(WORKING_FOLDER)
+        elif process_choice == "10":
             return
         else:
             print("❌ Opção inválida!")
@@ -189,10 +222,11 @@ def manage_folders():
         print("\nOpções de gerenciamento:")
         print("1. 📂 Escolher nova pasta de trabalho")
         print("2. 📋 Mostrar informações da pasta atual")
-        print("3. 🔄 Redefinir pasta de trabalho")
-        print("4. ↩️  Voltar ao menu principal")
+        print("3. 🔎 Buscar no catálogo da pasta atual")
+        print("4. 🔄 Redefinir pasta de trabalho")
+        print("5. ↩️  Voltar ao menu principal")
         
-        folder_choice = input("\nDigite sua escolha (1-4): ").strip()
+        folder_choice = input("\nDigite sua escolha (1-5): ").strip()
         
         try:
             if folder_choice == "1":
@@ -211,10 +245,16 @@ def manage_folders():
                     print("❌ Nenhuma pasta de trabalho definida.")
                     
             elif folder_choice == "3":
+                if WORKING_FOLDER:
+                    vault_catalog.browse_catalog(WORKING_FOLDER)
+                else:
+                    print("❌ Nenhuma pasta de trabalho definida.")
+                    
+            elif folder_choice == "4":
                 WORKING_FOLDER = None
                 print("🔄 Pasta de trabalho resetada!")
                 
-            elif folder_choice == "4":
+            elif folder_choice == "5":
                 break
             else:
                 print("❌ Opção inválida!")
@@ -232,16 +272,33 @@ def show_system_info():
     print("   • crypto_operations - Operações de criptografia")
     print("   • file_selector - Seleção de arquivos") 
     print("   • folder_manager - Gerenciamento de pastas")
+    print("   • vault_archive - Cofres com vários arquivos")
+    print("   • vault_catalog - Catálogo criptografado das pastas")
+    print("   • vault_rekey - Troca de senha sem recriptografar os dados")
     
     print("\n🔧 Funcionalidades disponíveis:")
     print("   • Criptografia de arquivos selecionados")
     print("   • Criptografia de pasta completa")
     print("   • Descriptografia de arquivos selecionados")
     print("   • Descriptografia de pasta completa")
+    print("   • Cofres: vários arquivos em um único arquivo criptografado")
+    print("   • Catálogo da pasta: listagem e busca sem descriptografar")
+    print("   • Vigilância de pasta: criptografa os arquivos assim que chegam")
+    print("   • Troca de senha reescrevendo apenas os cabeçalhos")
+    print("   • Dados autenticados em blocos e verificação de integridade em paralelo")
+    print("   • Progresso ao vivo com vazão e tempo restante")
+    print("   • Cifras AES-CTR, AES-GCM e ChaCha20-Poly1305, com teste de desempenho")
     print("   • Seleção de pasta via GUI ou manual")
     print("   • Informações detalhadas de pastas")
 
 if __name__ == "__main__":
+    # Modo não interativo: não carrega o menu nem o tkinter
+    if len(sys.argv) > 1:
+        import batch_cli
+        sys.exit(batch_cli.main(sys.argv[1:]))
+
+    load_modules()
+
     try:
         # Mostrar informações iniciais
         show_system_info()
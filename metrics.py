@@ -0,0 +1,266 @@
+"""
+Módulo de instrumentação: tempos por fase e métricas estruturadas.
+
+Com as métricas ativadas (enable_metrics), cada arquivo processado gera um
+registro com bytes lidos e gravados, duração total, duração de cada fase
+(kdf, read, encrypt/decrypt, write, delete) e resultado. Os registros podem
+ser gravados em um arquivo JSON lines e repassados a callbacks. Ao fim de
+cada lote é gerado um resumo com percentis de duração e vazão total.
+
+Desativadas, as funções deste módulo devolvem objetos nulos ou a própria
+função recebida, e o custo por arquivo é de uma consulta a atributo.
+"""
+import json
+import threading
+import time
+
+_collector = None
+_local = threading.local()
+
+
+class _NullPhase:
+    """Contexto que não mede nada, usado com as métricas desativadas."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    """Contexto que soma a duração de uma fase ao registro do arquivo."""
+
+    def __init__(self, record, name):
+        self._record = record
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._record.add(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class FileRecord:
+    """Métricas de um arquivo em processamento."""
+
+    def __init__(self, path, operation):
+        self.path = path
+        self.operation = operation
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def to_dict(self, success, seconds):
+        return {
+            'type': 'file',
+            'path': self.path,
+            'operation': self.operation,
+            'outcome': 'ok' if success else 'failed',
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'seconds': round(seconds, 6),
+            'phases': {name: round(value, 6) for name, value in self.phases.items()},
+        }
+
+
+class MetricsCollector:
+    """
+    Recebe os registros por arquivo, grava-os no destino e calcula os resumos de lote.
+    sink_path: arquivo JSON lines (acrescenta ao fim) ou None.
+    on_file: callback(registro) chamado ao fim de cada arquivo.
+    on_phase: callback(caminho, fase, segundos) chamado para cada fase ao fim de cada arquivo.
+    """
+
+    def __init__(self, sink_path=None, on_file=None, on_phase=None):
+        self._lock = threading.Lock()
+        self._sink = open(sink_path, 'a', encoding='utf-8') if sink_path else None
+        self.on_file = on_file
+        self.on_phase = on_phase
+        self._reset_batch(None)
+
+    def _reset_batch(self, operation):
+        self._batch_operation = operation
+        self._batch_start = time.perf_counter()
+        self._durations = []
+        self._phase_totals = {}
+        self._bytes_read = 0
+        self._bytes_written = 0
+        self._failures = 0
+
+    def _emit(self, data):
+        if self._sink is not None:
+            self._sink.write(json.dumps(data, ensure_ascii=False) + '\n')
+
+    def file_finished(self, record, success):
+        seconds = time.perf_counter() - record.start
+        data = record.to_dict(success, seconds)
+        with self._lock:
+            self._durations.append(seconds)
+            self._bytes_read += record.bytes_read
+            self._bytes_written += record.bytes_written
+            if not success:
+                self._failures += 1
+            for name, value in record.phases.items():
+                self._phase_totals[name] = self._phase_totals.get(name, 0.0) + value
+            self._emit(data)
+
+        if self.on_phase is not None:
+            for name, value in record.phases.items():
+                self.on_phase(record.path, name, value)
+        if self.on_file is not None:
+            self.on_file(data)
+
+    def start_batch(self, operation):
+        with self._lock:
+            self._reset_batch(operation)
+
+    def finish_batch(self):
+        """Grava e retorna o resumo do lote."""
+        with self._lock:
+            wall = time.perf_counter() - self._batch_start
+            durations = sorted(self._durations)
+            summary = {
+                'type': 'batch',
+                'operation': self._batch_operation,
+                'files': len(durations),
+                'failed': self._failures,
+                'bytes_read': self._bytes_read,
+                'bytes_written': self._bytes_written,
+                'seconds': round(wall, 6),
+                'mb_per_s': round(self._bytes_read / (1024 * 1024) / wall, 3) if wall > 0 else None,
+                'files_per_s': round(len(durations) / wall, 3) if wall > 0 else None,
+                'p50_seconds': _percentile(durations, 50),
+                'p90_seconds': _percentile(durations, 90),
+                'p99_seconds': _percentile(durations, 99),
+                'max_seconds': round(durations[-1], 6) if durations else None,
+                'phase_seconds': {name: round(value, 6) for name, value in self._phase_totals.items()},
+            }
+            self._emit(summary)
+            if self._sink is not None:
+                self._sink.flush()
+        return summary
+
+    def close(self):
+        with self._lock:
+            if self._sink is not None:
+                self._sink.close()
+                self._sink = None
+
+
+def _percentile(sorted_values, percent):
+    """Percentil pelo método do valor mais próximo."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[index], 6)
+
+
+def enable_metrics(sink_path=None, on_file=None, on_phase=None):
+    """Ativa a coleta de métricas. Retorna o coletor criado."""
+    global _collector
+    disable_metrics()
+    _collector = MetricsCollector(sink_path, on_file, on_phase)
+    return _collector
+
+
+def disable_metrics():
+    """Desativa a coleta de métricas e fecha o destino."""
+    global _collector
+    if _collector is not None:
+        _collector.close()
+        _collector = None
+
+
+def metrics_enabled():
+    return _collector is not None
+
+
+def start_batch(operation):
+    if _collector is not None:
+        _collector.start_batch(operation)
+
+
+def finish_batch():
+    """Fecha o lote atual. Retorna o resumo, ou None com as métricas desativadas."""
+    if _collector is not None:
+        return _collector.finish_batch()
+    return None
+
+
+def start_file(path, operation):
+    """Começa o registro do arquivo processado na thread atual."""
+    if _collector is not None:
+        _local.record = FileRecord(path, operation)
+
+
+def finish_file(success):
+    """Conclui o registro do arquivo da thread atual."""
+    record = getattr(_local, 'record', None)
+    if record is None:
+        return
+    _local.record = None
+    if _collector is not None:
+        _collector.file_finished(record, success)
+
+
+def phase(name):
+    """Contexto que mede uma fase do arquivo atual (ex.: with phase('kdf'): ...)."""
+    record = getattr(_local, 'record', None)
+    if record is None:
+        return _NULL_PHASE
+    return _Phase(record, name)
+
+
+def timed(name, function, counter=None):
+    """
+    Envolve uma função chamada a cada bloco (leitura, cifra, escrita) para
+    somar seu tempo à fase indicada. counter: 'read' conta os bytes
+    retornados; 'readinto' conta o total retornado por readinto(buffer);
+    'write' conta os bytes recebidos.
+    Sem métricas ativas, devolve a própria função, sem custo extra.
+    """
+    record = getattr(_local, 'record', None)
+    if record is None:
+        return function
+
+    perf_counter = time.perf_counter
+
+    if counter == 'read':
+        def wrapper(*args):
+            start = perf_counter()
+            result = function(*args)
+            record.add(name, perf_counter() - start)
+            record.bytes_read += len(result)
+            return result
+    elif counter == 'readinto':
+        def wrapper(buffer):
+            start = perf_counter()
+            result = function(buffer)
+            record.add(name, perf_counter() - start)
+            record.bytes_read += result or 0
+            return result
+    elif counter == 'write':
+        def wrapper(data):
+            start = perf_counter()
+            result = function(data)
+            record.add(name, perf_counter() - start)
+            record.bytes_written += len(data)
+            return result
+    else:
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            result = function(*args, **kwargs)
+            record.add(name, perf_counter() - start)
+            return result
+    return wrapper
@@ -0,0 +1,229 @@
+"""
+Módulo de progresso dos lotes: bytes processados, vazão e tempo restante.
+
+O progresso é alimentado pelos bytes efetivamente lidos nos laços de
+criptografia, descriptografia e verificação (ver counted), não só pela
+contagem de arquivos, então um lote com um arquivo enorme não fica parado
+em "1 de 2" por horas. O total esperado vem do tamanho de cada arquivo;
+quando um arquivo termina tendo lido menos (conteúdo já deduplicado, falha)
+ou mais do que o esperado, o total é corrigido na hora.
+
+Com a saída padrão em um terminal, uma linha de status é redesenhada a cada
+REFRESH_INTERVAL segundos, apagada e refeita em volta das mensagens normais.
+Fora de um terminal (logs, cron), uma linha de progresso é impressa a cada
+LOG_INTERVAL segundos. Lotes que terminam antes do primeiro intervalo não
+mostram nada.
+"""
+import sys
+import threading
+import time
+
+# Intervalo entre os redesenhos da linha de status no terminal (segundos)
+REFRESH_INTERVAL = 1.0
+# Intervalo entre as linhas de progresso fora do terminal (segundos)
+LOG_INTERVAL = 30.0
+
+_enabled = True
+_reporter = None
+_local = threading.local()
+
+
+def format_duration(seconds):
+    """Duração legível: '45s', '12min 05s', '3h 07min'."""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}min {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}min"
+
+
+class _FileProgress:
+    """Bytes esperados e já contados de um arquivo em andamento."""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.done = 0
+
+
+class _StatusOutput:
+    """
+    Substituto de sys.stdout que apaga a linha de status antes de cada
+    mensagem, para que ela seja redesenhada abaixo no próximo intervalo.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.status_shown = False
+        self.at_line_start = True
+
+    def write(self, text):
+        with self.lock:
+            if self.status_shown and text:
+                self.stream.write('\r\x1b[K')
+                self.status_shown = False
+            if text:
+                self.at_line_start = text.endswith('\n')
+            return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def show(self, status):
+        with self.lock:
+            # Não desenha no meio de uma linha incompleta (ex.: um prompt)
+            if not self.at_line_start:
+                return
+            self.stream.write('\r\x1b[K' + status)
+            self.stream.flush()
+            self.status_shown = True
+
+    def clear(self):
+        with self.lock:
+            if self.status_shown:
+                self.stream.write('\r\x1b[K')
+                self.stream.flush()
+                self.status_shown = False
+
+
+class ProgressReporter:
+    """
+    Acumula o progresso de um lote e o mostra periodicamente em uma thread
+    própria, até stop().
+    """
+
+    def __init__(self, operation, sizes, stream=None):
+        self.operation = operation
+        self.sizes = sizes
+        self.total_files = len(sizes)
+        self.total_bytes = sum(sizes.values())
+        self.files_done = 0
+        self.bytes_done = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        stream = stream or sys.stdout
+        self.interactive = stream.isatty() if hasattr(stream, 'isatty') else False
+        self._output = _StatusOutput(stream) if self.interactive else None
+        self._stream = stream
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def advance(self, size):
+        with self._lock:
+            self.bytes_done += size
+
+    def file_finished(self, file_progress):
+        with self._lock:
+            self.files_done += 1
+            if file_progress is not None:
+                self.total_bytes += file_progress.done - file_progress.expected
+
+    def status(self):
+        """Texto do progresso atual."""
+        with self._lock:
+            files_done, bytes_done, total_bytes = self.files_done, self.bytes_done, self.total_bytes
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        mb_per_s = bytes_done / (1024 * 1024) / elapsed
+        text = (f"{self.operation}: {files_done}/{self.total_files} arquivo(s), "
+                f"{bytes_done / (1024 * 1024):.1f}/{total_bytes / (1024 * 1024):.1f} MB")
+        if total_bytes > 0:
+            text += f" ({min(100.0, 100 * bytes_done / total_bytes):.0f}%)"
+        text += f", {mb_per_s:.1f} MB/s, {files_done / elapsed:.1f} arquivos/s"
+        if bytes_done and total_bytes > bytes_done:
+            text += f", restam ~{format_duration((total_bytes - bytes_done) / (bytes_done / elapsed))}"
+        return text
+
+    def start(self):
+        if self.interactive:
+            sys.stdout = self._output
+        self._thread.start()
+
+    def _run(self):
+        interval = REFRESH_INTERVAL if self.interactive else LOG_INTERVAL
+        while not self._stop.wait(interval):
+            if self.interactive:
+                self._output.show(f"⏳ {self.status()}")
+            else:
+                self._stream.write(f"📊 Progresso - {self.status()}\n")
+                self._stream.flush()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        if self.interactive:
+            self._output.clear()
+            if sys.stdout is self._output:
+                sys.stdout = self._output.stream
+
+
+def enable_progress(enabled=True):
+    """Ativa ou desativa o progresso dos próximos lotes."""
+    global _enabled
+    _enabled = enabled
+
+
+def start_batch(operation, sizes):
+    """
+    Começa a acompanhar um lote, se o progresso estiver ativo.
+    sizes: {arquivo: bytes esperados}.
+    """
+    global _reporter
+    if not _enabled or _reporter is not None:
+        return
+    _reporter = ProgressReporter(operation, sizes)
+    _reporter.start()
+
+
+def finish_batch():
+    """Encerra o acompanhamento do lote atual e apaga a linha de status."""
+    global _reporter
+    if _reporter is not None:
+        _reporter.stop()
+        _reporter = None
+
+
+def start_file(path):
+    """Começa a contar os bytes do arquivo processado na thread atual."""
+    if _reporter is not None:
+        _local.file = _FileProgress(_reporter.sizes.get(path, 0))
+
+
+def finish_file():
+    """Conclui o arquivo da thread atual."""
+    file_progress = getattr(_local, 'file', None)
+    _local.file = None
+    if _reporter is not None:
+        _reporter.file_finished(file_progress)
+
+
+def counted(readinto):
+    """
+    Envolve readinto para somar os bytes lidos ao progresso do arquivo atual.
+    Pode ser chamado em outra thread (pipeline). Sem progresso ativo, devolve
+    a própria função.
+    """
+    reporter = _reporter
+    file_progress = getattr(_local, 'file', None)
+    if reporter is None or file_progress is None:
+        return readinto
+
+    def wrapper(buffer):
+        size_read = readinto(buffer)
+        if size_read:
+            file_progress.done += size_read
+            reporter.advance(size_read)
+        return size_read
+    return wrapper
+
+
+def advance(size):
+    """Soma size bytes ao progresso do arquivo atual (leituras de uma só vez)."""
+    file_progress = getattr(_local, 'file', None)
+    if _reporter is not None and file_progress is not None:
+        file_progress.done += size
+        _reporter.advance(size)
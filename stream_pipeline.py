@@ -0,0 +1,142 @@
+"""
+Módulo para o processamento de arquivos em pipeline (leitura -> cifra -> escrita).
+
+Em um laço serial, o disco fica parado enquanto o AES trabalha e a CPU fica
+parada enquanto espera a E/S. No pipeline, uma thread lê, a thread que chamou
+aplica a transformação (cifra e, se houver, compressão) e outra thread grava.
+As três etapas trocam um conjunto fixo de buffers reutilizáveis por filas, então
+a vazão de arquivos grandes se aproxima de min(disco, AES) em vez da soma dos
+dois tempos, e a memória usada fica limitada a PIPELINE_BUFFERS blocos.
+
+Arquivos menores que PIPELINE_MIN_SIZE usam o laço serial com um único buffer,
+sem o custo de criar threads. Fluxos de tamanho desconhecido (stdin) podem
+forçar o pipeline.
+"""
+import queue
+import threading
+
+# Quantidade de buffers em circulação: um sendo lido, um sendo cifrado, um
+# sendo gravado e um de folga para absorver variações de velocidade
+PIPELINE_BUFFERS = 4
+
+# Abaixo deste tamanho, o custo das threads supera o ganho do pipeline
+PIPELINE_MIN_SIZE = 8 * 1024 * 1024
+
+
+def transform_stream(readinto, write, transform, chunk_size, size=None, flush=None, pipelined=None):
+    """
+    Lê blocos com readinto, aplica transform e grava o resultado com write.
+    transform(view) recebe um memoryview gravável com o bloco lido e retorna
+    os dados a gravar (pode cifrar no próprio buffer e retornar o mesmo view).
+    flush(): chamado ao fim da leitura; retorna os dados finais a gravar.
+    size: tamanho esperado da entrada, usado para escolher entre pipeline e laço serial.
+    pipelined: força (True) ou impede (False) o uso do pipeline, independentemente de size.
+    """
+    if pipelined is None:
+        pipelined = size is not None and size >= PIPELINE_MIN_SIZE
+    if pipelined:
+        _run_pipeline(readinto, write, transform, chunk_size)
+    else:
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        while True:
+            size_read = readinto(buffer)
+            if not size_read:
+                break
+            write(transform(view[:size_read]))
+
+    if flush is not None:
+        write(flush())
+
+
+def _run_pipeline(readinto, write, transform, chunk_size):
+    """
+    Executa leitura e escrita em threads próprias, com a transformação na
+    thread atual. Erros de qualquer etapa são relançados aqui.
+    """
+    free_buffers = queue.Queue()
+    filled = queue.Queue()
+    transformed = queue.Queue()
+    stop = threading.Event()
+    errors = []
+
+    for _ in range(PIPELINE_BUFFERS):
+        free_buffers.put(bytearray(chunk_size))
+
+    def reader():
+        try:
+            while True:
+                buffer = free_buffers.get()
+                if buffer is None or stop.is_set():
+                    break
+                size_read = readinto(buffer)
+                if not size_read:
+                    break
+                filled.put((buffer, size_read))
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            filled.put(None)
+
+    def writer():
+        while True:
+            item = transformed.get()
+            if item is None:
+                break
+            buffer, data = item
+            # Depois de um erro, apenas devolve os buffers para não travar o leitor
+            if not stop.is_set():
+                try:
+                    write(data)
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+            free_buffers.put(buffer)
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    reader_thread.start()
+    writer_thread.start()
+
+    try:
+        while True:
+            item = filled.get()
+            if item is None:
+                break
+            buffer, size_read = item
+            if stop.is_set():
+                free_buffers.put(buffer)
+                continue
+            transformed.put((buffer, transform(memoryview(buffer)[:size_read])))
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+        # Acorda o leitor, caso esteja esperando um buffer livre
+        free_buffers.put(None)
+    finally:
+        transformed.put(None)
+        writer_thread.join()
+        reader_thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+class PrefixedReader:
+    """
+    Fluxo de leitura que entrega primeiro bytes já lidos (prefix) e depois o
+    restante de raw. Permite inspecionar o início de um fluxo sem seek.
+    """
+
+    def __init__(self, prefix, raw):
+        self._prefix = memoryview(prefix)
+        self._raw = raw
+
+    def readinto(self, buffer):
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        return self._raw.readinto(buffer)
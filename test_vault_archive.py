@@ -0,0 +1,97 @@
+"""
+Testes do empacotamento e da extração de cofres (vault_archive.py).
+
+Rodar com: python -m unittest test_vault_archive (ou python -m pytest).
+"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import key_derivation
+import vault_archive
+
+
+class ExtractArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        # Derivação rápida: o teste confere o cofre, não o custo do KDF
+        self._iterations = key_derivation.PBKDF2_ITERATIONS
+        key_derivation.PBKDF2_ITERATIONS = 1000
+        self._cwd = os.getcwd()
+        self._temp = tempfile.TemporaryDirectory()
+        self.root = self._temp.name
+
+        self.source = os.path.join(self.root, 'origem')
+        os.makedirs(os.path.join(self.source, 'docs'))
+        self.contents = {
+            'a.txt': b'primeiro arquivo\n',
+            'docs/b.bin': os.urandom(3000),
+        }
+        for name, data in self.contents.items():
+            with open(os.path.join(self.source, *name.split('/')), 'wb') as f:
+                f.write(data)
+
+        self.archive = os.path.join(self.root, 'origem.vault')
+        files = [os.path.join(self.source, *name.split('/')) for name in self.contents]
+        kdf = key_derivation.kdf_params(key_derivation.KDF_PBKDF2, iterations=1000)
+        with contextlib.redirect_stdout(io.StringIO()):
+            successful, failed = vault_archive.create_archive(self.archive, files, self.source, 'senha', kdf=kdf)
+        self.assertEqual(len(successful), 2)
+        self.assertEqual(failed, [])
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        key_derivation.PBKDF2_ITERATIONS = self._iterations
+        key_derivation.clear_key_cache()
+        self._temp.cleanup()
+
+    def assert_extracted(self, folder):
+        for name, data in self.contents.items():
+            with open(os.path.join(folder, *name.split('/')), 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+    def test_extract_to_default_destination(self):
+        destination = os.path.join(self.root, 'destino')
+        os.makedirs(destination)
+        os.chdir(destination)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = vault_archive.extract_archive(self.archive, 'senha', '.')
+        self.assertEqual(sorted(result[0]), sorted(self.contents))
+        self.assertEqual(result[1], [])
+        self.assert_extracted(destination)
+
+    def test_extract_to_absolute_destination(self):
+        destination = os.path.join(self.root, 'absoluto')
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = vault_archive.extract_archive(self.archive, 'senha', destination)
+        self.assertEqual(result[1], [])
+        self.assert_extracted(destination)
+
+    def test_rejects_tampered_content(self):
+        with open(self.archive, 'rb') as f:
+            index = vault_archive.open_archive(f, 'senha')[2]
+        entry = next(entry for entry in index if entry['name'] == 'docs/b.bin')
+        with open(self.archive, 'r+b') as f:
+            f.seek(entry['offset'] + 10)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 1]))
+        destination = os.path.join(self.root, 'adulterado')
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = vault_archive.extract_archive(self.archive, 'senha', destination)
+        self.assertEqual(result[0], ['a.txt'])
+        self.assertEqual(result[1], ['docs/b.bin'])
+        self.assertFalse(os.path.exists(os.path.join(destination, 'docs', 'b.bin')))
+
+    def test_rejects_names_outside_destination(self):
+        destination = os.path.join(self.root, 'destino')
+        for name in ('../fora.txt', 'docs/../../fora.txt', '.'):
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertFalse(vault_archive.extract_entry(None, None, 0, {'name': name}, destination))
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'fora.txt')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,412 @@
+"""
+Módulo para cofres: vários arquivos reunidos em um único arquivo criptografado.
+
+Evita o custo de cabeçalho, salt, abertura e fechamento por arquivo em pastas
+com milhares de arquivos pequenos. Layout:
+    ENC_ARCH_V1\\n
+    bloco de campos (salt, valor de verificação da chave, tamanho do bloco, parâmetros do KDF,
+    chave de dados embrulhada, autenticação)
+    conteúdo de cada arquivo, criptografado com AES-CTR e nonce próprio
+    índice criptografado (JSON com nome, posição, tamanho, nonce e mtime)
+    rodapé fixo: posição do índice (8) + tamanho do índice (8) + nonce do índice (8) + PVINDEX\\n
+
+Com o índice no fim, um arquivo pode ser extraído posicionando a leitura
+direto no seu conteúdo, sem descriptografar os demais.
+
+Com FIELD_AUTH, o conteúdo de cada arquivo e o índice são gravados em
+registros autenticados, como os dados dos arquivos V3 (ver chunk_auth.py),
+com as tags cobrindo também o cabeçalho do cofre: um cofre corrompido,
+truncado ou adulterado é rejeitado em vez de extrair lixo. O tamanho no
+índice é o do arquivo original; o trecho gravado tem uma tag a mais por
+registro (stored_size). Cofres anteriores às chaves de dados, sem
+FIELD_AUTH, continuam sendo lidos sem autenticação; com a chave de dados e
+sem FIELD_AUTH, o cabeçalho foi adulterado.
+"""
+import json
+import os
+from getpass import getpass
+
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+
+from chunk_auth import TAG_SIZE, AUTH_HMAC_SHA256_HEADER, AuthenticatedWriter, AuthenticatedReader
+from cipher_backend import CIPHER_AES_CTR, CTR_NONCE_SIZE, PayloadCipher
+from key_derivation import (
+    derive_key, clear_key_cache, key_check_value, key_matches, default_kdf, encode_kdf, kdf_from_header,
+    new_data_key, wrap_key, unwrap_key,
+)
+from vault_format import (
+    MAGIC_ARCHIVE, CHUNK_SIZE, FIELD_SALT, FIELD_CHUNK_SIZE, FIELD_KEY_CHECK, FIELD_KDF, FIELD_WRAPPED_KEY,
+    FIELD_AUTH, write_fields, read_fields, header_digest,
+)
+from file_selector import get_files_for_encryption
+
+ARCHIVE_EXTENSION = '.vault'
+TRAILER_MAGIC = b'PVINDEX\n'
+TRAILER_SIZE = 8 + 8 + 8 + len(TRAILER_MAGIC)
+
+
+def stored_size(size, chunk_size):
+    """Bytes gravados no cofre autenticado para size bytes: uma tag por registro, o último menor que o bloco."""
+    return size + (size // chunk_size + 1) * TAG_SIZE
+
+
+def _limited_readinto(f, size):
+    """readinto de f que para após size bytes, para não ler o trecho seguinte do cofre."""
+    remaining = [size]
+
+    def readinto(buffer):
+        view = memoryview(buffer)[:remaining[0]]
+        if not view:
+            return 0
+        size_read = f.readinto(view)
+        remaining[0] -= size_read
+        return size_read
+    return readinto
+
+
+def create_archive(archive_path, file_list, base_folder, password, chunk_size=CHUNK_SIZE, kdf=None):
+    """
+    Grava os arquivos da lista em um único cofre criptografado.
+    Os nomes no índice são relativos a base_folder.
+    kdf: parâmetros de derivação da chave (padrão: default_kdf()).
+    Retorna (sucessos, falhas).
+    """
+    successful = []
+    failed = []
+    salt = get_random_bytes(16)
+    if kdf is None:
+        kdf = default_kdf()
+    password_key = derive_key(password, salt, kdf=kdf)
+    # Conteúdo e índice usam uma chave de dados própria, embrulhada no cabeçalho
+    key = new_data_key(len(password_key))
+    index = []
+
+    fields = {
+        FIELD_SALT: salt,
+        FIELD_CHUNK_SIZE: chunk_size.to_bytes(4, byteorder='big'),
+        FIELD_KEY_CHECK: key_check_value(password_key),
+        FIELD_KDF: encode_kdf(kdf),
+        FIELD_WRAPPED_KEY: wrap_key(password_key, key),
+        FIELD_AUTH: AUTH_HMAC_SHA256_HEADER.encode('ascii'),
+    }
+    header = header_digest(fields, MAGIC_ARCHIVE)
+
+    try:
+        with open(archive_path, 'wb') as dst:
+            dst.write(MAGIC_ARCHIVE)
+            write_fields(dst, fields)
+
+            for file_path in file_list:
+                name = os.path.relpath(file_path, base_folder).replace(os.sep, '/')
+                offset = dst.tell()
+                # Nonce próprio por arquivo: os registros de um não abrem no lugar de outro
+                payload = PayloadCipher(CIPHER_AES_CTR, key, header=header)
+                writer = AuthenticatedWriter(dst.write, payload.records.seal, chunk_size)
+                size = 0
+                try:
+                    with open(file_path, 'rb') as src:
+                        mtime_ns = os.fstat(src.fileno()).st_mtime_ns
+                        while True:
+                            chunk = src.read(chunk_size)
+                            if not chunk:
+                                break
+                            size += len(chunk)
+                            writer.write(payload.stream.process(chunk))
+                    writer.finish()
+                except OSError as e:
+                    print(f"  ❌ Erro ao ler o arquivo '{file_path}': {e}. Pulando.")
+                    # Descarta o que foi gravado deste arquivo
+                    dst.seek(offset)
+                    dst.truncate()
+                    failed.append(file_path)
+                    continue
+
+                index.append({
+                    'name': name,
+                    'offset': offset,
+                    'size': size,
+                    'nonce': payload.nonce.hex(),
+                    'mtime_ns': mtime_ns,
+                })
+                successful.append(file_path)
+                print(f"  ✅ Adicionado ao cofre: '{name}'")
+
+            index_offset = dst.tell()
+            index_payload = PayloadCipher(CIPHER_AES_CTR, key, header=header)
+            writer = AuthenticatedWriter(dst.write, index_payload.records.seal, chunk_size)
+            writer.write(index_payload.stream.process(json.dumps(index).encode('utf-8')))
+            writer.finish()
+            dst.write(index_offset.to_bytes(8, byteorder='big'))
+            dst.write((dst.tell() - index_offset - 8).to_bytes(8, byteorder='big'))
+            dst.write(index_payload.nonce)
+            dst.write(TRAILER_MAGIC)
+    except Exception as e:
+        print(f"  ❌ Erro ao escrever o cofre '{archive_path}': {e}.")
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+        return [], list(file_list)
+    finally:
+        clear_key_cache()
+
+    return successful, failed
+
+
+def open_archive(f, password):
+    """
+    Lê o cabeçalho e o índice de um cofre aberto.
+    Retorna (chave, tamanho do bloco, índice, cabeçalho autenticado) ou None
+    se o cofre for inválido ou a senha estiver incorreta. O cabeçalho
+    autenticado (header_digest) é None nos cofres sem autenticação.
+    """
+    if f.read(len(MAGIC_ARCHIVE)) != MAGIC_ARCHIVE:
+        print("  ❌ O arquivo não é um cofre do PyVault.")
+        return None
+
+    fields = read_fields(f)
+    if fields is None or FIELD_SALT not in fields:
+        print("  ❌ Cabeçalho do cofre corrompido.")
+        return None
+
+    try:
+        key = derive_key(password, fields[FIELD_SALT], kdf=kdf_from_header(fields.get(FIELD_KDF)))
+    except ValueError as e:
+        print(f"  ❌ Erro na derivação da chave do cofre: {e}")
+        return None
+    if FIELD_KEY_CHECK in fields and not key_matches(key, fields[FIELD_KEY_CHECK]):
+        print("  ❌ Senha incorreta para o cofre.")
+        return None
+    if FIELD_WRAPPED_KEY in fields:
+        try:
+            key = unwrap_key(key, fields[FIELD_WRAPPED_KEY])
+        except ValueError:
+            print("  ❌ Chave de dados do cofre corrompida.")
+            return None
+
+    header = None
+    if FIELD_AUTH in fields:
+        if fields[FIELD_AUTH] != AUTH_HMAC_SHA256_HEADER.encode('ascii'):
+            print(f"  ❌ Autenticação do cofre não suportada: {fields[FIELD_AUTH].decode('ascii', errors='replace')}")
+            return None
+        header = header_digest(fields, MAGIC_ARCHIVE)
+    elif FIELD_WRAPPED_KEY in fields:
+        # A chave de dados e a autenticação sempre foram gravadas juntas
+        print("  ❌ Cabeçalho do cofre adulterado: chave de dados sem autenticação.")
+        return None
+    chunk_size = int.from_bytes(fields.get(FIELD_CHUNK_SIZE, b''), byteorder='big') or CHUNK_SIZE
+
+    f.seek(-TRAILER_SIZE, os.SEEK_END)
+    trailer = f.read(TRAILER_SIZE)
+    if len(trailer) < TRAILER_SIZE or not trailer.endswith(TRAILER_MAGIC):
+        print("  ❌ Índice do cofre não encontrado (arquivo truncado?).")
+        return None
+
+    index_offset = int.from_bytes(trailer[0:8], byteorder='big')
+    index_size = int.from_bytes(trailer[8:16], byteorder='big')
+    index_nonce = trailer[16:24]
+
+    f.seek(index_offset)
+    try:
+        if header is None:
+            index_data = AES.new(key, AES.MODE_CTR, nonce=index_nonce).decrypt(f.read(index_size))
+        else:
+            index_data = _read_records(f, key, index_nonce, header, index_size, chunk_size)
+        index = json.loads(index_data.decode('utf-8'))
+    except ValueError:
+        print("  ❌ Índice do cofre corrompido.")
+        return None
+
+    return key, chunk_size, index, header
+
+
+def _read_records(f, key, nonce, header, size, chunk_size):
+    """Lê, confere e decifra size bytes de registros autenticados a partir da posição de f."""
+    payload = PayloadCipher(CIPHER_AES_CTR, key, nonce, header=header)
+    readinto = AuthenticatedReader(_limited_readinto(f, size), payload.records.open, chunk_size).readinto
+    buffer = bytearray(chunk_size)
+    parts = []
+    while True:
+        size_read = readinto(buffer)
+        if not size_read:
+            break
+        parts.append(payload.stream.process(bytes(buffer[:size_read])))
+    return b''.join(parts)
+
+
+def list_archive(archive_path, password):
+    """
+    Retorna o índice do cofre (lista de entradas com nome, tamanho e mtime),
+    ou None em caso de erro. Não descriptografa o conteúdo dos arquivos.
+    """
+    try:
+        with open(archive_path, 'rb') as f:
+            opened = open_archive(f, password)
+    except OSError as e:
+        print(f"  ❌ Erro ao ler o cofre '{archive_path}': {e}")
+        return None
+    finally:
+        clear_key_cache()
+
+    if opened is None:
+        return None
+    return opened[2]
+
+
+def extract_archive(archive_path, password, output_folder, names=None):
+    """
+    Extrai os arquivos do cofre para output_folder. Com names, extrai apenas
+    as entradas indicadas, posicionando a leitura direto em cada uma.
+    Retorna (sucessos, falhas) com os nomes das entradas, ou None se o cofre
+    não puder ser aberto.
+    """
+    successful = []
+    failed = []
+
+    try:
+        with open(archive_path, 'rb') as f:
+            opened = open_archive(f, password)
+            if opened is None:
+                return None
+            key, chunk_size, index, header = opened
+
+            entries = index
+            if names is not None:
+                by_name = {entry['name']: entry for entry in index}
+                entries = []
+                for name in names:
+                    if name in by_name:
+                        entries.append(by_name[name])
+                    else:
+                        print(f"  ❌ '{name}' não está no cofre.")
+                        failed.append(name)
+
+            for entry in entries:
+                if extract_entry(f, key, chunk_size, entry, output_folder, header):
+                    successful.append(entry['name'])
+                else:
+                    failed.append(entry['name'])
+    except OSError as e:
+        print(f"  ❌ Erro ao ler o cofre '{archive_path}': {e}")
+        return None
+    finally:
+        clear_key_cache()
+
+    return successful, failed
+
+
+def extract_entry(f, key, chunk_size, entry, output_folder, header=None):
+    """
+    Extrai uma entrada do cofre aberto em f para output_folder, conferindo os
+    registros autenticados (header: cabeçalho autenticado de open_archive;
+    None nos cofres sem autenticação).
+    """
+    name = entry['name']
+    # Não permite que um nome do índice escreva fora da pasta de destino
+    # (os dois lados resolvidos, para que '-d .' e links simbólicos funcionem)
+    destination = os.path.realpath(output_folder)
+    output_path = os.path.realpath(os.path.join(destination, *name.split('/')))
+    if output_path == destination or os.path.commonpath([destination, output_path]) != destination:
+        print(f"  ❌ Nome inválido no cofre: '{name}'. Pulando.")
+        return False
+
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        nonce = bytes.fromhex(entry['nonce'])
+        f.seek(entry['offset'])
+        with open(output_path, 'wb') as dst:
+            if header is None:
+                cipher = AES.new(key, AES.MODE_CTR, nonce=nonce)
+                remaining = entry['size']
+                while remaining > 0:
+                    chunk = f.read(min(chunk_size, remaining))
+                    if not chunk:
+                        raise ValueError("conteúdo truncado")
+                    dst.write(cipher.decrypt(chunk))
+                    remaining -= len(chunk)
+            else:
+                if len(nonce) != CTR_NONCE_SIZE:
+                    raise ValueError("nonce inválido no índice")
+                payload = PayloadCipher(CIPHER_AES_CTR, key, nonce, header=header)
+                readinto = AuthenticatedReader(_limited_readinto(f, stored_size(entry['size'], chunk_size)),
+                                               payload.records.open, chunk_size).readinto
+                buffer = bytearray(chunk_size)
+                while True:
+                    size_read = readinto(buffer)
+                    if not size_read:
+                        break
+                    dst.write(payload.stream.process(memoryview(buffer)[:size_read]))
+        print(f"  ✅ Extraído: '{name}'")
+        return True
+    except Exception as e:
+        print(f"  ❌ Erro ao extrair '{name}': {e}. Pulando.")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return False
+
+
+def show_archive_listing(index):
+    """
+    Mostra as entradas de um cofre.
+    """
+    total_size = sum(entry['size'] for entry in index)
+    print(f"\n📦 {len(index)} arquivo(s) no cofre, {total_size / 1024:.1f} KB no total:")
+    for entry in index:
+        print(f"  - {entry['name']} ({entry['size'] / 1024:.1f} KB)")
+
+
+# Funções principais para serem chamadas pelo main.py
+def pack_folder(path_folder):
+    """Empacota todos os arquivos da pasta em um cofre."""
+    print(f"Empacotando a pasta em um cofre: '{path_folder}'")
+
+    files_to_pack = get_files_for_encryption(path_folder)
+    if not files_to_pack:
+        print("Nenhum arquivo encontrado para empacotar na pasta.")
+        return
+
+    password = getpass("Digite a senha do cofre: ")
+    if not password:
+        print("Senha não pode ser vazia. Operação abortada.")
+        return
+
+    archive_path = os.path.normpath(path_folder) + ARCHIVE_EXTENSION
+    print("\n⚠️ IMPORTANTE: Guarde bem a senha que você digitou. Sem ela, seus arquivos NÃO poderão ser recuperados.")
+    print(f"Gravando {len(files_to_pack)} arquivo(s) em '{archive_path}'...\n")
+
+    successful, failed = create_archive(archive_path, files_to_pack, path_folder, password)
+    print(f"\nArquivos adicionados: {len(successful)}")
+    if failed:
+        print(f"Arquivos que falharam: {len(failed)}")
+        for f in failed:
+            print(f"  - {os.path.basename(f)}")
+    print("\nEmpacotamento concluído.")
+
+
+def unpack_archive(path_folder):
+    """Lista o conteúdo de um cofre e extrai todos ou alguns arquivos."""
+    archive_path = input("Caminho do cofre (.vault): ").strip()
+    archive_path = os.path.expanduser(archive_path)
+    if not os.path.isfile(archive_path):
+        print("❌ Cofre não encontrado.")
+        return
+
+    password = getpass("Digite a senha do cofre: ")
+    index = list_archive(archive_path, password)
+    if index is None:
+        return
+    show_archive_listing(index)
+
+    names = input("\nNomes a extrair, separados por vírgula (vazio para todos, 'cancelar' para sair): ").strip()
+    if names.lower() == 'cancelar':
+        return
+    selected = [name.strip() for name in names.split(',') if name.strip()] or None
+
+    print(f"\nExtraindo para: '{path_folder}'")
+    result = extract_archive(archive_path, password, path_folder, selected)
+    if result is None:
+        return
+    successful, failed = result
+    print(f"\nArquivos extraídos: {len(successful)}")
+    if failed:
+        print(f"Arquivos que falharam: {len(failed)}")
+    print("\nExtração concluída.")
@@ -0,0 +1,242 @@
+"""
+Módulo para o catálogo criptografado de uma pasta.
+
+A criptografia de pasta mantém em CATALOG_NAME, na raiz da pasta, um índice
+dos arquivos criptografados: nome original (caminho relativo), tamanho, mtime,
+SHA-256 do conteúdo e formato do .enc. Listar, buscar e resumir o conteúdo
+da pasta passa a exigir a leitura de um único arquivo pequeno, em vez de
+percorrer a pasta (que só mostraria os nomes dos .enc) ou descriptografar.
+
+O catálogo é um arquivo V3 comum (salt, nonce, verificação da chave, KDF e
+chave de dados embrulhada no cabeçalho), com o JSON comprimido em zlib,
+protegido pela mesma chave do trabalho que o gravou. Como nos arquivos da
+pasta, os dados são gravados em registros autenticados cujas tags cobrem
+também o cabeçalho (ver chunk_auth.py): um catálogo alterado é rejeitado em
+vez de mudar em silêncio a listagem, a busca e os SHA-256 usados pelo modo
+incremental. Catálogos sem autenticação também são rejeitados; apagado o
+catálogo, a próxima criptografia da pasta cria um novo. Não termina em .enc, para não ser processado como um
+arquivo da pasta.
+"""
+import fnmatch
+import json
+import os
+import time
+import zlib
+from getpass import getpass
+
+from chunk_auth import AUTH_HMAC_SHA256_HEADER, AuthenticatedWriter, AuthenticatedReader
+from cipher_backend import CIPHER_AES_CTR, PayloadCipher, new_nonce
+from compression import COMPRESSION_ZLIB, new_compressor, new_decompressor
+from key_derivation import (
+    derive_key, key_check_value, key_matches, encode_kdf, kdf_from_header, new_data_key, wrap_key, unwrap_key,
+)
+from vault_format import (
+    MAGIC_V3, FORMAT_V3, CHUNK_SIZE, FIELD_SALT, FIELD_NONCE, FIELD_CHUNK_SIZE, FIELD_KEY_CHECK, FIELD_KDF,
+    FIELD_COMPRESSION, FIELD_WRAPPED_KEY, FIELD_AUTH, FIELD_CIPHER,
+    write_header_v3, read_header_v3, header_digest,
+)
+
+CATALOG_NAME = '.pyvault_catalog'
+CATALOG_VERSION = 1
+
+
+def catalog_path(path_folder):
+    """Caminho do catálogo de uma pasta."""
+    return os.path.join(path_folder, CATALOG_NAME)
+
+
+def has_catalog(path_folder):
+    """Indica se a pasta tem catálogo."""
+    return os.path.isfile(catalog_path(path_folder))
+
+
+def load_catalog(path_folder, password, key_size=32):
+    """
+    Lê e descriptografa o catálogo da pasta.
+    Retorna um dicionário {caminho relativo: entrada}, vazio se não houver
+    catálogo, ou None se a senha não conferir ou o catálogo for inválido.
+    """
+    try:
+        with open(catalog_path(path_folder), 'rb') as f:
+            if f.read(len(MAGIC_V3)) != MAGIC_V3:
+                raise ValueError("identificador inválido")
+            fields = read_header_v3(f)
+            if fields is None or FIELD_SALT not in fields or FIELD_NONCE not in fields:
+                raise ValueError("cabeçalho truncado")
+
+            key = derive_key(password, fields[FIELD_SALT], key_size, kdf_from_header(fields.get(FIELD_KDF)))
+            if not key_matches(key, fields.get(FIELD_KEY_CHECK, b'')):
+                print("❌ A senha não confere com a usada no catálogo desta pasta.")
+                return None
+
+            if (FIELD_WRAPPED_KEY not in fields or fields.get(FIELD_AUTH) != AUTH_HMAC_SHA256_HEADER.encode('ascii')
+                    or fields.get(FIELD_CIPHER) != CIPHER_AES_CTR.encode('ascii')):
+                raise ValueError("catálogo sem autenticação; apague-o para que a próxima criptografia crie um novo")
+            payload = PayloadCipher(CIPHER_AES_CTR, unwrap_key(key, fields[FIELD_WRAPPED_KEY]), fields[FIELD_NONCE],
+                                    header=header_digest(fields))
+            chunk_size = int.from_bytes(fields.get(FIELD_CHUNK_SIZE, b''), byteorder='big') or CHUNK_SIZE
+            readinto = AuthenticatedReader(f.readinto, payload.records.open, chunk_size).readinto
+            decompressor = new_decompressor(fields.get(FIELD_COMPRESSION, b'zlib').decode('ascii'))
+            parts = []
+            buffer = bytearray(chunk_size)
+            while True:
+                size_read = readinto(buffer)
+                if not size_read:
+                    break
+                decompressor.decompress(payload.stream.process(bytes(buffer[:size_read])), parts.append)
+            decompressor.flush(parts.append)
+            data = b''.join(parts)
+
+        catalog = json.loads(data.decode('utf-8'))
+        if catalog.get('version') != CATALOG_VERSION:
+            raise ValueError(f"versão do catálogo não suportada: {catalog.get('version')}")
+        return catalog['files']
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError, zlib.error) as e:
+        print(f"❌ Catálogo inválido em '{path_folder}': {e}")
+        return None
+
+
+def save_catalog(path_folder, catalog, key, salt, kdf):
+    """
+    Grava o catálogo de forma atômica, criptografado com key (derivada de salt
+    e kdf) e em registros autenticados, como os arquivos V3.
+    """
+    data = json.dumps({'version': CATALOG_VERSION, 'updated': time.time(), 'files': catalog},
+                      ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    compressor = new_compressor(COMPRESSION_ZLIB)
+    data_key = new_data_key(len(key))
+    fields = {
+        FIELD_SALT: salt,
+        FIELD_NONCE: new_nonce(CIPHER_AES_CTR),
+        FIELD_CHUNK_SIZE: CHUNK_SIZE.to_bytes(4, byteorder='big'),
+        FIELD_KEY_CHECK: key_check_value(key),
+        FIELD_KDF: encode_kdf(kdf),
+        FIELD_COMPRESSION: COMPRESSION_ZLIB.encode('ascii'),
+        FIELD_WRAPPED_KEY: wrap_key(key, data_key),
+        FIELD_CIPHER: CIPHER_AES_CTR.encode('ascii'),
+        FIELD_AUTH: AUTH_HMAC_SHA256_HEADER.encode('ascii'),
+    }
+    payload = PayloadCipher(CIPHER_AES_CTR, data_key, fields[FIELD_NONCE], header=header_digest(fields))
+
+    target = catalog_path(path_folder)
+    temp_path = target + '.tmp'
+    with open(temp_path, 'wb') as f:
+        write_header_v3(f, fields)
+        writer = AuthenticatedWriter(f.write, payload.records.seal, CHUNK_SIZE)
+        writer.write(payload.stream.process(compressor.compress(data) + compressor.flush()))
+        writer.finish()
+    os.replace(temp_path, target)
+
+
+def catalog_name(path_folder, file_path):
+    """Nome de um arquivo no catálogo: caminho relativo à pasta, com '/' como separador."""
+    return os.path.relpath(file_path, path_folder).replace(os.sep, '/')
+
+
+def update_catalog(path_folder, catalog, processed_files, stats, digests, dedup=False, encrypted_files=None):
+    """
+    Registra no catálogo os arquivos criptografados com sucesso, usando o stat
+    obtido antes da criptografia e o SHA-256 calculado durante ela.
+    Com encrypted_files (os .enc existentes na pasta), remove as entradas
+    cujo .enc não existe mais.
+    """
+    for file_path in processed_files:
+        st = stats.get(file_path)
+        if st is None:
+            continue
+        catalog[catalog_name(path_folder, file_path)] = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': digests.get(file_path),
+            'format': FORMAT_V3,
+            'dedup': dedup,
+        }
+
+    if encrypted_files is not None:
+        keep = {catalog_name(path_folder, file_path)[:-len('.enc')] for file_path in encrypted_files}
+        keep.update(catalog_name(path_folder, file_path) for file_path in processed_files)
+        for name in list(catalog):
+            if name not in keep:
+                del catalog[name]
+
+    return catalog
+
+
+def catalog_digests(path_folder, catalog):
+    """
+    SHA-256 registrado para cada arquivo do catálogo, como {caminho do arquivo: SHA-256},
+    usado pela criptografia incremental para comparar o conteúdo.
+    """
+    return {
+        os.path.join(path_folder, *name.split('/')): entry['sha256']
+        for name, entry in catalog.items() if entry.get('sha256')
+    }
+
+
+def search_entries(entries, pattern):
+    """
+    Filtra entradas (dicionários com 'name') pelo nome, sem diferenciar maiúsculas.
+    pattern com curingas (*, ?, [) é comparado ao caminho inteiro; sem
+    curingas, basta o nome conter o texto.
+    """
+    pattern = pattern.lower()
+    if any(c in pattern for c in '*?['):
+        return [entry for entry in entries if fnmatch.fnmatchcase(entry['name'].lower(), pattern)]
+    return [entry for entry in entries if pattern in entry['name'].lower()]
+
+
+def catalog_entries(catalog):
+    """Entradas do catálogo em ordem de nome, cada uma com o campo 'name'."""
+    return [dict(entry, name=name) for name, entry in sorted(catalog.items())]
+
+
+def show_catalog_listing(entries):
+    """
+    Mostra as entradas do catálogo.
+    """
+    total_size = sum(entry['size'] for entry in entries)
+    print(f"\n📄 {len(entries)} arquivo(s) no catálogo, {total_size / 1024:.1f} KB no total:")
+    for entry in entries:
+        modified = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['mtime_ns'] / 1e9))
+        print(f"  - {entry['name']} ({entry['size'] / 1024:.1f} KB, {modified}, {entry.get('format', '?')})")
+
+
+def show_catalog_summary(path_folder, catalog):
+    """
+    Mostra o resumo da pasta a partir do catálogo.
+    """
+    entries = catalog.values()
+    total_size = sum(entry['size'] for entry in entries)
+    deduplicated = sum(1 for entry in entries if entry.get('dedup'))
+    print(f"\n📁 Informações da pasta (catálogo): {os.path.basename(path_folder)}")
+    print(f"   Caminho completo: {path_folder}")
+    print(f"   Arquivos criptografados: {len(catalog)}")
+    print(f"   Tamanho original total: {total_size / (1024 * 1024):.1f} MB")
+    if deduplicated:
+        print(f"   Arquivos deduplicados: {deduplicated}")
+    if catalog:
+        newest = max(entry['mtime_ns'] for entry in entries)
+        print(f"   Modificação mais recente: {time.strftime('%Y-%m-%d %H:%M', time.localtime(newest / 1e9))}")
+
+
+# Funções principais para serem chamadas pelo main.py
+def browse_catalog(path_folder):
+    """Mostra o resumo do catálogo da pasta e busca arquivos pelo nome."""
+    if not has_catalog(path_folder):
+        print("❌ A pasta não tem catálogo. Ele é criado na criptografia da pasta.")
+        return
+
+    password = getpass("Digite a senha da pasta criptografada: ")
+    catalog = load_catalog(path_folder, password)
+    if catalog is None:
+        return
+    show_catalog_summary(path_folder, catalog)
+    entries = catalog_entries(catalog)
+
+    while True:
+        pattern = input("\nBuscar (nome ou padrão com *, vazio para listar tudo, 'sair' para voltar): ").strip()
+        if pattern.lower() == 'sair':
+            return
+        show_catalog_listing(search_entries(entries, pattern) if pattern else entries)
@@ -0,0 +1,235 @@
+"""
+Módulo com o layout dos formatos de arquivo criptografado.
+
+Formato V3 (gravado em blocos, sem carregar o arquivo inteiro na memória):
+    ENC_FILE_V3\\n
+    tamanho do cabeçalho (4 bytes, big-endian)
+    campos do cabeçalho, cada um como: tag (1 byte) + tamanho (4 bytes) + valor
+    dados criptografados (AES-CTR ou a cifra de FIELD_CIPHER), gravados em blocos de tamanho fixo
+
+Campos ausentes assumem o valor padrão, então campos novos podem ser
+acrescentados sem quebrar arquivos V3 já gravados. O valor de verificação
+da chave (FIELD_KEY_CHECK) permite rejeitar uma senha errada antes de
+descriptografar qualquer dado. O algoritmo e os parâmetros de derivação da
+chave ficam em FIELD_KDF; sem esse campo, vale o PBKDF2 original.
+
+Com FIELD_WRAPPED_KEY, os dados são criptografados com uma chave de dados
+aleatória, guardada no cabeçalho embrulhada pela chave derivada da senha
+(ver key_derivation.wrap_key). Sem esse campo (V3 anteriores), a própria
+chave derivada criptografa os dados. A troca de senha (vault_rekey.py)
+reescreve apenas o salt, a verificação e a chave embrulhada, no mesmo lugar.
+
+Com FIELD_AUTH, os dados criptografados são gravados em registros de
+FIELD_CHUNK_SIZE bytes, cada um seguido de uma tag de autenticação; arquivos
+corrompidos ou truncados são detectados na leitura (ver chunk_auth.py). Sem
+esse campo (V3 anteriores), os dados são um fluxo AES-CTR contínuo.
+
+FIELD_CIPHER registra a cifra dos dados (ver cipher_backend.py); sem esse
+campo, vale o AES-CTR. Nas cifras autenticadas (AES-GCM, ChaCha20-Poly1305),
+os registros têm o mesmo layout e FIELD_AUTH vale AUTH_AEAD: a tag de cada
+registro é a da própria cifra.
+
+Nos arquivos gravados com AUTH_HMAC_SHA256_HEADER ou AUTH_AEAD_HEADER, as
+tags também cobrem o cabeçalho (authenticated_header): trocar a cifra, a
+compressão, os metadados ou a própria autenticação invalida o primeiro
+registro. Ficam de fora apenas os campos da senha (PASSWORD_FIELDS), que a
+troca de senha reescreve e que já se conferem sozinhos: um salt, uma KDF ou
+uma verificação alterados rejeitam a senha, e uma chave embrulhada alterada
+não desembrulha. Um arquivo com FIELD_WRAPPED_KEY sempre foi gravado com
+FIELD_AUTH; sem ele, o cabeçalho foi adulterado.
+
+Na deduplicação, cada arquivo .enc é uma referência: um cabeçalho V3 sem
+dados e sem nonce, com o identificador do conteúdo em FIELD_BLOB_REF. O
+conteúdo fica uma única vez, como arquivo V3 comum, no armazenamento
+DEDUP_STORE_NAME da pasta criptografada (ver dedup_store.py).
+
+Os cofres (ENC_ARCH_V1), que reúnem vários arquivos, usam o mesmo bloco de
+campos no cabeçalho; o layout completo está em vault_archive.py.
+"""
+import hashlib
+import os
+
+MAGIC_V2 = b'ENC_FILE_V2\n'
+MAGIC_V3 = b'ENC_FILE_V3\n'
+MAGIC_ARCHIVE = b'ENC_ARCH_V1\n'
+
+# Tags dos campos do cabeçalho V3
+FIELD_METADATA = 1
+FIELD_SALT = 2
+FIELD_NONCE = 3
+FIELD_CHUNK_SIZE = 4
+FIELD_KEY_CHECK = 5
+FIELD_COMPRESSION = 6
+FIELD_KDF = 7
+FIELD_BLOB_REF = 8
+FIELD_WRAPPED_KEY = 9
+FIELD_AUTH = 10
+FIELD_CIPHER = 11
+
+# Campos reescritos pela troca de senha, fora da autenticação do cabeçalho
+PASSWORD_FIELDS = (FIELD_SALT, FIELD_KEY_CHECK, FIELD_KDF, FIELD_WRAPPED_KEY)
+
+# Pasta do armazenamento de conteúdo deduplicado, ignorada nas varreduras
+DEDUP_STORE_NAME = '.pyvault_store'
+
+# Tamanho padrão dos blocos de leitura/escrita (1 MiB)
+CHUNK_SIZE = 1024 * 1024
+
+# Maior bloco de metadados gravado no cabeçalho (ver crypto_operations.read_metadata)
+MAX_METADATA_SIZE = 1024 * 1024
+# Maior bloco de campos aceito na leitura: os metadados mais os demais campos,
+# que somam poucos KiB. O tamanho vem do arquivo, antes de qualquer
+# autenticação; sem o limite, um arquivo corrompido faria read_fields ler até 4 GiB.
+MAX_HEADER_SIZE = MAX_METADATA_SIZE + 64 * 1024
+
+# Formatos reconhecidos por probe_format
+FORMAT_V3 = 'V3'
+FORMAT_V2 = 'V2'
+FORMAT_LEGACY = 'antigo'
+FORMAT_ARCHIVE = 'cofre'
+FORMAT_UNKNOWN = 'desconhecido'
+
+# Layout do formato antigo: salt de 16 bytes seguido do nonce do AES-CTR
+LEGACY_SALT_SIZE = 16
+LEGACY_NONCE_SIZES = (8, 12)
+# O nonce do AES-CTR precisa ser menor que o bloco de 16 bytes
+MAX_CTR_NONCE_SIZE = 15
+
+
+def write_header_v3(f, fields):
+    """
+    Grava o identificador e os campos do cabeçalho V3.
+    fields: dicionário {tag: bytes}
+    """
+    f.write(MAGIC_V3)
+    write_fields(f, fields)
+
+
+def write_fields(f, fields):
+    """
+    Grava um bloco de campos (tamanho total + tag/tamanho/valor de cada campo).
+    fields: dicionário {tag: bytes}
+    """
+    body = b''.join(
+        tag.to_bytes(1, byteorder='big') + len(value).to_bytes(4, byteorder='big') + value
+        for tag, value in fields.items()
+    )
+    f.write(len(body).to_bytes(4, byteorder='big'))
+    f.write(body)
+
+
+def authenticated_header(fields, magic=MAGIC_V3):
+    """
+    Bytes do cabeçalho V3 (ou do cofre, com magic=MAGIC_ARCHIVE) cobertos
+    pelas tags dos registros: o identificador e os campos, menos
+    PASSWORD_FIELDS, em ordem de tag. Independe da ordem em que os campos
+    foram gravados, então pode ser recalculado na leitura.
+    """
+    body = b''.join(
+        tag.to_bytes(1, byteorder='big') + len(fields[tag]).to_bytes(4, byteorder='big') + fields[tag]
+        for tag in sorted(fields) if tag not in PASSWORD_FIELDS
+    )
+    return magic + len(body).to_bytes(4, byteorder='big') + body
+
+
+def header_digest(fields, magic=MAGIC_V3):
+    """SHA-256 de authenticated_header, passado às tags dos registros (ver chunk_auth.py)."""
+    return hashlib.sha256(authenticated_header(fields, magic)).digest()
+
+
+def read_header_v3(f):
+    """
+    Lê os campos do cabeçalho V3 (o identificador já deve ter sido consumido).
+    Retorna um dicionário {tag: bytes} ou None se o cabeçalho estiver truncado.
+    """
+    return read_fields(f)
+
+
+def read_fields(f):
+    """
+    Lê um bloco de campos gravado por write_fields.
+    Retorna um dicionário {tag: bytes} ou None se o bloco estiver truncado
+    ou for maior que MAX_HEADER_SIZE.
+    """
+    raw_size = f.read(4)
+    if len(raw_size) < 4:
+        return None
+
+    header_size = int.from_bytes(raw_size, byteorder='big')
+    if header_size > MAX_HEADER_SIZE:
+        return None
+    body = f.read(header_size)
+    if len(body) < header_size:
+        return None
+
+    fields = {}
+    offset = 0
+    while offset < header_size:
+        if offset + 5 > header_size:
+            return None
+        tag = body[offset]
+        length = int.from_bytes(body[offset+1:offset+5], byteorder='big')
+        offset += 5
+        if offset + length > header_size:
+            return None
+        fields[tag] = body[offset:offset+length]
+        offset += length
+
+    return fields
+
+
+def probe_format(f):
+    """
+    Classifica um arquivo criptografado pelo cabeçalho e pelo tamanho, sem derivar chaves.
+    Retorna (formato, campos), em que campos é o cabeçalho lido no V3 e None nos demais.
+    No V3 o arquivo fica posicionado logo após o cabeçalho; nos demais, no início.
+    """
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    f.seek(0)
+
+    magic = f.read(len(MAGIC_V3))
+    if magic == MAGIC_V3:
+        fields = read_header_v3(f)
+        # Referências da deduplicação não têm dados nem nonce
+        if fields is None or FIELD_SALT not in fields:
+            return FORMAT_UNKNOWN, None
+        if FIELD_NONCE not in fields and FIELD_BLOB_REF not in fields:
+            return FORMAT_UNKNOWN, None
+        return FORMAT_V3, fields
+
+    f.seek(0)
+    if magic == MAGIC_ARCHIVE:
+        return FORMAT_ARCHIVE, None
+
+    if magic == MAGIC_V2:
+        if _is_valid_v2(f, file_size):
+            f.seek(0)
+            return FORMAT_V2, None
+        f.seek(0)
+        return FORMAT_UNKNOWN, None
+
+    # Formato antigo: sem identificador, precisa comportar ao menos salt + nonce
+    if file_size >= LEGACY_SALT_SIZE + min(LEGACY_NONCE_SIZES):
+        return FORMAT_LEGACY, None
+    return FORMAT_UNKNOWN, None
+
+
+def _is_valid_v2(f, file_size):
+    """
+    Confere se os tamanhos declarados no cabeçalho V2 cabem no arquivo.
+    """
+    offset = len(MAGIC_V2)
+    f.seek(offset)
+    raw_metadata_size = f.read(4)
+    if len(raw_metadata_size) < 4:
+        return False
+    offset += 4 + int.from_bytes(raw_metadata_size, byteorder='big') + 16
+
+    if file_size < offset + 1:
+        return False
+    f.seek(offset)
+    nonce_size = f.read(1)[0]
+    offset += 1
+
+    return 0 < nonce_size <= MAX_CTR_NONCE_SIZE and file_size >= offset + nonce_size
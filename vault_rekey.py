@@ -0,0 +1,359 @@
+"""
+Módulo para a troca de senha de arquivos, cofres e pastas criptografadas.
+
+Com o envelope (ver vault_format.py), os dados de cada arquivo são
+criptografados com uma chave de dados aleatória, e a senha protege apenas
+essa chave, embrulhada no cabeçalho. A troca de senha desembrulha a chave com
+a senha antiga, embrulha-a com a nova e reescreve só o bloco de campos do
+cabeçalho, no mesmo lugar: o custo é proporcional ao número de arquivos, não
+ao volume de dados.
+
+Os parâmetros do KDF de cada arquivo são mantidos, para que o cabeçalho novo
+tenha exatamente o mesmo tamanho. Arquivos sem chave de dados (V3 anteriores
+ao envelope, V2 e antigo) precisam ser descriptografados e criptografados de
+novo; todos os arquivos são conferidos antes de qualquer alteração. Uma troca
+interrompida pode ser repetida com as mesmas senhas: os arquivos que já usam
+a nova senha são mantidos.
+
+Como o cabeçalho é reescrito no próprio arquivo (copiar os dados para um
+temporário tornaria a troca proporcional ao volume), uma queda no meio da
+gravação poderia deixá-lo pela metade, e o arquivo ilegível. Por isso o
+cabeçalho original é gravado antes em uma cópia oculta ao lado do arquivo
+(header_backup_path), sincronizada em disco, e só é apagado depois que o
+novo cabeçalho também foi sincronizado. Se a cópia ainda existir, a troca
+foi interrompida: ao repetir a troca, o cabeçalho original é restaurado
+antes da conferência.
+
+Referências de deduplicação e conteúdos do armazenamento só têm a senha
+trocada junto com a pasta inteira: trocar apenas um dos lados deixaria a
+referência apontando para um conteúdo com outra senha.
+"""
+import io
+import json
+import os
+from getpass import getpass
+
+from Crypto.Random import get_random_bytes
+
+from key_derivation import (
+    derive_key, clear_key_cache, key_check_value, key_matches, kdf_from_header, check_kdf, wrap_key, unwrap_key,
+)
+from vault_format import (
+    DEDUP_STORE_NAME, MAGIC_V3, MAGIC_ARCHIVE, FIELD_SALT, FIELD_KEY_CHECK, FIELD_KDF, FIELD_BLOB_REF, FIELD_WRAPPED_KEY,
+    read_fields, write_fields,
+)
+from dedup_store import STORE_INFO_NAME, store_root, save_store_info
+from file_selector import get_files_for_decryption
+from job_journal import journal_path
+from vault_catalog import catalog_path
+
+# Resultado da conferência de um arquivo
+REKEY_NEEDED = 'trocar'
+REKEY_DONE = 'já trocado'
+
+# Sufixo da cópia do cabeçalho original durante a troca
+HEADER_BACKUP_SUFFIX = '.rekey'
+
+
+def header_backup_path(file_path):
+    """
+    Caminho da cópia do cabeçalho original de um arquivo durante a troca de
+    senha. Começa com ponto, para ser ignorado pelas varreduras.
+    """
+    folder, name = os.path.split(file_path)
+    return os.path.join(folder, f".{name}{HEADER_BACKUP_SUFFIX}")
+
+
+def _fsync_folder(folder):
+    """Sincroniza em disco a entrada de diretório de arquivos criados ou apagados (POSIX)."""
+    if os.name != 'posix':
+        return
+    fd = os.open(folder or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def restore_header(file_path):
+    """
+    Restaura o cabeçalho original de uma troca de senha interrompida, se a
+    cópia dele ainda existir. Retorna False se a restauração falhar.
+    """
+    backup_path = header_backup_path(file_path)
+    if not os.path.exists(backup_path):
+        return True
+    try:
+        with open(backup_path, 'rb') as f:
+            header = f.read()
+        with open(file_path, 'r+b') as f:
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+        os.remove(backup_path)
+        _fsync_folder(os.path.dirname(file_path))
+    except OSError as e:
+        print(f"  ❌ Erro ao restaurar o cabeçalho de '{file_path}' da troca interrompida: {e}")
+        return False
+    print(f"  🩺 Cabeçalho de '{file_path}' restaurado da troca de senha interrompida.")
+    return True
+
+
+def _read_header(f):
+    """
+    Lê o identificador e o bloco de campos de um arquivo V3 ou cofre.
+    Retorna os campos, ou None se o arquivo não tiver esse cabeçalho.
+    """
+    if f.read(len(MAGIC_V3)) not in (MAGIC_V3, MAGIC_ARCHIVE):
+        return None
+    fields = read_fields(f)
+    if fields is None or FIELD_SALT not in fields or FIELD_KEY_CHECK not in fields:
+        return None
+    return fields
+
+
+def check_rekey(file_path, old_password, new_password, whole_folder=True):
+    """
+    Confere se a senha do arquivo pode ser trocada sem alterar os dados.
+    whole_folder: False se o arquivo foi indicado sozinho, sem a pasta; nesse
+    caso referências de deduplicação e conteúdos do armazenamento são recusados.
+    Retorna REKEY_NEEDED, REKEY_DONE (o arquivo já usa a nova senha) ou None,
+    informando o motivo, se não puder.
+    """
+    if not whole_folder and DEDUP_STORE_NAME in os.path.normpath(os.path.abspath(file_path)).split(os.sep):
+        print(f"  ❌ '{file_path}' pertence ao armazenamento de deduplicação; troque a senha da pasta inteira.")
+        return None
+    if not restore_header(file_path):
+        return None
+    try:
+        with open(file_path, 'rb') as f:
+            fields = _read_header(f)
+    except OSError as e:
+        print(f"  ❌ Erro ao ler o arquivo '{file_path}': {e}")
+        return None
+    if fields is None:
+        print(f"  ❌ '{file_path}' não tem chave de dados (formato V2 ou antigo); "
+              f"descriptografe e criptografe de novo para trocar a senha.")
+        return None
+    if not whole_folder and FIELD_BLOB_REF in fields:
+        # O conteúdo no armazenamento continuaria com a senha antiga
+        print(f"  ❌ '{file_path}' é uma referência de deduplicação; troque a senha da pasta inteira, "
+              f"com o armazenamento.")
+        return None
+
+    kdf = kdf_from_header(fields.get(FIELD_KDF))
+    if not key_matches(derive_key(old_password, fields[FIELD_SALT], kdf=kdf), fields[FIELD_KEY_CHECK]):
+        if key_matches(derive_key(new_password, fields[FIELD_SALT], kdf=kdf), fields[FIELD_KEY_CHECK]):
+            return REKEY_DONE
+        print(f"  ❌ Senha incorreta para '{file_path}'.")
+        return None
+    if FIELD_WRAPPED_KEY not in fields and FIELD_BLOB_REF not in fields:
+        print(f"  ❌ '{file_path}' foi gravado antes das chaves de dados; "
+              f"descriptografe e criptografe de novo para trocar a senha.")
+        return None
+    return REKEY_NEEDED
+
+
+def rekey_file(file_path, old_password, new_password, new_salt):
+    """
+    Troca a senha de um arquivo V3 ou cofre reescrevendo apenas o bloco de
+    campos do cabeçalho: salt, verificação da chave e chave de dados embrulhada.
+    Referências de deduplicação não têm chave de dados; só o salt e a verificação mudam.
+    O cabeçalho original fica em header_backup_path até o novo estar em disco.
+    """
+    try:
+        with open(file_path, 'r+b') as f:
+            fields = _read_header(f)
+            if fields is None:
+                print(f"  ❌ Formato não suportado para '{file_path}'.")
+                return False
+            fields_size = f.tell() - len(MAGIC_V3)
+
+            kdf = kdf_from_header(fields.get(FIELD_KDF))
+            old_key = derive_key(old_password, fields[FIELD_SALT], kdf=kdf)
+            if not key_matches(old_key, fields[FIELD_KEY_CHECK]):
+                if key_matches(derive_key(new_password, fields[FIELD_SALT], kdf=kdf), fields[FIELD_KEY_CHECK]):
+                    print(f"  ✅ Já usa a nova senha: '{os.path.basename(file_path)}'")
+                    return True
+                print(f"  ❌ Senha incorreta para '{file_path}'.")
+                return False
+
+            new_key = derive_key(new_password, new_salt, kdf=kdf)
+            new_fields = dict(fields)
+            new_fields[FIELD_SALT] = new_salt
+            new_fields[FIELD_KEY_CHECK] = key_check_value(new_key)
+            if FIELD_WRAPPED_KEY in fields:
+                data_key = unwrap_key(old_key, fields[FIELD_WRAPPED_KEY])
+                new_fields[FIELD_WRAPPED_KEY] = wrap_key(new_key, data_key)
+            elif FIELD_BLOB_REF not in fields:
+                print(f"  ❌ '{file_path}' foi gravado antes das chaves de dados. Pulando.")
+                return False
+
+            header = io.BytesIO()
+            write_fields(header, new_fields)
+            if len(header.getvalue()) != fields_size:
+                print(f"  ❌ O cabeçalho de '{file_path}' mudaria de tamanho. Pulando.")
+                return False
+
+            f.seek(0)
+            original = f.read(len(MAGIC_V3) + fields_size)
+            backup_path = header_backup_path(file_path)
+            with open(backup_path, 'wb') as backup:
+                backup.write(original)
+                backup.flush()
+                os.fsync(backup.fileno())
+            _fsync_folder(os.path.dirname(file_path))
+
+            f.seek(len(MAGIC_V3))
+            f.write(header.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+        os.remove(backup_path)
+    except (OSError, ValueError) as e:
+        print(f"  ❌ Erro ao trocar a senha de '{file_path}': {e}")
+        return False
+
+    print(f"  🔑 Senha trocada: '{os.path.basename(file_path)}'")
+    return True
+
+
+def _read_store_info(root):
+    """Lê salt, parâmetros do KDF, verificação da chave e id_key embrulhada do armazenamento."""
+    with open(os.path.join(root, STORE_INFO_NAME), 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    id_key = bytes.fromhex(info['id_key']) if 'id_key' in info else None
+    return bytes.fromhex(info['salt']), check_kdf(info['kdf']), bytes.fromhex(info['key_check']), id_key
+
+
+def check_store_rekey(root, old_password, new_password):
+    """
+    Confere a senha do armazenamento de deduplicação, como check_rekey.
+    """
+    try:
+        salt, kdf, key_check, _ = _read_store_info(root)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"  ❌ Erro ao ler o armazenamento de deduplicação '{root}': {e}")
+        return None
+    if key_matches(derive_key(old_password, salt, kdf=kdf), key_check):
+        return REKEY_NEEDED
+    if key_matches(derive_key(new_password, salt, kdf=kdf), key_check):
+        return REKEY_DONE
+    print(f"  ❌ Senha incorreta para o armazenamento de deduplicação '{root}'.")
+    return None
+
+
+def rekey_store_info(root, old_password, new_password, new_salt):
+    """
+    Troca a senha do armazenamento de deduplicação (STORE_INFO_NAME),
+    mantendo a chave que dá nome aos conteúdos.
+    """
+    try:
+        salt, kdf, key_check, wrapped_id_key = _read_store_info(root)
+        old_key = derive_key(old_password, salt, kdf=kdf)
+        if not key_matches(old_key, key_check):
+            print(f"  ❌ Senha incorreta para o armazenamento de deduplicação '{root}'.")
+            return False
+        # Armazenamentos antigos dão nome aos conteúdos com a própria chave da senha
+        id_key = unwrap_key(old_key, wrapped_id_key) if wrapped_id_key is not None else old_key
+        save_store_info(root, new_salt, kdf, derive_key(new_password, new_salt, kdf=kdf), id_key)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"  ❌ Erro ao trocar a senha do armazenamento de deduplicação '{root}': {e}")
+        return False
+
+    print("  🔑 Senha trocada: armazenamento de deduplicação")
+    return True
+
+
+def folder_rekey_files(path_folder):
+    """
+    Arquivos cuja senha é trocada junto com a pasta: os .enc, o catálogo e
+    os conteúdos do armazenamento de deduplicação.
+    """
+    files = get_files_for_decryption(path_folder)
+    if os.path.isfile(catalog_path(path_folder)):
+        files.append(catalog_path(path_folder))
+    root = store_root(path_folder)
+    for folder, _, names in os.walk(root):
+        files.extend(os.path.join(folder, name) for name in names if name.endswith('.enc'))
+    return files
+
+
+def rekey_paths(paths, old_password, new_password):
+    """
+    Troca a senha dos arquivos (.enc, .vault) e pastas indicados.
+    Todos são conferidos antes: se algum não puder ser trocado, nada é alterado.
+    Retorna (sucessos, falhas), ou None se a conferência falhar.
+    """
+    files = []
+    stores = []
+    # Arquivos indicados sozinhos, fora das pastas indicadas
+    lone_files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            lone_files.append(path)
+            continue
+        if os.path.exists(journal_path(path)):
+            print(f"❌ A pasta '{path}' tem um trabalho interrompido; retome-o antes de trocar a senha.")
+            return None
+        files.extend(folder_rekey_files(path))
+        if os.path.isfile(os.path.join(store_root(path), STORE_INFO_NAME)):
+            stores.append(store_root(path))
+    folder_files = {os.path.abspath(file_path) for file_path in files}
+    lone_files = [file_path for file_path in lone_files if os.path.abspath(file_path) not in folder_files]
+    files.extend(lone_files)
+    lone_files = set(lone_files)
+
+    try:
+        print(f"Conferindo {len(files)} arquivo(s)...")
+        statuses = {file_path: check_rekey(file_path, old_password, new_password, file_path not in lone_files)
+                    for file_path in files}
+        store_statuses = {root: check_store_rekey(root, old_password, new_password) for root in stores}
+        if None in statuses.values() or None in store_statuses.values():
+            print("❌ Nenhum arquivo foi alterado.")
+            return None
+        pending = [file_path for file_path, status in statuses.items() if status == REKEY_NEEDED]
+        pending_stores = [root for root, status in store_statuses.items() if status == REKEY_NEEDED]
+
+        # Um único salt novo: a nova senha é derivada uma vez por conjunto de parâmetros do KDF
+        new_salt = get_random_bytes(16)
+        successful = []
+        failed = []
+        for file_path in pending:
+            if rekey_file(file_path, old_password, new_password, new_salt):
+                successful.append(file_path)
+            else:
+                failed.append(file_path)
+        for root in pending_stores:
+            if rekey_store_info(root, old_password, new_password, new_salt):
+                successful.append(os.path.join(root, STORE_INFO_NAME))
+            else:
+                failed.append(os.path.join(root, STORE_INFO_NAME))
+        return successful, failed
+    finally:
+        clear_key_cache()
+
+
+# Funções principais para serem chamadas pelo main.py
+def change_folder_password(path_folder):
+    """Troca a senha de todos os arquivos criptografados da pasta."""
+    print(f"Troca de senha da pasta: '{path_folder}'")
+
+    old_password = getpass("Digite a senha atual: ")
+    new_password = getpass("Digite a nova senha: ")
+    if not old_password or not new_password:
+        print("Senha não pode ser vazia. Operação abortada.")
+        return
+    if getpass("Confirme a nova senha: ") != new_password:
+        print("❌ As senhas não conferem. Operação abortada.")
+        return
+
+    result = rekey_paths([path_folder], old_password, new_password)
+    if result is None:
+        return
+    successful, failed = result
+    print(f"\nArquivos com a senha trocada: {len(successful)}")
+    if failed:
+        print(f"Arquivos que falharam: {len(failed)}")
+        for f in failed:
+            print(f"  - {os.path.basename(f)}")
+    print("\n⚠️ IMPORTANTE: Guarde bem a nova senha. A senha antiga não abre mais estes arquivos.")